@@ -1,25 +1,31 @@
 from __future__ import annotations
 
 import logging
+import time
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 
-from .const import DATA_COORDINATOR, DOMAIN, PLATFORMS
+from .const import DATA_COORDINATOR, DATA_PRICE_REGISTRY, DOMAIN, PLATFORMS
 from .coordinator import EnergyBalancerCoordinator
+from .services import async_setup_services
+from .storage import PriceStore
 
 _LOGGER = logging.getLogger(__name__)
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     _LOGGER.debug("async_setup called")
+    async_setup_services(hass)
     return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     _LOGGER.debug("async_setup_entry START entry_id=%s", entry.entry_id)
 
+    started = time.monotonic()
     coordinator = EnergyBalancerCoordinator(hass, entry)
-    await coordinator.async_start()
+    # Only the local cache is awaited here; Nordpool is fetched in the background
+    await coordinator.async_load_cache()
     await coordinator.async_config_entry_first_refresh()
 
     hass.data.setdefault(DOMAIN, {})
@@ -28,15 +34,38 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     entry.async_on_unload(entry.add_update_listener(_update_listener))
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    await coordinator.async_start()
 
-    _LOGGER.debug("async_setup_entry DONE entry_id=%s", entry.entry_id)
+    coordinator.setup_duration = time.monotonic() - started
+    _LOGGER.debug(
+        "async_setup_entry DONE entry_id=%s in %.3fs (cached prices: %s)",
+        entry.entry_id,
+        coordinator.setup_duration,
+        coordinator.has_prices,
+    )
     return True
 
 
 async def _update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
     _LOGGER.debug("update_listener called entry_id=%s", entry.entry_id)
-    coordinator: EnergyBalancerCoordinator = hass.data[DOMAIN][entry.entry_id][DATA_COORDINATOR]
+    entry_data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if entry_data is None:
+        # Pending parameter changes are written while unloading
+        return
+    coordinator: EnergyBalancerCoordinator = entry_data[DATA_COORDINATOR]
+    if coordinator.is_own_entry_update(entry):
+        # Written by the coordinator's parameter commit, already applied
+        return
+    areas = coordinator.areas
+    price_setting = (coordinator.currency, coordinator.include_vat)
     coordinator.reload_from_entry(entry)
+    if coordinator.areas != areas:
+        # Per-area sensors are created at setup, so a changed area set needs a reload
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    if (coordinator.currency, coordinator.include_vat) != price_setting:
+        # Prices held for today/tomorrow are in the old currency or VAT setting
+        await coordinator.async_reload_prices()
     await coordinator.async_request_refresh()
 
 
@@ -48,6 +77,13 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         coordinator: EnergyBalancerCoordinator = hass.data[DOMAIN][entry.entry_id][DATA_COORDINATOR]
         await coordinator.async_stop()
         hass.data[DOMAIN].pop(entry.entry_id, None)
+        # The shared price registry goes away with the last entry
+        if not any(key != DATA_PRICE_REGISTRY for key in hass.data[DOMAIN]):
+            hass.data.pop(DOMAIN)
 
     _LOGGER.debug("async_unload_entry DONE entry_id=%s ok=%s", entry.entry_id, unload_ok)
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await PriceStore(hass, entry.entry_id).async_remove()
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import Any
+
+from .series import OffsetForecast
+
+
+def _rows(start_ts: Sequence[int], end_ts: Sequence[int], values: Sequence[float]) -> tuple[dict[str, Any], ...]:
+    # ApexCharts-friendly rows
+    return tuple(
+        {
+            "start_ts": s,
+            "end_ts": e,
+            "value": float(v),
+        }
+        for s, e, v in zip(start_ts, end_ts, values)
+    )
+
+
+def _is_regular(start_ts: Sequence[int], end_ts: Sequence[int], slot_ms: int) -> bool:
+    if not start_ts:
+        return True
+    first = start_ts[0]
+    for i, (s, e) in enumerate(zip(start_ts, end_ts)):
+        if s != first + i * slot_ms or e != s + slot_ms:
+            return False
+    return True
+
+
+def _compact_day(
+    key: str,
+    start_ts: Sequence[int],
+    end_ts: Sequence[int],
+    values: list,
+    slot_ms: int,
+) -> dict[str, Any]:
+    """One day as a start_ts plus a flat value list.
+
+    Days with gaps or uneven slots can't be described by start_ts/slot_ms
+    alone and keep the full row format.
+    """
+    if not _is_regular(start_ts, end_ts, slot_ms):
+        return {f"raw_{key}": _rows(start_ts, end_ts, values)}
+    return {
+        f"{key}_start_ts": start_ts[0] if start_ts else None,
+        f"raw_{key}": tuple(values),
+    }
+
+
+def _build(
+    forecast: OffsetForecast,
+    n_today: int,
+    values: Sequence[float],
+    attribute_format: str,
+    compact_values,
+) -> dict[str, Any]:
+    prices = forecast.prices
+    slot_ms = forecast.slot_ms
+    n = len(prices)
+    if attribute_format == "none":
+        return {"slot_ms": slot_ms}
+
+    days = (
+        ("today", prices.start_ts[:n_today], prices.end_ts[:n_today], values[:n_today]),
+        ("tomorrow", prices.start_ts[n_today:n], prices.end_ts[n_today:n], values[n_today:n]),
+    )
+    out: dict[str, Any] = {"slot_ms": slot_ms}
+    if attribute_format == "compact":
+        for key, starts, ends, vals in days:
+            out.update(_compact_day(key, starts, ends, compact_values(vals), slot_ms))
+        return out
+
+    for key, starts, ends, vals in days:
+        out[f"raw_{key}"] = _rows(starts, ends, vals)
+    return out
+
+
+def build_offset_attributes(
+    forecast: OffsetForecast,
+    n_today: int,
+    attribute_format: str = "full",
+    step_size: float = 0.0,
+) -> dict[str, Any]:
+    if attribute_format == "compact" and step_size > 0:
+        # Offsets are snapped to the step size, so integers are exact
+        attrs = _build(
+            forecast,
+            n_today,
+            forecast.offsets,
+            attribute_format,
+            lambda vals: [round(v / step_size) for v in vals],
+        )
+        attrs["value_scale"] = step_size
+        return attrs
+    return _build(
+        forecast,
+        n_today,
+        forecast.offsets,
+        attribute_format,
+        lambda vals: [round(v, 3) for v in vals],
+    )
+
+
+def build_price_attributes(
+    forecast: OffsetForecast,
+    n_today: int,
+    attribute_format: str = "full",
+) -> dict[str, Any]:
+    return _build(
+        forecast,
+        n_today,
+        forecast.prices.values,
+        attribute_format,
+        lambda vals: [float(v) for v in vals],
+    )
+
+
+def build_forecast_rows(
+    forecast: OffsetForecast,
+    start_ms: int | None = None,
+    end_ms: int | None = None,
+    resolution_ms: int | None = None,
+) -> list[dict[str, Any]]:
+    """Price/offset rows overlapping [start_ms, end_ms), for service responses.
+
+    With a resolution coarser than the slots, slots are grouped into
+    resolution-aligned buckets (epoch based, so hours and quarters line up
+    with local time) and averaged, weighted by slot length.
+    """
+    lo, hi = forecast.index_range(start_ms, end_ms)
+    prices = forecast.prices
+    starts = prices.start_ts
+    ends = prices.end_ts
+    values = prices.values
+    offsets = forecast.offsets
+    if not resolution_ms or resolution_ms <= forecast.slot_ms:
+        return [
+            {
+                "start_ts": starts[i],
+                "end_ts": ends[i],
+                "price": float(values[i]),
+                "offset": round(offsets[i], 3),
+            }
+            for i in range(lo, hi)
+        ]
+
+    rows: list[dict[str, Any]] = []
+    bucket = None
+    weight = price_sum = offset_sum = 0.0
+    for i in range(lo, hi):
+        b = starts[i] // resolution_ms
+        if b != bucket:
+            if bucket is not None:
+                rows.append(_bucket_row(bucket, resolution_ms, weight, price_sum, offset_sum))
+            bucket = b
+            weight = price_sum = offset_sum = 0.0
+        w = ends[i] - starts[i]
+        weight += w
+        price_sum += w * values[i]
+        offset_sum += w * offsets[i]
+    if bucket is not None:
+        rows.append(_bucket_row(bucket, resolution_ms, weight, price_sum, offset_sum))
+    return rows
+
+
+def _bucket_row(bucket: int, resolution_ms: int, weight: float, price_sum: float, offset_sum: float) -> dict[str, Any]:
+    start = bucket * resolution_ms
+    return {
+        "start_ts": start,
+        "end_ts": start + resolution_ms,
+        "price": round(price_sum / weight, 5),
+        "offset": round(offset_sum / weight, 3),
+    }
+
+
+EMPTY_ATTRIBUTES: dict[str, Any] = {
+    "slot_ms": None,
+    "raw_today": (),
+    "raw_tomorrow": (),
+}
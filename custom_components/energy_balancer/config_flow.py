@@ -10,13 +10,21 @@ from .const import (
     CURRENCIES,
     CONF_AREA,
     CONF_CURRENCY,
+    CONF_EXTRA_AREAS,
     CONF_HORIZON_HOURS,
     CONF_INCLUDE_VAT,
+    CONF_NIGHT_END,
+    CONF_NIGHT_START,
+    CONF_OFFSET_ENGINE,
     CONF_PRICE_ENTITY,
     DEFAULT_AREA,
     DEFAULT_CURRENCY,
     DEFAULT_INCLUDE_VAT,
+    DEFAULT_NIGHT_END,
+    DEFAULT_NIGHT_START,
+    DEFAULT_OFFSET_ENGINE,
     DOMAIN,
+    OFFSET_ENGINES,
 )
 
 
@@ -25,13 +33,14 @@ class EnergyBalancerConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_user(self, user_input=None):
         if user_input is not None:
-            # One instance is enough for now; if you want multiple instances later,
-            # remove this unique_id constraint and allow multiple entries.
-            await self.async_set_unique_id("energy_balancer_singleton")
-            self._abort_if_unique_id_configured()
+            # Several entries (e.g. one per heating zone) may share an area;
+            # their prices are fetched once through the domain price registry.
+            title = "Energy Balancer"
+            if self._async_current_entries():
+                title = f"Energy Balancer {user_input.get(CONF_AREA, DEFAULT_AREA)}"
 
             return self.async_create_entry(
-                title="Energy Balancer",
+                title=title,
                 data=user_input,
                 options={},
             )
@@ -71,7 +80,14 @@ class EnergyBalancerOptionsFlow(config_entries.OptionsFlow):
             new_data[CONF_INCLUDE_VAT] = user_input.get(CONF_INCLUDE_VAT, DEFAULT_INCLUDE_VAT)
             self.hass.config_entries.async_update_entry(self.entry, data=new_data)
 
-            return self.async_create_entry(title="", data=dict(self.entry.options or {}))
+            new_options = dict(self.entry.options or {})
+            new_options[CONF_EXTRA_AREAS] = [
+                area for area in user_input.get(CONF_EXTRA_AREAS, []) if area != user_input[CONF_AREA]
+            ]
+            new_options[CONF_NIGHT_START] = user_input.get(CONF_NIGHT_START, DEFAULT_NIGHT_START)
+            new_options[CONF_NIGHT_END] = user_input.get(CONF_NIGHT_END, DEFAULT_NIGHT_END)
+            new_options[CONF_OFFSET_ENGINE] = user_input.get(CONF_OFFSET_ENGINE, DEFAULT_OFFSET_ENGINE)
+            return self.async_create_entry(title="", data=new_options)
 
         schema = vol.Schema(
             {
@@ -85,6 +101,14 @@ class EnergyBalancerOptionsFlow(config_entries.OptionsFlow):
                     selector.SelectSelectorConfig(options=CURRENCIES)
                 ),
                 vol.Optional(CONF_INCLUDE_VAT, default=self.entry.data.get(CONF_INCLUDE_VAT, DEFAULT_INCLUDE_VAT)): selector.BooleanSelector(),
+                vol.Optional(CONF_EXTRA_AREAS, default=(self.entry.options or {}).get(CONF_EXTRA_AREAS, [])): selector.SelectSelector(
+                    selector.SelectSelectorConfig(options=AREAS, multiple=True)
+                ),
+                vol.Optional(CONF_NIGHT_START, default=(self.entry.options or {}).get(CONF_NIGHT_START, DEFAULT_NIGHT_START)): selector.TimeSelector(),
+                vol.Optional(CONF_NIGHT_END, default=(self.entry.options or {}).get(CONF_NIGHT_END, DEFAULT_NIGHT_END)): selector.TimeSelector(),
+                vol.Optional(CONF_OFFSET_ENGINE, default=(self.entry.options or {}).get(CONF_OFFSET_ENGINE, DEFAULT_OFFSET_ENGINE)): selector.SelectSelector(
+                    selector.SelectSelectorConfig(options=OFFSET_ENGINES)
+                ),
             }
         )
 
@@ -6,13 +6,30 @@ PLATFORMS: list[str] = ["sensor", "number", "select", "switch"]
 
 CONF_PRICE_ENTITY = "Nordpool Entity (Current Price)"
 CONF_AREA = "Area"
+CONF_EXTRA_AREAS = "extra_areas"
 CONF_INCLUDE_VAT = "Include VAT"
 CONF_CURRENCY = "Currency"
 CONF_HORIZON_HOURS = "horizon_hours"
 CONF_MAX_OFFSET = "max_offset"
 CONF_NIGHT_CAP = "night_cap"
+CONF_NIGHT_START = "night_start"
+CONF_NIGHT_END = "night_end"
 CONF_STEP_SIZE = "step_size"
 CONF_SMOOTHING_LEVEL = "smoothing_level"
+CONF_SMOOTHING_MODE = "smoothing_mode"
+CONF_OFFSET_ENGINE = "offset_engine"
+CONF_OFFSET_STRATEGY = "offset_strategy"
+CONF_ATTRIBUTE_FORMAT = "attribute_format"
+
+SERVICE_GET_FORECAST = "get_forecast"
+SERVICE_WHAT_IF = "what_if"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_AREA = "area"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_RESOLUTION = "resolution"
+ATTR_PARAMETER_SETS = "parameter_sets"
+ATTR_INCLUDE_OFFSETS = "include_offsets"
 
 AREAS = [
     "EE",
@@ -46,10 +63,33 @@ DEFAULT_HORIZON_HOURS = 12
 DEFAULT_MAX_OFFSET = 1.0
 DEFAULT_STEP_SIZE = 0.1
 DEFAULT_SMOOTHING_LEVEL = 1  # 0..10
+DEFAULT_SMOOTHING_MODE = "moving_average"
 DEFAULT_AREA = "SE1"
 DEFAULT_CURRENCY = "SEK"
 DEFAULT_INCLUDE_VAT = False
 DEFAULT_NIGHT_CAP = False
+DEFAULT_NIGHT_START = "22:30:00"
+DEFAULT_NIGHT_END = "05:00:00"
+
+# Offset computation backends. "auto" uses numpy when it is importable and
+# falls back to "linear" otherwise; "reference" is the original O(n*h) loop,
+# kept for verification.
+OFFSET_ENGINES = ["auto", "numpy", "linear", "reference"]
+DEFAULT_OFFSET_ENGINE = "auto"
+
+# How offsets are chosen: "heuristic" scales each slot against its rolling
+# window; "optimizer" minimizes price-weighted energy shift per horizon block
+# and falls back to the heuristic when it exceeds its compute budget.
+OFFSET_STRATEGIES = ["heuristic", "optimizer"]
+DEFAULT_OFFSET_STRATEGY = "heuristic"
+
+# Smoothing kernels; the window width still comes from the smoothing level
+SMOOTHING_MODES = ["moving_average", "exponential", "gaussian", "triangular"]
+
+# Forecast attribute encodings: "full" rows ({start_ts, end_ts, value}),
+# "compact" (start_ts + slot_ms + flat values) or "none" (no arrays).
+ATTRIBUTE_FORMATS = ["full", "compact", "none"]
+DEFAULT_ATTRIBUTE_FORMAT = "full"
 
 VAT_BY_AREA = {
     "AT": 0.20,
@@ -87,3 +127,9 @@ CURRENCY_UNITS = {
 
 # Coordinator key
 DATA_COORDINATOR = "coordinator"
+# hass.data[DOMAIN] key of the price registry shared by all entries
+DATA_PRICE_REGISTRY = "price_registry"
+
+# unique_id of entries created while the integration was single-instance;
+# their entities keep the unsuffixed unique ids.
+LEGACY_ENTRY_UNIQUE_ID = "energy_balancer_singleton"
@@ -1,52 +1,133 @@
 from __future__ import annotations
 
+from collections.abc import Callable
 from datetime import date, datetime, time, timedelta
-from functools import partial
-from statistics import mean
 import asyncio
+import json
+from time import monotonic as time_monotonic, perf_counter
 from typing import Any
 import logging
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ServiceValidationError
 from homeassistant.helpers.entity_registry import async_get as async_get_entity_registry
-from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.helpers.event import async_call_later, async_track_point_in_time
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.util import dt as dt_util
 
 from .const import (
     AREAS,
+    ATTRIBUTE_FORMATS,
     CURRENCIES,
     CURRENCY_UNITS,
     CONF_AREA,
+    CONF_ATTRIBUTE_FORMAT,
     CONF_CURRENCY,
+    CONF_EXTRA_AREAS,
     CONF_HORIZON_HOURS,
     CONF_INCLUDE_VAT,
     CONF_MAX_OFFSET,
     CONF_NIGHT_CAP,
+    CONF_NIGHT_END,
+    CONF_NIGHT_START,
+    CONF_OFFSET_ENGINE,
+    CONF_OFFSET_STRATEGY,
     CONF_PRICE_ENTITY,
     CONF_STEP_SIZE,
     CONF_SMOOTHING_LEVEL,
+    CONF_SMOOTHING_MODE,
     DEFAULT_AREA,
+    DEFAULT_ATTRIBUTE_FORMAT,
     DEFAULT_CURRENCY,
     DEFAULT_HORIZON_HOURS,
     DEFAULT_INCLUDE_VAT,
     DEFAULT_MAX_OFFSET,
     DEFAULT_NIGHT_CAP,
+    DEFAULT_NIGHT_END,
+    DEFAULT_NIGHT_START,
+    DEFAULT_OFFSET_ENGINE,
+    DEFAULT_OFFSET_STRATEGY,
     DEFAULT_STEP_SIZE,
     DEFAULT_SMOOTHING_LEVEL,
+    DEFAULT_SMOOTHING_MODE,
     DOMAIN,
-    VAT_BY_AREA,
+    OFFSET_ENGINES,
+    OFFSET_STRATEGIES,
+    SMOOTHING_MODES,
+)
+from .attributes import (
+    EMPTY_ATTRIBUTES,
+    build_forecast_rows,
+    build_offset_attributes,
+    build_price_attributes,
 )
 from .helpers import (
-    Point,
-    clamp,
+    PriceSeries,
     infer_slot_ms,
-    moving_average,
-    normalize_raw_points,
-    quantize_step,
+    night_intervals_ms,
+    night_mask,
 )
+from .metrics import Metrics
+from .offsets import STAGE_KEYS, OffsetParams, compute_offsets_batch, compute_offsets_scenarios
+from .optimizer import DEFAULT_BUDGET_MS, OptimizedOffsets, optimize_offsets
+from .registry import async_get_price_registry
+from .retry import FetchRetryScheduler
+from .series import OffsetForecast
+from .storage import PriceStore
+
+_OFFSET_CACHE_SIZE = 4
+# Parameter changes are applied with a single refresh once none has arrived
+# for this long
+PARAMETER_DEBOUNCE_SECONDS = 1.0
+
+
+def _choice(options: list[str], default: str) -> Callable[[Any], str]:
+    def normalize(value: Any) -> str:
+        value = str(value).lower()
+        return value if value in options else default
+
+    return normalize
+
+
+# Parameters adjustable at runtime (number/select/switch entities):
+# attribute name -> (options key, normalizer, default)
+PARAMETERS: dict[str, tuple[str, Callable[[Any], Any], Any]] = {
+    "max_offset": (CONF_MAX_OFFSET, float, DEFAULT_MAX_OFFSET),
+    "horizon_hours": (CONF_HORIZON_HOURS, int, DEFAULT_HORIZON_HOURS),
+    "smoothing_level": (CONF_SMOOTHING_LEVEL, int, DEFAULT_SMOOTHING_LEVEL),
+    "smoothing_mode": (
+        CONF_SMOOTHING_MODE,
+        _choice(SMOOTHING_MODES, DEFAULT_SMOOTHING_MODE),
+        DEFAULT_SMOOTHING_MODE,
+    ),
+    "step_size": (CONF_STEP_SIZE, float, DEFAULT_STEP_SIZE),
+    "night_cap": (CONF_NIGHT_CAP, bool, DEFAULT_NIGHT_CAP),
+    "attribute_format": (
+        CONF_ATTRIBUTE_FORMAT,
+        _choice(ATTRIBUTE_FORMATS, DEFAULT_ATTRIBUTE_FORMAT),
+        DEFAULT_ATTRIBUTE_FORMAT,
+    ),
+    "offset_strategy": (
+        CONF_OFFSET_STRATEGY,
+        _choice(OFFSET_STRATEGIES, DEFAULT_OFFSET_STRATEGY),
+        DEFAULT_OFFSET_STRATEGY,
+    ),
+}
+
+_offset_engine = _choice(OFFSET_ENGINES, DEFAULT_OFFSET_ENGINE)
+
+
+def _horizon_slots(hours: int, slot_ms: int) -> int:
+    # Rolling forward window of horizon_hours, in slots
+    return max(1, int(round((hours * 60 * 60 * 1000) / slot_ms)))
+
+
+def _smoothing_slots(level: int) -> int:
+    # derived smoothing window in slots (0..10 -> 1..(something))
+    # 0 => no smoothing, 1..10 => 3..21 slots (odd windows)
+    if level <= 0:
+        return 1
+    return 1 + 2 * level  # 3,5,7..21
 
 
 class EnergyBalancerCoordinator(DataUpdateCoordinator[dict[str, Any]]):
@@ -55,18 +136,62 @@ class EnergyBalancerCoordinator(DataUpdateCoordinator[dict[str, Any]]):
             hass,
             logger=logging.getLogger(__name__),
             name=f"{DOMAIN}:{entry.entry_id}",
-            update_interval=timedelta(minutes=1),
+            # Refreshes are driven by slot boundaries (see _schedule_slot_refresh)
+            update_interval=None,
         )
         self.entry = entry
         self._tz = dt_util.get_time_zone("Europe/Stockholm")
-        self._prices_today: list[Point] = []
-        self._prices_tomorrow: list[Point] = []
+        self._prices_today = PriceSeries()
+        self._prices_tomorrow = PriceSeries()
         self._prices_today_date: date | None = None
         self._prices_tomorrow_date: date | None = None
+        self._prices_today_fp: tuple[date, int] | None = None
+        self._prices_tomorrow_fp: tuple[date, int] | None = None
+        # Additional areas: area -> date -> (series, fingerprint)
+        self._area_prices: dict[str, dict[date, tuple[PriceSeries, int]]] = {}
+        # Offsets only depend on the price series and the parameters, so a
+        # minute tick can reuse them until one of those changes.
+        self._offset_cache: dict[tuple, dict[str, OffsetForecast]] = {}
+        self._forecast: OffsetForecast | None = None
+        self._area_forecasts: dict[str, OffsetForecast] = {}
+        self.offset_cache_hits = 0
+        self.offset_cache_misses = 0
+        self.attribute_builds = 0
+        self.night_cap_residual = 0.0
+        # Last optimizer solution per area, to warm-start the next run
+        self._optimized: dict[str, OptimizedOffsets] = {}
+        self.optimizer_fallbacks = 0
+        # Rolling timings of the hot paths, exposed through diagnostics
+        self.metrics = Metrics()
+        self.last_fetch: datetime | None = None
+        self.last_update: datetime | None = None
+        # Parameter changes from entities: applied at once, persisted and
+        # refreshed once per burst
+        self._pending_options: dict[str, Any] = {}
+        self._own_entry_update: tuple[dict[str, Any], dict[str, Any]] | None = None
+        self._parameter_unsub = None
+        self.parameter_updates = 0
+        self.parameter_refreshes = 0
+        self._attribute_size: tuple[Any, Any, int] | None = None
+        # Night window per local date, as UTC epoch-ms intervals
+        self._night_cache: dict[tuple[date, time, time], tuple[tuple[int, int], ...]] = {}
+        self._store = PriceStore(hass, entry.entry_id)
+        self._price_registry = async_get_price_registry(hass)
         self._nordpool_entry_id: str | None = None
         self._daily_unsub = None
         self._midnight_unsub = None
-        self._retry_unsub = None
+        self._slot_unsub = None
+        self._retry = FetchRetryScheduler(
+            hass,
+            entry,
+            self._async_fetch_dates,
+            self._async_prices_fetched,
+            self.logger,
+        )
+        # Startup timing (seconds since the coordinator was created)
+        self._created_at = time_monotonic()
+        self.setup_duration: float | None = None
+        self.prices_ready_after: float | None = None
         self.reload_from_entry(entry)
 
     def reload_from_entry(self, entry: ConfigEntry) -> None:
@@ -83,180 +208,506 @@ class EnergyBalancerCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         self._nordpool_entry_id = None
 
         opts = entry.options or {}
-        self.horizon_hours: int = int(opts.get(CONF_HORIZON_HOURS, entry.data.get(CONF_HORIZON_HOURS, DEFAULT_HORIZON_HOURS)))
-        self.max_offset: float = float(opts.get(CONF_MAX_OFFSET, entry.data.get(CONF_MAX_OFFSET, DEFAULT_MAX_OFFSET)))
-        self.night_cap: bool = bool(opts.get(CONF_NIGHT_CAP, entry.data.get(CONF_NIGHT_CAP, DEFAULT_NIGHT_CAP)))
-        self.step_size: float = float(opts.get(CONF_STEP_SIZE, entry.data.get(CONF_STEP_SIZE, DEFAULT_STEP_SIZE)))
-        self.smoothing_level: int = int(opts.get(CONF_SMOOTHING_LEVEL, entry.data.get(CONF_SMOOTHING_LEVEL, DEFAULT_SMOOTHING_LEVEL)))
-
-        # derived smoothing window in slots (0..10 -> 1..(something))
-        # 0 => no smoothing, 1..10 => 3..21 slots (odd windows)
-        if self.smoothing_level <= 0:
-            self.smoothing_slots = 1
-        else:
-            self.smoothing_slots = 1 + 2 * self.smoothing_level  # 3,5,7..21
-
+        extra_areas: list[str] = []
+        for extra in opts.get(CONF_EXTRA_AREAS) or []:
+            extra = str(extra).upper()
+            if extra in AREAS and extra != area and extra not in extra_areas:
+                extra_areas.append(extra)
+        self.extra_areas: tuple[str, ...] = tuple(extra_areas)
+        # The primary area first; all of them are fetched in one service call
+        self.areas: tuple[str, ...] = (area, *extra_areas)
+
+        # Options override the values chosen in the config flow
+        self.horizon_hours: int
+        self.max_offset: float
+        self.night_cap: bool
+        self.step_size: float
+        self.smoothing_level: int
+        self.smoothing_mode: str
+        self.offset_strategy: str
+        self.attribute_format: str
+        for name, (option, normalize, default) in PARAMETERS.items():
+            setattr(self, name, normalize(opts.get(option, entry.data.get(option, default))))
+        self.smoothing_slots = _smoothing_slots(self.smoothing_level)
+        self.night_start: time = _parse_time(opts.get(CONF_NIGHT_START), DEFAULT_NIGHT_START)
+        self.night_end: time = _parse_time(opts.get(CONF_NIGHT_END), DEFAULT_NIGHT_END)
+        self.offset_engine: str = _offset_engine(opts.get(CONF_OFFSET_ENGINE, DEFAULT_OFFSET_ENGINE))
+        self._invalidate_offset_cache()
 
     async def _async_update_data(self) -> dict[str, Any]:
+        with self.metrics.time("update"):
+            data = self._build_data()
+        self.last_update = dt_util.utcnow()
+        return data
+
+    def _build_data(self) -> dict[str, Any]:
         self._roll_prices_if_needed()
 
         prices_today = self._prices_today
         prices_tomorrow = self._prices_tomorrow
-        prices_all = [*prices_today, *prices_tomorrow]
-        if not prices_all:
+        if not prices_today and not prices_tomorrow:
+            self._forecast = None
+            self._area_forecasts = {}
             return self._empty()
 
-        slot_ms = infer_slot_ms(prices_all)
-
-        # Compute offsets for all known points using a rolling forward window (horizon_hours)
-        horizon_slots = max(1, int(round((self.horizon_hours * 60 * 60 * 1000) / slot_ms)))
-
-        offsets_all = self._compute_offsets(prices_all, horizon_slots)
-
-        # Split back into today / tomorrow
-        offsets_today = offsets_all[: len(prices_today)]
-        offsets_tomorrow = offsets_all[len(prices_today) :]
-
-        # Current offset for "now" slot
-        now_ms = int(dt_util.utcnow().timestamp() * 1000)
-        current_offset = 0.0
-        current_price = None
-        for p, o in zip(prices_all, offsets_all):
-            if p.start_ts <= now_ms < p.end_ts:
-                current_offset = float(o)
-                current_price = float(p.value)
-                break
-
-        # Forecast attributes in ApexCharts-friendly format
-        raw_today = [
-            {
-                "start_ts": p.start_ts,
-                "end_ts": p.end_ts,
-                "value": float(o),
-            }
-            for p, o in zip(prices_today, offsets_today)
-        ]
-        raw_tomorrow = [
-            {
-                "start_ts": p.start_ts,
-                "end_ts": p.end_ts,
-                "value": float(o),
+        cache_key = self._offset_cache_key()
+        forecasts = self._offset_cache.get(cache_key)
+        if forecasts is not None:
+            self.offset_cache_hits += 1
+        else:
+            self.offset_cache_misses += 1
+            with self.metrics.time("compute_offsets"):
+                forecasts = self._compute_forecasts(prices_today.concat(prices_tomorrow))
+            if len(self._offset_cache) >= _OFFSET_CACHE_SIZE:
+                self._offset_cache.pop(next(iter(self._offset_cache)))
+            self._offset_cache[cache_key] = forecasts
+            self._store.set_offsets(repr(cache_key), forecasts[self.area].offsets)
+        forecast = forecasts[self.area]
+        self._area_forecasts = forecasts
+        self._forecast = forecast
+        slot_ms = forecast.slot_ms
+        prices_all = forecast.prices
+
+        # Split back into today / tomorrow (price views share the combined buffers)
+        n_today = len(prices_today)
+        prices_today = prices_all.view(0, n_today)
+        prices_tomorrow = prices_all.view(n_today, len(prices_all))
+
+        now_ms = self._now_ms()
+        current_offset, current_price = self._current_slot(forecast, n_today, now_ms)
+
+        areas: dict[str, dict[str, Any]] = {}
+        for area, area_forecast in forecasts.items():
+            if area == self.area:
+                continue
+            n_area_today = len(self._area_series(area, self._prices_today_date))
+            area_offset, area_price = self._current_slot(area_forecast, n_area_today, now_ms)
+            areas[area] = {
+                "current_offset": area_offset,
+                "current_price": area_price,
+                "offset_attributes": area_forecast.offset_attributes,
+                "price_attributes": area_forecast.price_attributes,
             }
-            for p, o in zip(prices_tomorrow, offsets_tomorrow)
-        ]
 
         return {
             "slot_ms": slot_ms,
-            "current_offset": float(current_offset),
+            "current_offset": current_offset,
             "current_price": current_price,
             "currency_unit": CURRENCY_UNITS.get(self.currency, self.currency),
-            "offsets_today": raw_today,
-            "offsets_tomorrow": raw_tomorrow,
+            "offset_attributes": forecast.offset_attributes,
+            "price_attributes": forecast.price_attributes,
             "prices_today": prices_today,
             "prices_tomorrow": prices_tomorrow,
+            "areas": areas,
         }
 
+    def _current_slot(self, forecast: OffsetForecast, n_today: int, now_ms: int) -> tuple[float, float | None]:
+        """Offset and price of the "now" slot; builds the forecast's attributes if needed."""
+        # Forecast attributes are built once per forecast and then handed out
+        # by identity until prices or parameters change.
+        if forecast.offset_attributes is None or forecast.attribute_format != self.attribute_format:
+            with self.metrics.time("attributes"):
+                forecast.offset_attributes = build_offset_attributes(
+                    forecast, n_today, self.attribute_format, self.step_size
+                )
+                forecast.price_attributes = build_price_attributes(forecast, n_today, self.attribute_format)
+            forecast.attribute_format = self.attribute_format
+            self.attribute_builds += 1
+
+        current = forecast.slot_at(now_ms)
+        if current is None:
+            return 0.0, None
+        return float(current[1]), float(current[0].value)
+
     def _empty(self) -> dict[str, Any]:
         return {
             "slot_ms": None,
             "current_offset": 0.0,
-            "offsets_today": [],
-            "offsets_tomorrow": [],
-            "prices_today": [],
-            "prices_tomorrow": [],
+            "offset_attributes": EMPTY_ATTRIBUTES,
+            "price_attributes": EMPTY_ATTRIBUTES,
+            "prices_today": PriceSeries(),
+            "prices_tomorrow": PriceSeries(),
+            "areas": {},
         }
 
-    def _compute_offsets(self, prices: list[Point], horizon_slots: int) -> list[float]:
-        n = len(prices)
-        if n == 0:
-            return []
-
-        if self.max_offset <= 0:
-            return [0.0] * n
-
-        offsets: list[float] = [0.0] * n
-
-        # Rolling forward window: for each slot i, compute avg within [i, i+horizon_slots)
-        for i in range(n):
-            window = prices[i : min(n, i + horizon_slots)]
-            if len(window) < 2:
-                offsets[i] = 0.0
-                continue
-
-            avg_price = mean([p.value for p in window])
-
-            # diffs sum to 0 over the window by construction
-            diffs = [avg_price - p.value for p in window]
-            max_abs = max(abs(d) for d in diffs) if diffs else 0.0
-
-            if max_abs <= 0:
-                offsets[i] = 0.0
-                continue
-
-            k = self.max_offset / max_abs
-            raw = k * (avg_price - prices[i].value)
+    def forecast_response(
+        self,
+        area: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        resolution: timedelta | None = None,
+    ) -> dict[str, Any] | None:
+        """Prices and offsets of the last computed forecast in [start, end).
+
+        Served from the forecast the sensors use, without recomputation.
+        None if the area is not configured or has no prices yet.
+        """
+        area = area or self.area
+        forecast = self._forecast_for(area)
+        if forecast is None:
+            return None
+        resolution_ms = int(resolution.total_seconds() * 1000) if resolution else None
+        slot_ms = max(forecast.slot_ms, resolution_ms or 0)
+        return {
+            "area": area,
+            "currency_unit": CURRENCY_UNITS.get(self.currency, self.currency),
+            "slot_ms": slot_ms,
+            "forecast": build_forecast_rows(
+                forecast,
+                self._to_ms(start) if start is not None else None,
+                self._to_ms(end) if end is not None else None,
+                resolution_ms,
+            ),
+        }
 
-            offsets[i] = clamp(raw, -self.max_offset, self.max_offset)
+    def what_if(
+        self,
+        parameter_sets: list[dict[str, Any]],
+        area: str | None = None,
+        include_offsets: bool = True,
+    ) -> dict[str, Any] | None:
+        """Offsets and summary stats per parameter set, on the current prices.
+
+        Each set overrides some of the PARAMETERS (the rest keep their live
+        values). Nothing is applied or fetched: the prices come from the last
+        computed forecast, and all heuristic sets run as one stacked
+        compute_offsets_scenarios call that shares window statistics between
+        sets with the same horizon. None if the area has no forecast yet.
+        """
+        area = area or self.area
+        forecast = self._forecast_for(area)
+        if forecast is None:
+            return None
+        prices = forecast.prices
+        slot_ms = forecast.slot_ms
+
+        resolved: list[dict[str, Any]] = []
+        for overrides in parameter_sets:
+            params = {name: getattr(self, name) for name in PARAMETERS if name != "attribute_format"}
+            for name, value in overrides.items():
+                params[name] = PARAMETERS[name][1](value)
+            resolved.append(params)
+        mask = self._night_mask(prices) if any(p["night_cap"] for p in resolved) else None
+
+        results: list[list[float] | None] = [None] * len(resolved)
+        with self.metrics.time("what_if"):
+            for i, p in enumerate(resolved):
+                if p["offset_strategy"] != "optimizer":
+                    continue
+                solution = optimize_offsets(
+                    prices.values,
+                    _horizon_slots(p["horizon_hours"], slot_ms),
+                    p["max_offset"],
+                    step_size=p["step_size"],
+                    night_mask=mask if p["night_cap"] else None,
+                )
+                # Over budget: the heuristic below covers it, as in _compute_offsets
+                results[i] = solution.offsets if solution is not None else None
+
+            todo = [i for i, offsets in enumerate(results) if offsets is None]
+            scenarios = [
+                OffsetParams(
+                    horizon_slots=_horizon_slots(resolved[i]["horizon_hours"], slot_ms),
+                    max_offset=resolved[i]["max_offset"],
+                    smoothing_slots=_smoothing_slots(resolved[i]["smoothing_level"]),
+                    smoothing_mode=resolved[i]["smoothing_mode"],
+                    step_size=resolved[i]["step_size"],
+                    night_cap=resolved[i]["night_cap"],
+                )
+                for i in todo
+            ]
+            batch = compute_offsets_scenarios(prices.values, scenarios, mask, engine=self.offset_engine)
+            for i, offsets in zip(todo, batch):
+                results[i] = offsets
+
+        values = prices.values
+        mean_price = sum(values) / len(values) if values else 0.0
+        sets: list[dict[str, Any]] = []
+        for p, offsets in zip(resolved, results):
+            row: dict[str, Any] = {"parameters": p, **_offset_summary(offsets, values, mean_price)}
+            if include_offsets:
+                row["offsets"] = [round(o, 3) for o in offsets]
+            sets.append(row)
+
+        response: dict[str, Any] = {"area": area, "slot_ms": slot_ms}
+        if include_offsets:
+            response["start_ts"] = list(prices.start_ts)
+        response["results"] = sets
+        return response
+
+    def _forecast_for(self, area: str) -> OffsetForecast | None:
+        if area == self.area:
+            return self._forecast
+        return self._area_forecasts.get(area)
+
+    def _to_ms(self, when: datetime | None) -> int:
+        if when is None:
+            return self._now_ms()
+        return int(dt_util.as_utc(when).timestamp() * 1000)
+
+    def _offset_cache_key(self) -> tuple:
+        return (
+            self._prices_today_fp,
+            self._prices_tomorrow_fp,
+            self.horizon_hours,
+            self.max_offset,
+            self.smoothing_slots,
+            self.smoothing_mode,
+            self.step_size,
+            self.night_cap,
+            self.night_start,
+            self.night_end,
+            self.offset_engine,
+            self.offset_strategy,
+            self._area_fingerprints(),
+        )
 
-        # Optional smoothing (moving average) over offsets
-        offsets = moving_average(offsets, self.smoothing_slots)
+    def _area_fingerprints(self) -> tuple:
+        days = (self._prices_today_date, self._prices_tomorrow_date)
+        return tuple(
+            (area, day, by_date[day][1])
+            for area in self.extra_areas
+            if (by_date := self._area_prices.get(area))
+            for day in days
+            if day in by_date
+        )
 
-        # Keep within bounds after smoothing
-        offsets = [clamp(o, -self.max_offset, self.max_offset) for o in offsets]
+    def _area_series(self, area: str, day: date | None) -> PriceSeries:
+        entry = self._area_prices.get(area, {}).get(day) if day is not None else None
+        return entry[0] if entry is not None else PriceSeries()
 
-        # Apply step size snapping after smoothing and clamp again
-        if self.step_size > 0:
-            offsets = [quantize_step(o, self.step_size) for o in offsets]
-            offsets = [clamp(o, -self.max_offset, self.max_offset) for o in offsets]
+    def _invalidate_offset_cache(self) -> None:
+        self._offset_cache.clear()
 
-        # Optional night cap (22:30-05:00 Stockholm time)
-        offsets = self._apply_night_cap(offsets, prices, horizon_slots)
+    def _compute_forecasts(self, prices_all: PriceSeries) -> dict[str, OffsetForecast]:
+        """Offset forecasts for the primary area and every additional area with prices.
 
-        # Re-apply step size after night cap to keep consistent increments
-        if self.step_size > 0:
-            offsets = [quantize_step(o, self.step_size) for o in offsets]
-            offsets = [clamp(o, -self.max_offset, self.max_offset) for o in offsets]
-        return offsets
+        Series that share a slot length are computed as one batch (stacked
+        into a single array when numpy is available).
+        """
+        series: dict[str, PriceSeries] = {self.area: prices_all}
+        for area in self.extra_areas:
+            area_all = self._area_series(area, self._prices_today_date).concat(
+                self._area_series(area, self._prices_tomorrow_date)
+            )
+            if area_all:
+                series[area] = area_all
+
+        by_slot: dict[int, list[str]] = {}
+        for area, prices in series.items():
+            by_slot.setdefault(infer_slot_ms(prices), []).append(area)
+
+        forecasts: dict[str, OffsetForecast] = {}
+        for slot_ms, areas in by_slot.items():
+            horizon_slots = _horizon_slots(self.horizon_hours, slot_ms)
+            batch = self._compute_offsets(areas, [series[area] for area in areas], horizon_slots)
+            for area, offsets in zip(areas, batch):
+                forecasts[area] = OffsetForecast(series[area], offsets, slot_ms)
+        return forecasts
+
+    def _compute_offsets(
+        self, areas: list[str], series: list[PriceSeries], horizon_slots: int
+    ) -> list[list[float]]:
+        # Optional night cap (night_start-night_end Stockholm time, 22:30-05:00 by default)
+        masks = [self._night_mask(prices) for prices in series] if self.night_cap else [None] * len(series)
+
+        results: list[list[float] | None] = [None] * len(series)
+        self.night_cap_residual = 0.0
+        if self.offset_strategy == "optimizer":
+            for i, area in enumerate(areas):
+                results[i] = self._optimize(area, series[i], horizon_slots, masks[i])
+
+        # The heuristic computes everything the optimizer did not (or could not in time)
+        todo = [i for i, offsets in enumerate(results) if offsets is None]
+        if not todo:
+            return results
+
+        stats: dict[str, Any] = {}
+        batch = compute_offsets_batch(
+            [series[i].values for i in todo],
+            horizon_slots,
+            self.max_offset,
+            smoothing_slots=self.smoothing_slots,
+            step_size=self.step_size,
+            night_masks=[masks[i] for i in todo] if self.night_cap else None,
+            engine=self.offset_engine,
+            stats=stats,
+            smoothing_mode=self.smoothing_mode,
+        )
+        for i, offsets in zip(todo, batch):
+            results[i] = offsets
+        for key in STAGE_KEYS:
+            if key in stats:
+                self.metrics.record(f"stage_{key.removesuffix('_ms')}", stats[key])
+        residuals = stats.get("night_cap_residual") or [0.0]
+        self.night_cap_residual = max(self.night_cap_residual, *residuals, key=abs)
+        if abs(self.night_cap_residual) > 1e-6:
+            self.logger.debug(
+                "Night cap leaves a residual of %.3f (all day slots saturated)",
+                self.night_cap_residual,
+            )
+        return results
+
+    def _optimize(
+        self, area: str, prices: PriceSeries, horizon_slots: int, mask: list[bool] | None
+    ) -> list[float] | None:
+        """Optimizer offsets for one area, or None to fall back to the heuristic."""
+        stats: dict[str, Any] = {}
+        solution = optimize_offsets(
+            prices.values,
+            horizon_slots,
+            self.max_offset,
+            step_size=self.step_size,
+            night_mask=mask,
+            previous=self._optimized.get(area),
+            stats=stats,
+        )
+        if solution is None:
+            self.metrics.failure("optimizer")
+            self.optimizer_fallbacks += 1
+            self.logger.debug(
+                "Optimizer exceeded its %.0f ms budget for %s; using the heuristic",
+                DEFAULT_BUDGET_MS,
+                area,
+            )
+            return None
+        self.metrics.record("optimizer", stats["optimizer_ms"])
+        self._optimized[area] = solution
+        # Reported with the heuristic's night-cap residual (diagnostics)
+        self.night_cap_residual = max(self.night_cap_residual, solution.residual, key=abs)
+        return solution.offsets
 
     async def async_start(self) -> None:
+        """Start timers and request missing prices from the retry scheduler.
+
+        Setup does not wait for Nordpool; sensors stay unavailable (or serve
+        prices restored by async_load_cache) until the first fetch lands.
+        """
         self._schedule_next_tomorrow_fetch()
         self._schedule_midnight_roll()
+        self._schedule_slot_refresh()
         await self.async_refresh_prices(startup=True)
 
+    @property
+    def has_prices(self) -> bool:
+        return bool(self._prices_today or self._prices_tomorrow)
+
     async def async_refresh_prices(self, startup: bool = False) -> None:
+        """Hand every missing date to the retry scheduler.
+
+        Dates requested together are fetched in the same cycle. Dates
+        restored from the persistent cache are not fetched again.
+        """
         now_local = self._now_stockholm()
         today = now_local.date()
 
-        if startup:
-            startup_deadline = now_local + timedelta(minutes=2)
-            await self._attempt_fetch_with_retry_blocking(
-                today,
-                startup_deadline,
-                "today",
-                retry_interval_seconds=10,
-            )
-        else:
-            await self._attempt_fetch_with_retry(today, now_local + timedelta(minutes=1), "today")
+        if not self._has_prices_for(today):
+            window = timedelta(minutes=2 if startup else 1)
+            self._retry.request(today, "today", now_local + window)
 
-        now_local = self._now_stockholm()
         if now_local.time() >= time(13, 30):
-            tomorrow = now_local.date() + timedelta(days=1)
-            if startup:
-                # On restart, retry tomorrow after today's fetch completes.
-                await asyncio.sleep(5)
-                await self._attempt_fetch_with_retry_blocking(
-                    tomorrow,
-                    now_local + timedelta(minutes=2),
-                    "tomorrow",
-                    retry_interval_seconds=10,
-                )
+            tomorrow = today + timedelta(days=1)
+            if self._has_prices_for(tomorrow):
                 return
+            if startup:
+                deadline = now_local + timedelta(minutes=2)
+            else:
+                # After 13:40 this is a single attempt
+                deadline = max(now_local, datetime.combine(today, time(13, 40), tzinfo=self._tz))
+            self._retry.request(tomorrow, "tomorrow", deadline)
+
+    def _has_prices_for(self, day: date) -> bool:
+        """True when the primary and every additional area have prices for day."""
+        return not self._missing_areas(day)
+
+    def _missing_areas(self, day: date) -> tuple[str, ...]:
+        """Areas (primary first) without stored prices for day."""
+        return tuple(
+            area
+            for area in self.areas
+            if (
+                day not in (self._prices_today_date, self._prices_tomorrow_date)
+                if area == self.area
+                else day not in self._area_prices.get(area, {})
+            )
+        )
 
-            deadline = datetime.combine(now_local.date(), time(13, 40), tzinfo=self._tz)
-            if now_local > deadline:
-                await self._fetch_prices_for_date(tomorrow)
-                return
-            await self._attempt_fetch_with_retry(tomorrow, deadline, "tomorrow")
+    def retry_diagnostics(self) -> dict[str, Any]:
+        """Attempt counts and last errors of pending and recent price fetches."""
+        return self._retry.diagnostics()
+
+    @property
+    def cache_hit_rate(self) -> float | None:
+        lookups = self.offset_cache_hits + self.offset_cache_misses
+        return round(self.offset_cache_hits / lookups, 3) if lookups else None
+
+    def attribute_size(self) -> int | None:
+        """Serialized size (bytes of JSON) of the primary area's offset and price attributes."""
+        data = self.data
+        if not data or data.get("slot_ms") is None:
+            return None
+        offset_attrs = data["offset_attributes"]
+        price_attrs = data["price_attributes"]
+        # Attributes are handed out by identity until rebuilt, so the size is too
+        cached = self._attribute_size
+        if cached is not None and cached[0] is offset_attrs and cached[1] is price_attrs:
+            return cached[2]
+        size = len(json.dumps(offset_attrs, default=str)) + len(json.dumps(price_attrs, default=str))
+        self._attribute_size = (offset_attrs, price_attrs, size)
+        return size
+
+    def diagnostics(self) -> dict[str, Any]:
+        """Parameters, timings and cache statistics for the diagnostics download."""
+        return {
+            "parameters": {
+                "areas": list(self.areas),
+                "currency": self.currency,
+                "include_vat": self.include_vat,
+                "horizon_hours": self.horizon_hours,
+                "max_offset": self.max_offset,
+                "smoothing_level": self.smoothing_level,
+                "smoothing_mode": self.smoothing_mode,
+                "step_size": self.step_size,
+                "night_cap": self.night_cap,
+                "night_start": self.night_start.isoformat(),
+                "night_end": self.night_end.isoformat(),
+                "offset_engine": self.offset_engine,
+                "offset_strategy": self.offset_strategy,
+                "attribute_format": self.attribute_format,
+            },
+            "prices": {
+                "today": _day_diagnostics(self._prices_today_date, self._prices_today),
+                "tomorrow": _day_diagnostics(self._prices_tomorrow_date, self._prices_tomorrow),
+                "extra_areas": {
+                    area: sorted(day.isoformat() for day in self._area_prices.get(area, {}))
+                    for area in self.extra_areas
+                },
+            },
+            "startup": {
+                "setup_duration_s": self.setup_duration,
+                "prices_ready_after_s": self.prices_ready_after,
+            },
+            "last_fetch": self.last_fetch.isoformat() if self.last_fetch else None,
+            "last_update": self.last_update.isoformat() if self.last_update else None,
+            "offset_cache": {
+                "entries": len(self._offset_cache),
+                "hits": self.offset_cache_hits,
+                "misses": self.offset_cache_misses,
+                "hit_rate": self.cache_hit_rate,
+            },
+            "attribute_builds": self.attribute_builds,
+            "attribute_size": self.attribute_size(),
+            "night_cap_residual": self.night_cap_residual,
+            "optimizer_fallbacks": self.optimizer_fallbacks,
+            "parameter_updates": {
+                "updates": self.parameter_updates,
+                "refreshes": self.parameter_refreshes,
+                "collapsed": self.collapsed_parameter_updates,
+            },
+            "metrics": self.metrics.as_dict(),
+            "retries": self.retry_diagnostics(),
+            "price_registry": self._price_registry.diagnostics(),
+        }
 
     def _roll_prices_if_needed(self) -> None:
         today = self._now_stockholm().date()
@@ -265,12 +716,17 @@ class EnergyBalancerCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         if self._prices_tomorrow_date == today:
             self._prices_today = self._prices_tomorrow
             self._prices_today_date = self._prices_tomorrow_date
-            self._prices_tomorrow = []
+            self._prices_today_fp = self._prices_tomorrow_fp
+            self._prices_tomorrow = PriceSeries()
             self._prices_tomorrow_date = None
+            self._prices_tomorrow_fp = None
 
     def _now_stockholm(self) -> datetime:
         return datetime.now(self._tz)
 
+    def _now_ms(self) -> int:
+        return int(dt_util.utcnow().timestamp() * 1000)
+
     def _next_stockholm_datetime(self, hour: int, minute: int, second: int) -> datetime:
         now = self._now_stockholm()
         target = now.replace(hour=hour, minute=minute, second=second, microsecond=0)
@@ -299,171 +755,196 @@ class EnergyBalancerCoordinator(DataUpdateCoordinator[dict[str, Any]]):
             self._midnight_unsub()
         self._midnight_unsub = async_track_point_in_time(self.hass, self._handle_midnight_roll, when_utc)
 
+    def _next_slot_boundary_ms(self, now_ms: int) -> int:
+        if self._forecast is not None:
+            boundary = self._forecast.next_boundary_ms(now_ms)
+            if boundary is not None:
+                return boundary
+
+        # No slot covers "now": fall back to the grid implied by the slot length
+        if self._forecast is not None:
+            slot_ms = self._forecast.slot_ms
+        else:
+            slot_ms = infer_slot_ms(self._prices_today)
+        return (now_ms // slot_ms + 1) * slot_ms
+
+    def _schedule_slot_refresh(self) -> None:
+        when_utc = dt_util.utc_from_timestamp(self._next_slot_boundary_ms(self._now_ms()) / 1000.0)
+        if self._slot_unsub:
+            self._slot_unsub()
+        self._slot_unsub = async_track_point_in_time(self.hass, self._handle_slot_boundary, when_utc)
+
+    async def _handle_slot_boundary(self, _now: datetime) -> None:
+        self._slot_unsub = None
+        try:
+            await self.async_refresh()
+        finally:
+            self._schedule_slot_refresh()
+
     async def _handle_tomorrow_fetch(self, _now: datetime) -> None:
         today = self._now_stockholm().date()
         tomorrow = today + timedelta(days=1)
         deadline = datetime.combine(today, time(13, 40), tzinfo=self._tz)
-        await self._attempt_fetch_with_retry_blocking(
-            tomorrow,
-            deadline,
-            "tomorrow",
-            retry_interval_seconds=10,
-        )
+        if not self._has_prices_for(tomorrow):
+            self._retry.request(tomorrow, "tomorrow", deadline)
         self._schedule_next_tomorrow_fetch()
 
     async def _handle_midnight_roll(self, _now: datetime) -> None:
         self._roll_prices_if_needed()
         today = self._now_stockholm().date()
-        if not self._prices_today:
-            await self._attempt_fetch_with_retry_blocking(
-                today,
-                self._now_stockholm() + timedelta(minutes=1),
-                "today",
-                retry_interval_seconds=10,
-            )
+        self._store.prune(today)
+        self._price_registry.prune(today)
+        for by_date in self._area_prices.values():
+            for day in [d for d in by_date if d < today]:
+                del by_date[day]
+        # Retries still pending for a date that is now in the past are dropped
+        for pending in self._retry.pending:
+            if pending < today:
+                self._retry.cancel(pending)
+        if not self._has_prices_for(today):
+            self._retry.request(today, "today", self._now_stockholm() + timedelta(minutes=1))
         await self.async_request_refresh()
         self._schedule_midnight_roll()
 
-    def _schedule_retry(
-        self,
-        when_utc: datetime,
-        target_date: date,
-        deadline_local: datetime,
-        label: str,
-        retry_interval_seconds: int,
-    ) -> None:
-        if self._retry_unsub:
-            self._retry_unsub()
-        self._retry_unsub = async_track_point_in_time(
-            self.hass,
-            partial(self._handle_retry, target_date, deadline_local, label, retry_interval_seconds),
-            when_utc,
+    async def _async_prices_fetched(self) -> None:
+        self.logger.debug(
+            "Prices fetched %.2fs after startup (%d pending retries)",
+            time_monotonic() - self._created_at,
+            len(self._retry.pending),
         )
+        await self.async_request_refresh()
 
-    async def _handle_retry(
-        self,
-        target_date: date,
-        deadline_local: datetime,
-        label: str,
-        retry_interval_seconds: int,
-        _now: datetime,
-    ) -> None:
-        await self._attempt_fetch_with_retry(target_date, deadline_local, label, retry_interval_seconds)
-
-    async def _attempt_fetch_with_retry(
-        self,
-        target_date: date,
-        deadline_local: datetime,
-        label: str,
-        retry_interval_seconds: int = 60,
-    ) -> bool:
-        ok = await self._fetch_prices_for_date(target_date)
-        if ok:
-            if self._retry_unsub:
-                self._retry_unsub()
-                self._retry_unsub = None
-            await self.async_request_refresh()
-            return True
-
-        now_utc = dt_util.utcnow()
-        deadline_utc = dt_util.as_utc(deadline_local)
-        if now_utc < deadline_utc:
-            self._schedule_retry(
-                now_utc + timedelta(seconds=retry_interval_seconds),
-                target_date,
-                deadline_local,
-                label,
-                retry_interval_seconds,
-            )
-            return False
-
-        self.logger.error(
-            "Failed to fetch %s prices before %s",
-            label,
-            deadline_local.isoformat(),
-        )
-        return False
+    async def _async_fetch_dates(self, dates: list[date]) -> dict[date, dict[str, str | None]]:
+        """Fetch the missing areas for all dates concurrently and store the ones that arrived.
 
-    async def _attempt_fetch_with_retry_blocking(
-        self,
-        target_date: date,
-        deadline_local: datetime,
-        label: str,
-        retry_interval_seconds: int = 60,
-    ) -> bool:
-        deadline_utc = dt_util.as_utc(deadline_local)
-        while True:
-            ok = await self._fetch_prices_for_date(target_date)
-            if ok:
-                await self.async_request_refresh()
-                return True
-
-            if dt_util.utcnow() >= deadline_utc:
-                break
-            await asyncio.sleep(retry_interval_seconds)
-
-        self.logger.error(
-            "Failed to fetch %s prices before %s",
-            label,
-            deadline_local.isoformat(),
-        )
-        return False
+        Series come from the domain-wide price registry, which shares them
+        (and in-flight service calls) with other entries. Returns, per date,
+        None for every area stored or a short error description; areas that
+        already have prices are not fetched again.
+        """
+        missing = {day: self._missing_areas(day) for day in dates}
 
-    async def _fetch_prices_for_date(self, asked_date: date) -> bool:
         if not self.hass.services.has_service("nordpool", "get_prices_for_date"):
-            return False
+            self.metrics.failure("fetch")
+            return {day: dict.fromkeys(areas, "nordpool service unavailable") for day, areas in missing.items()}
 
         config_entry_id = self._get_nordpool_config_entry_id()
         if not config_entry_id:
-            return False
-
-        service_data = {
-            "config_entry": config_entry_id,
-            "date": asked_date,
-            "areas": self.area,
-            "currency": self.currency,
-        }
-
-        try:
-            response = await self.hass.services.async_call(
-                "nordpool",
-                "get_prices_for_date",
-                service_data,
-                blocking=True,
-                return_response=True,
+            self.metrics.failure("fetch")
+            return {day: dict.fromkeys(areas, "nordpool config entry not found") for day, areas in missing.items()}
+
+        currency, include_vat = self.currency, self.include_vat
+        start = perf_counter()
+        fetched = await asyncio.gather(
+            *(
+                self._price_registry.async_get_prices(config_entry_id, areas, currency, include_vat, day)
+                for day, areas in missing.items()
             )
-        except ServiceValidationError:
-            return False
-        except Exception:  # noqa: BLE001
-            return False
-
-        if not isinstance(response, dict):
-            return False
-
-        area_key = self.area.upper()
-        points = normalize_raw_points(response.get(area_key))
-        if points:
-            vat_rate = VAT_BY_AREA.get(area_key, 0.0) if self.include_vat else 0.0
-            points = [
-                Point(
-                    p.start_ts,
-                    p.end_ts,
-                    round((p.value / 1000.0) * (1.0 + vat_rate), 2),
-                )
-                for p in points
-            ]
-        if not points:
-            return False
+        )
+        fetch_ms = (perf_counter() - start) * 1000.0
+        if (self.currency, self.include_vat) != (currency, include_vat):
+            # The options changed while fetching; async_reload_prices has
+            # requested these dates again in the new setting
+            return {day: dict.fromkeys(areas, "currency or VAT changed") for day, areas in missing.items()}
+
+        results: dict[date, dict[str, str | None]] = {}
+        stored = failed = False
+        for day, by_area in zip(missing, fetched):
+            results[day] = {}
+            for area, series in by_area.items():
+                if isinstance(series, str):
+                    results[day][area] = series
+                    failed = True
+                    continue
+                self._set_prices(day, series, area)
+                self._store.set_prices(area, currency, include_vat, day, series)
+                results[day][area] = None
+                stored = True
+
+        if failed:
+            self.metrics.failure("fetch")
+        else:
+            self.metrics.record("fetch", fetch_ms)
+        if stored:
+            self.last_fetch = dt_util.utcnow()
+        if self.prices_ready_after is None and self.has_prices:
+            self.prices_ready_after = time_monotonic() - self._created_at
+        return results
+
+    def _set_prices(self, day: date, points: PriceSeries, area: str | None = None) -> None:
+        if area is not None and area != self.area:
+            self._area_prices.setdefault(area, {})[day] = (points, points.fingerprint())
+            self._invalidate_offset_cache()
+            return
 
+        fingerprint = (day, points.fingerprint())
         today = self._now_stockholm().date()
-        if asked_date == today:
+        if day == today:
             self._prices_today = points
-            self._prices_today_date = asked_date
+            self._prices_today_date = day
+            self._prices_today_fp = fingerprint
         else:
             self._prices_tomorrow = points
-            self._prices_tomorrow_date = asked_date
+            self._prices_tomorrow_date = day
+            self._prices_tomorrow_fp = fingerprint
+
+        self._invalidate_offset_cache()
+
+    async def async_load_cache(self) -> None:
+        """Restore prices (and offsets, if the parameters still match) saved before a restart."""
+        await self._store.async_load()
+        today = self._now_stockholm().date()
+        self._store.prune(today)
+        self._restore_prices(today)
 
-        return True
+        n = len(self._prices_today) + len(self._prices_tomorrow)
+        if not n:
+            return
+        cache_key = self._offset_cache_key()
+        offsets = self._store.get_offsets(repr(cache_key))
+        # Only the primary area's offsets are persisted
+        if offsets is not None and len(offsets) == n and not self.extra_areas:
+            prices_all = self._prices_today.concat(self._prices_tomorrow)
+            self._offset_cache[cache_key] = {
+                self.area: OffsetForecast(prices_all, offsets, infer_slot_ms(prices_all))
+            }
+        self.logger.debug(
+            "Restored %d cached price slots (offsets %s)",
+            n,
+            "restored" if cache_key in self._offset_cache else "recomputed",
+        )
+
+    def _restore_prices(self, today: date) -> None:
+        """Take today's and tomorrow's series from the price registry or the store."""
+        for day in (today, today + timedelta(days=1)):
+            for area in self.areas:
+                series = self._price_registry.get(area, self.currency, self.include_vat, day)
+                if series is None:
+                    series = self._store.get_prices(area, self.currency, self.include_vat, day)
+                    if series is not None:
+                        series = self._price_registry.add(area, self.currency, self.include_vat, day, series)
+                if series is None:
+                    continue
+                self._set_prices(day, series, area)
+                if area == self.area and self.prices_ready_after is None:
+                    self.prices_ready_after = time_monotonic() - self._created_at
+
+    async def async_reload_prices(self) -> None:
+        """Replace the series held for today/tomorrow after a currency or VAT change.
+
+        The registry and the store are keyed by currency and VAT, so series
+        already known in the new setting (e.g. when switching back) are
+        restored from them; the rest are fetched.
+        """
+        self._prices_today = PriceSeries()
+        self._prices_tomorrow = PriceSeries()
+        self._prices_today_date = self._prices_tomorrow_date = None
+        self._prices_today_fp = self._prices_tomorrow_fp = None
+        self._area_prices.clear()
+        self._optimized.clear()
+        self._invalidate_offset_cache()
+        self._restore_prices(self._now_stockholm().date())
+        await self.async_refresh_prices()
 
     def _get_nordpool_config_entry_id(self) -> str | None:
         if self._nordpool_entry_id:
@@ -477,87 +958,132 @@ class EnergyBalancerCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         self._nordpool_entry_id = entity.config_entry_id
         return self._nordpool_entry_id
 
-    async def async_set_max_offset(self, value: float) -> None:
-        self.max_offset = float(value)
-        await self.async_refresh()
+    async def async_update_parameters(self, **params: Any) -> None:
+        """Apply parameter changes (see PARAMETERS) and schedule one refresh.
 
-    async def async_set_smoothing_level(self, value: int) -> None:
-        self.smoothing_level = int(value)
-        if self.smoothing_level <= 0:
-            self.smoothing_slots = 1
-        else:
-            self.smoothing_slots = 1 + 2 * self.smoothing_level
-        await self.async_refresh()
+        The new values take effect immediately, so entities can report them
+        right away. Persisting them to the entry options and recomputing is
+        debounced: every change restarts a PARAMETER_DEBOUNCE_SECONDS wait,
+        so a burst of changes (e.g. dragging a slider) is written once and
+        produces a single recompute after it ends.
+        """
+        for name, value in params.items():
+            option, normalize, _ = PARAMETERS[name]
+            value = normalize(value)
+            setattr(self, name, value)
+            self._pending_options[option] = value
+        self.smoothing_slots = _smoothing_slots(self.smoothing_level)
+        # No cache invalidation needed: every parameter that affects offsets
+        # is part of the cache key, so switching back reuses the old result.
+        self.parameter_updates += 1
+        if self._parameter_unsub:
+            self._parameter_unsub()
+        self._parameter_unsub = async_call_later(
+            self.hass, PARAMETER_DEBOUNCE_SECONDS, self._async_commit_parameters
+        )
 
-    async def async_set_step_size(self, value: float) -> None:
-        self.step_size = float(value)
+    async def _async_commit_parameters(self, _now: datetime) -> None:
+        self._parameter_unsub = None
+        self._write_pending_options()
+        self.parameter_refreshes += 1
         await self.async_refresh()
 
-    async def async_set_horizon_hours(self, value: int) -> None:
-        self.horizon_hours = int(value)
-        await self.async_refresh()
+    def _write_pending_options(self) -> None:
+        if not self._pending_options:
+            return
+        options = {**(self.entry.options or {}), **self._pending_options}
+        self._pending_options = {}
+        self._own_entry_update = (dict(self.entry.data), options)
+        self.hass.config_entries.async_update_entry(self.entry, options=options)
 
-    async def async_set_night_cap(self, value: bool) -> None:
-        self.night_cap = bool(value)
-        await self.async_refresh()
+    def is_own_entry_update(self, entry: ConfigEntry) -> bool:
+        """True if entry holds exactly what the last parameter commit wrote.
+
+        The update listener uses this to skip reloading parameters the
+        coordinator already applied (and refreshed for).
+        """
+        own = self._own_entry_update
+        self._own_entry_update = None
+        return own is not None and own == (dict(entry.data), dict(entry.options))
+
+    @property
+    def collapsed_parameter_updates(self) -> int:
+        """Parameter updates that did not need a refresh of their own."""
+        pending = 1 if self._pending_options else 0
+        return max(0, self.parameter_updates - self.parameter_refreshes - pending)
 
     async def async_stop(self) -> None:
         """Stop any background timers/tasks created by this coordinator.
 
-        DataUpdateCoordinator's own update_interval tracking is handled by HA,
-        but if we add our own tasks later, we cancel them here.
+        Refreshes are scheduled by our own slot-boundary timer rather than
+        DataUpdateCoordinator's update_interval, so it is cancelled here too,
+        along with pending price fetch retries.
         """
-        # Example future-proofing:
-        # if getattr(self, "_task", None):
-        #     self._task.cancel()
-        #     self._task = None
         if self._daily_unsub:
             self._daily_unsub()
             self._daily_unsub = None
         if self._midnight_unsub:
             self._midnight_unsub()
             self._midnight_unsub = None
-        if self._retry_unsub:
-            self._retry_unsub()
-            self._retry_unsub = None
+        if self._slot_unsub:
+            self._slot_unsub()
+            self._slot_unsub = None
+        self._retry.cancel_all()
+        # Keep parameter changes still waiting to be committed
+        if self._parameter_unsub:
+            self._parameter_unsub()
+            self._parameter_unsub = None
+        self._write_pending_options()
         return
 
-    def _apply_night_cap(
-        self,
-        offsets: list[float],
-        prices: list[Point],
-        horizon_slots: int,
-    ) -> list[float]:
-        if not self.night_cap or not offsets:
-            return offsets
-
-        night_mask = [self._is_night_slot(p.start_ts) for p in prices]
-        out = offsets[:]
-
-        for i, is_night in enumerate(night_mask):
-            if is_night and out[i] > 0:
-                out[i] = 0.0
-
-        # Rebalance overall sum to keep net energy neutral without per-window oscillations
-        for _ in range(3):
-            total = sum(out)
-            if abs(total) < 1e-6:
-                break
-            adjustable = [
-                j
-                for j in range(len(out))
-                if not night_mask[j] and -self.max_offset < out[j] < self.max_offset
-            ]
-            if not adjustable:
-                break
-            correction = total / len(adjustable)
-            for j in adjustable:
-                out[j] = clamp(out[j] - correction, -self.max_offset, self.max_offset)
-
-        return out
-
-    def _is_night_slot(self, start_ts_ms: int) -> bool:
-        dt_local = datetime.fromtimestamp(start_ts_ms / 1000.0, tz=dt_util.UTC).astimezone(self._tz)
-        t = dt_local.time()
-        return t >= time(22, 30) or t < time(5, 0)
+    def _night_mask(self, prices: PriceSeries) -> list[bool]:
+        starts = prices.start_ts
+        if not starts:
+            return []
 
+        # Only the first and last slot need a time zone conversion; every
+        # local day in between is resolved once and cached.
+        first = datetime.fromtimestamp(starts[0] / 1000.0, tz=dt_util.UTC).astimezone(self._tz).date()
+        last = datetime.fromtimestamp(starts[-1] / 1000.0, tz=dt_util.UTC).astimezone(self._tz).date()
+        intervals: list[tuple[int, int]] = []
+        day = first
+        while day <= last:
+            intervals.extend(self._night_intervals(day))
+            day += timedelta(days=1)
+        return night_mask(starts, intervals)
+
+    def _night_intervals(self, day: date) -> tuple[tuple[int, int], ...]:
+        key = (day, self.night_start, self.night_end)
+        cached = self._night_cache.get(key)
+        if cached is None:
+            if len(self._night_cache) >= 8:
+                self._night_cache.clear()
+            cached = night_intervals_ms(day, self.night_start, self.night_end, self._tz)
+            self._night_cache[key] = cached
+        return cached
+
+
+def _offset_summary(offsets: list[float], prices, mean_price: float) -> dict[str, Any]:
+    if not offsets:
+        return {"neutrality_sum": 0.0, "min": None, "max": None, "step_changes": 0, "cost_shift": 0.0}
+    return {
+        "neutrality_sum": round(sum(offsets), 4),
+        "min": round(min(offsets), 3),
+        "max": round(max(offsets), 3),
+        "step_changes": sum(1 for a, b in zip(offsets, offsets[1:]) if abs(a - b) > 1e-9),
+        # Offset times price deviation; negative means heat moves to cheaper slots
+        "cost_shift": round(sum(o * (p - mean_price) for o, p in zip(offsets, prices)), 4),
+    }
+
+
+def _day_diagnostics(day: date | None, prices: PriceSeries) -> dict[str, Any] | None:
+    if day is None:
+        return None
+    return {"date": day.isoformat(), "slots": len(prices)}
+
+
+def _parse_time(value: Any, default: str) -> time:
+    parsed = dt_util.parse_time(str(value)) if value else None
+    if parsed is None:
+        parsed = dt_util.parse_time(default)
+    return parsed
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from homeassistant.config_entries import ConfigEntry
+
+from .const import DOMAIN, LEGACY_ENTRY_UNIQUE_ID
+
+
+def entity_unique_id(entry: ConfigEntry, key: str) -> str:
+    """Unique id for an entity of entry.
+
+    The entry created while the integration was single-instance keeps its
+    original ids so existing entity ids and history survive; further entries
+    are scoped by entry_id.
+    """
+    base = f"{DOMAIN}_{key}"
+    if entry.unique_id == LEGACY_ENTRY_UNIQUE_ID:
+        return base
+    return f"{base}_{entry.entry_id}"
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+from array import array
+from collections.abc import Iterator
 from dataclasses import dataclass
-from datetime import datetime  # <-- add
+from functools import lru_cache
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+import hashlib
 import json
-from statistics import mean
+import math
 from typing import Any
 
 from homeassistant.util import dt as dt_util
@@ -12,13 +16,96 @@ from homeassistant.util import dt as dt_util
 DEFAULT_SLOT_MS = 15 * 60 * 1000  # 15 minutes
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Point:
     start_ts: int  # epoch ms (UTC)
     end_ts: int    # epoch ms (UTC)
     value: float
 
 
+def _raw_bytes(column) -> memoryview:
+    return memoryview(column).cast("B")
+
+
+class PriceSeries:
+    """Columnar price series: parallel epoch-ms timestamps and float values.
+
+    Columns are array('q')/array('d'), or memoryview slices of them for views
+    returned by view(). Iterating or indexing yields Point records.
+    """
+
+    __slots__ = ("start_ts", "end_ts", "values")
+
+    def __init__(self, start_ts=None, end_ts=None, values=None) -> None:
+        self.start_ts = start_ts if start_ts is not None else array("q")
+        self.end_ts = end_ts if end_ts is not None else array("q")
+        self.values = values if values is not None else array("d")
+
+    @classmethod
+    def from_points(cls, points) -> PriceSeries:
+        return cls(
+            array("q", [p.start_ts for p in points]),
+            array("q", [p.end_ts for p in points]),
+            array("d", [p.value for p in points]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, i: int) -> Point:
+        return Point(self.start_ts[i], self.end_ts[i], self.values[i])
+
+    def __iter__(self) -> Iterator[Point]:
+        for s, e, v in zip(self.start_ts, self.end_ts, self.values):
+            yield Point(s, e, v)
+
+    def view(self, lo: int, hi: int) -> PriceSeries:
+        """Zero-copy slice sharing this series' buffers."""
+        return PriceSeries(
+            memoryview(self.start_ts)[lo:hi],
+            memoryview(self.end_ts)[lo:hi],
+            memoryview(self.values)[lo:hi],
+        )
+
+    def concat(self, other: PriceSeries) -> PriceSeries:
+        """New series with other appended; copies are plain buffer copies."""
+        columns = []
+        for typecode, a, b in (
+            ("q", self.start_ts, other.start_ts),
+            ("q", self.end_ts, other.end_ts),
+            ("d", self.values, other.values),
+        ):
+            if isinstance(a, array) and isinstance(b, array):
+                columns.append(a + b)
+                continue
+            col = array(typecode)
+            col.frombytes(_raw_bytes(a))
+            col.frombytes(_raw_bytes(b))
+            columns.append(col)
+        return PriceSeries(*columns)
+
+    def scale(self, multiplier: float, divisor: float = 1.0, ndigits: int | None = None) -> None:
+        """In-place value = (value / divisor) * multiplier, optionally rounded."""
+        vals = self.values
+        if ndigits is None:
+            for i, v in enumerate(vals):
+                vals[i] = (v / divisor) * multiplier
+        else:
+            for i, v in enumerate(vals):
+                vals[i] = round((v / divisor) * multiplier, ndigits)
+
+    def fingerprint(self) -> int:
+        """Content hash, used to key cached offsets.
+
+        Stable across restarts (unlike hash()), so it can key persisted offsets.
+        """
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(_raw_bytes(self.start_ts))
+        digest.update(_raw_bytes(self.end_ts))
+        digest.update(_raw_bytes(self.values))
+        return int.from_bytes(digest.digest(), "big")
+
+
 def _parse_raw(raw: Any) -> list[dict[str, Any]]:
     """raw_* can be list[dict] OR a JSON string."""
     if raw is None:
@@ -67,9 +154,82 @@ def _to_ts_ms(v):
     return None
 
 
-def normalize_raw_points(raw: Any) -> list[Point]:
-    rows = _parse_raw(raw)
-    out: list[Point] = []
+@lru_cache(maxsize=4096)
+def _iso_to_ms(value: str) -> int | None:
+    """Epoch ms of an ISO timestamp with an explicit offset, else None.
+
+    Each slot boundary is both one row's end and the next row's start, and
+    retries fetch the same day again, so parses are cached.
+    """
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        return None
+    return int(dt.timestamp() * 1000)
+
+
+def _normalize_service_rows(
+    rows: list[dict[str, Any]],
+    multiplier: float,
+    divisor: float,
+    ndigits: int | None,
+) -> PriceSeries | None:
+    """Fast path for the nordpool.get_prices_for_date row shape.
+
+    Rows carry ISO "start"/"end" strings with an offset and a "price" (or
+    "value"). Values are scaled while parsing and the sort is skipped when
+    rows are already in order. Returns None as soon as a row needs the
+    general parser.
+    """
+    starts = array("q")
+    ends = array("q")
+    values = array("d")
+    ordered = True
+    last = None
+    prev_e = None
+    prev_end_ts = None
+    for r in rows:
+        val = r.get("value", r.get("price"))
+        if val is None:
+            continue
+        if "start_ts" in r or "end_ts" in r:
+            return None
+        s = r.get("start")
+        e = r.get("end")
+        if type(s) is not str or type(e) is not str:
+            return None
+        # Contiguous rows: this start is the previous row's end
+        start_ts = prev_end_ts if s == prev_e else _iso_to_ms(s)
+        end_ts = _iso_to_ms(e)
+        if start_ts is None or end_ts is None:
+            return None
+        prev_e = e
+        prev_end_ts = end_ts
+        try:
+            v = (float(val) / divisor) * multiplier
+        except (TypeError, ValueError):
+            return None
+        if ndigits is not None:
+            v = round(v, ndigits)
+        if last is not None and start_ts < last:
+            ordered = False
+        last = start_ts
+        starts.append(start_ts)
+        ends.append(end_ts)
+        values.append(v)
+
+    if not ordered:
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        starts = array("q", [starts[i] for i in order])
+        ends = array("q", [ends[i] for i in order])
+        values = array("d", [values[i] for i in order])
+    return PriceSeries(starts, ends, values)
+
+
+def _normalize_rows_generic(rows: list[dict[str, Any]]) -> PriceSeries:
+    out: list[tuple[int, int, float]] = []
 
     for r in rows:
         val = r.get("value", r.get("price"))
@@ -97,32 +257,208 @@ def normalize_raw_points(raw: Any) -> list[Point]:
         except Exception:
             continue
 
-        out.append(Point(int(start_ts), int(end_ts), fval))
+        out.append((int(start_ts), int(end_ts), fval))
 
-    out.sort(key=lambda p: p.start_ts)
-    return out
+    out.sort(key=lambda p: p[0])
+    return PriceSeries(
+        array("q", [p[0] for p in out]),
+        array("q", [p[1] for p in out]),
+        array("d", [p[2] for p in out]),
+    )
 
 
-def infer_slot_ms(points: list[Point]) -> int:
-    if len(points) >= 2:
-        d = points[1].start_ts - points[0].start_ts
+def normalize_raw_points(
+    raw: Any,
+    multiplier: float = 1.0,
+    divisor: float = 1.0,
+    ndigits: int | None = None,
+) -> PriceSeries:
+    """Sorted series from raw rows, with value = (value / divisor) * multiplier.
+
+    Same result as normalizing and then calling PriceSeries.scale().
+    """
+    rows = _parse_raw(raw)
+    series = _normalize_service_rows(rows, multiplier, divisor, ndigits)
+    if series is None:
+        series = _normalize_rows_generic(rows)
+        if multiplier != 1.0 or divisor != 1.0 or ndigits is not None:
+            series.scale(multiplier, divisor, ndigits)
+    return series
+
+
+def infer_slot_ms(points: PriceSeries) -> int:
+    starts = points.start_ts
+    if len(starts) >= 2:
+        d = starts[1] - starts[0]
         if 0 < d < 6 * 60 * 60 * 1000:
             return int(d)
     return DEFAULT_SLOT_MS
 
 
 def moving_average(values: list[float], window: int) -> list[float]:
+    """Centred moving average; windows shrink at the ends of the series."""
     if window <= 1:
-        return values[:]
+        return list(values)
+    n = len(values)
+    half = window // 2
+    prefix = [0.0] * (n + 1)
+    acc = 0.0
+    for i, v in enumerate(values):
+        acc += v
+        prefix[i + 1] = acc
     out: list[float] = []
+    for i in range(n):
+        lo = max(0, i - half)
+        hi = min(n, i + half + 1)
+        out.append((prefix[hi] - prefix[lo]) / (hi - lo))
+    return out
+
+
+def kernel_weights(window: int, mode: str) -> list[float]:
+    """Symmetric weights for offsets -half..half of a smoothing kernel."""
     half = window // 2
-    for i in range(len(values)):
+    if mode == "triangular":
+        return [float(half + 1 - abs(k)) for k in range(-half, half + 1)]
+    if mode == "gaussian":
+        # The window spans +/-2 sigma
+        sigma = max(half / 2.0, 0.5)
+        return [math.exp(-0.5 * (k / sigma) ** 2) for k in range(-half, half + 1)]
+    return [1.0] * (2 * half + 1)
+
+
+def weighted_average(values: list[float], weights: list[float]) -> list[float]:
+    """Centred weighted average; weights are renormalized where the kernel overhangs an end."""
+    n = len(values)
+    half = len(weights) // 2
+    out: list[float] = []
+    for i in range(n):
         lo = max(0, i - half)
-        hi = min(len(values), i + half + 1)
-        out.append(mean(values[lo:hi]))
+        hi = min(n, i + half + 1)
+        acc = 0.0
+        total = 0.0
+        for j in range(lo, hi):
+            w = weights[j - i + half]
+            acc += w * values[j]
+            total += w
+        out.append(acc / total)
+    return out
+
+
+def exponential_average(values: list[float], window: int) -> list[float]:
+    """Zero-phase exponential smoothing: one forward and one backward pass.
+
+    alpha follows the usual span convention 2 / (window + 1); running it in
+    both directions cancels the lag a single causal pass would add.
+    """
+    if window <= 1 or not values:
+        return list(values)
+    alpha = 2.0 / (window + 1)
+    out = list(values)
+    acc = out[0]
+    for i in range(len(out)):
+        acc += alpha * (out[i] - acc)
+        out[i] = acc
+    acc = out[-1]
+    for i in range(len(out) - 1, -1, -1):
+        acc += alpha * (out[i] - acc)
+        out[i] = acc
     return out
 
 
+def smooth(values: list[float], window: int, mode: str = "moving_average") -> list[float]:
+    if window <= 1:
+        return list(values)
+    if mode == "exponential":
+        return exponential_average(values, window)
+    if mode in ("gaussian", "triangular"):
+        return weighted_average(values, kernel_weights(window, mode))
+    return moving_average(values, window)
+
+
+def night_intervals_ms(day: date, start: time, end: time, tz: tzinfo) -> tuple[tuple[int, int], ...]:
+    """Night window of local date ``day`` as sorted [lo, hi) UTC epoch-ms intervals.
+
+    Covers every instant of the day whose local wall-clock time is in
+    [start, end) (wrapping midnight when start > end), the same test as
+    comparing each slot's local time. On DST days the day is split where
+    the UTC offset changes: a boundary in the skipped hour moves to the
+    switch, and a window in the repeated hour matches both occurrences.
+    """
+    if start == end:
+        return ()
+
+    day_lo = _local_midnight_ms(day, tz)
+    day_hi = _local_midnight_ms(day + timedelta(days=1), tz)
+    # Wall-clock ms since local midnight, as if the day had no DST switch
+    wall_epoch = int(datetime.combine(day, time(0, 0), tzinfo=timezone.utc).timestamp() * 1000)
+    s = _time_ms(start)
+    e = _time_ms(end)
+    windows = ((s, e),) if start < end else ((0, e), (s, 24 * 3_600_000))
+
+    cuts = [day_lo, *_offset_changes_ms(day_lo, day_hi, tz), day_hi]
+    out: list[tuple[int, int]] = []
+    for lo, hi in zip(cuts, cuts[1:]):
+        shift = _utcoffset_ms(lo, tz) - wall_epoch  # wall = utc + shift in this segment
+        for w_lo, w_hi in windows:
+            a = max(lo, w_lo - shift)
+            b = min(hi, w_hi - shift)
+            if a >= b:
+                continue
+            if out and out[-1][1] == a:
+                out[-1] = (out[-1][0], b)
+            else:
+                out.append((a, b))
+    out.sort()
+    return tuple(out)
+
+
+def _time_ms(t: time) -> int:
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1000 + t.microsecond // 1000
+
+
+def _utcoffset_ms(ts_ms: int, tz: tzinfo) -> int:
+    offset = datetime.fromtimestamp(ts_ms / 1000, tz).utcoffset()
+    return int(offset.total_seconds() * 1000) if offset is not None else 0
+
+
+def _local_midnight_ms(day: date, tz: tzinfo) -> int:
+    return int(datetime.combine(day, time(0, 0), tzinfo=tz).timestamp() * 1000)
+
+
+def _offset_changes_ms(lo: int, hi: int, tz: tzinfo) -> list[int]:
+    """UTC instants in (lo, hi) where the offset of tz changes, to the second."""
+    changes: list[int] = []
+    step = 3_600_000
+    prev_ts, prev = lo, _utcoffset_ms(lo, tz)
+    while prev_ts < hi:
+        ts = min(prev_ts + step, hi)
+        offset = _utcoffset_ms(ts, tz)
+        if offset != prev:
+            # Bisect to the first second with the new offset
+            a, b = prev_ts // 1000, ts // 1000
+            while b - a > 1:
+                mid = (a + b) // 2
+                if _utcoffset_ms(mid * 1000, tz) == prev:
+                    a = mid
+                else:
+                    b = mid
+            changes.append(b * 1000)
+        prev_ts, prev = ts, offset
+    return changes
+
+
+def night_mask(starts, intervals: list[tuple[int, int]]) -> list[bool]:
+    """Membership of sorted ``starts`` in sorted, disjoint ``intervals``."""
+    mask: list[bool] = []
+    j = 0
+    n_iv = len(intervals)
+    for ts in starts:
+        while j < n_iv and ts >= intervals[j][1]:
+            j += 1
+        mask.append(j < n_iv and ts >= intervals[j][0])
+    return mask
+
+
 def clamp(x: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, x))
 
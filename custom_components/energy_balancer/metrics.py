@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any
+
+# Upper bucket bounds in ms; the last bucket takes everything above
+BUCKETS_MS = (0.1, 0.5, 1.0, 5.0, 10.0, 50.0, 100.0, 500.0, 1000.0, 5000.0)
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RollingHistogram:
+    """Durations (ms) of the last ``maxlen`` samples, plus lifetime count and failures."""
+
+    __slots__ = ("_samples", "count", "failures", "last_ms")
+
+    def __init__(self, maxlen: int = 256) -> None:
+        self._samples: deque[float] = deque(maxlen=maxlen)
+        self.count = 0
+        self.failures = 0
+        self.last_ms: float | None = None
+
+    def add(self, ms: float) -> None:
+        self._samples.append(ms)
+        self.count += 1
+        self.last_ms = ms
+
+    def summary(self) -> dict[str, Any]:
+        samples = sorted(self._samples)
+        out: dict[str, Any] = {"count": self.count, "failures": self.failures, "last_ms": _round(self.last_ms)}
+        if not samples:
+            return out
+        buckets = [0] * (len(BUCKETS_MS) + 1)
+        for ms in samples:
+            buckets[bisect_left(BUCKETS_MS, ms)] += 1
+        labels = [f"<={b:g}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]:g}ms"]
+        out.update(
+            {
+                "window": len(samples),
+                "mean_ms": _round(sum(samples) / len(samples)),
+                "p50_ms": _round(_percentile(samples, 0.5)),
+                "p95_ms": _round(_percentile(samples, 0.95)),
+                "max_ms": _round(samples[-1]),
+                "buckets": {label: n for label, n in zip(labels, buckets) if n},
+            }
+        )
+        return out
+
+
+class Metrics:
+    """Named rolling histograms of hot-path durations."""
+
+    def __init__(self, maxlen: int = 256) -> None:
+        self._maxlen = maxlen
+        self._histograms: dict[str, RollingHistogram] = {}
+
+    def histogram(self, name: str) -> RollingHistogram:
+        hist = self._histograms.get(name)
+        if hist is None:
+            hist = self._histograms[name] = RollingHistogram(self._maxlen)
+        return hist
+
+    def record(self, name: str, ms: float) -> None:
+        self.histogram(name).add(ms)
+
+    def failure(self, name: str) -> None:
+        self.histogram(name).failures += 1
+
+    def last(self, name: str) -> float | None:
+        hist = self._histograms.get(name)
+        return hist.last_ms if hist is not None else None
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        """Record the duration of the block; an exception counts as a failure instead."""
+        start = perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.failure(name)
+            raise
+        self.record(name, (perf_counter() - start) * 1000.0)
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        return {name: hist.summary() for name, hist in sorted(self._histograms.items())}
+
+
+def _round(ms: float | None) -> float | None:
+    return None if ms is None else round(ms, 3)
@@ -3,13 +3,8 @@ from __future__ import annotations
 from homeassistant.components.number import NumberEntity
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import (
-    CONF_HORIZON_HOURS,
-    CONF_MAX_OFFSET,
-    CONF_SMOOTHING_LEVEL,
-    DATA_COORDINATOR,
-    DOMAIN,
-)
+from .const import DATA_COORDINATOR, DOMAIN
+from .entity import entity_unique_id
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
@@ -26,7 +21,6 @@ async def async_setup_entry(hass, entry, async_add_entities):
 
 class EnergyBalancerMaxOffsetNumber(CoordinatorEntity, NumberEntity):
     _attr_name = "Energy Balancer Max Offset"
-    _attr_unique_id = "energy_balancer_max_offset"
     _attr_icon = "mdi:arrow-expand-vertical"
     _attr_native_unit_of_measurement = "°C"
     _attr_native_min_value = 0.0
@@ -36,6 +30,7 @@ class EnergyBalancerMaxOffsetNumber(CoordinatorEntity, NumberEntity):
 
     def __init__(self, entry, coordinator):
         super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(entry, "max_offset")
         self.entry = entry
 
     @property
@@ -43,17 +38,13 @@ class EnergyBalancerMaxOffsetNumber(CoordinatorEntity, NumberEntity):
         return float(self.coordinator.max_offset)
 
     async def async_set_native_value(self, value: float) -> None:
-        # Persist into options so it survives restarts
-        new_options = dict(self.entry.options or {})
-        new_options[CONF_MAX_OFFSET] = float(value)
-        self.hass.config_entries.async_update_entry(self.entry, options=new_options)
-
-        await self.coordinator.async_set_max_offset(float(value))
+        # Persisted into options by the coordinator, so it survives restarts
+        await self.coordinator.async_update_parameters(max_offset=float(value))
+        self.async_write_ha_state()
 
 
 class EnergyBalancerHorizonHoursNumber(CoordinatorEntity, NumberEntity):
     _attr_name = "Energy Balancer Horizon Hours"
-    _attr_unique_id = "energy_balancer_horizon_hours"
     _attr_icon = "mdi:arrow-collapse-right"
     _attr_native_unit_of_measurement = "h"
     _attr_native_min_value = 1
@@ -63,6 +54,7 @@ class EnergyBalancerHorizonHoursNumber(CoordinatorEntity, NumberEntity):
 
     def __init__(self, entry, coordinator):
         super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(entry, "horizon_hours")
         self.entry = entry
 
     @property
@@ -70,16 +62,12 @@ class EnergyBalancerHorizonHoursNumber(CoordinatorEntity, NumberEntity):
         return int(self.coordinator.horizon_hours)
 
     async def async_set_native_value(self, value: float) -> None:
-        new_options = dict(self.entry.options or {})
-        new_options[CONF_HORIZON_HOURS] = int(value)
-        self.hass.config_entries.async_update_entry(self.entry, options=new_options)
-
-        await self.coordinator.async_set_horizon_hours(int(value))
+        await self.coordinator.async_update_parameters(horizon_hours=int(value))
+        self.async_write_ha_state()
 
 
 class EnergyBalancerSmoothingLevelNumber(CoordinatorEntity, NumberEntity):
     _attr_name = "Energy Balancer Smoothing Level"
-    _attr_unique_id = "energy_balancer_smoothing_level"
     _attr_icon = "mdi:chart-bell-curve-cumulative"
     _attr_native_min_value = 0
     _attr_native_max_value = 10
@@ -88,6 +76,7 @@ class EnergyBalancerSmoothingLevelNumber(CoordinatorEntity, NumberEntity):
 
     def __init__(self, entry, coordinator):
         super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(entry, "smoothing_level")
         self.entry = entry
 
     @property
@@ -95,8 +84,5 @@ class EnergyBalancerSmoothingLevelNumber(CoordinatorEntity, NumberEntity):
         return int(self.coordinator.smoothing_level)
 
     async def async_set_native_value(self, value: float) -> None:
-        new_options = dict(self.entry.options or {})
-        new_options[CONF_SMOOTHING_LEVEL] = int(value)
-        self.hass.config_entries.async_update_entry(self.entry, options=new_options)
-
-        await self.coordinator.async_set_smoothing_level(int(value))
+        await self.coordinator.async_update_parameters(smoothing_level=int(value))
+        self.async_write_ha_state()
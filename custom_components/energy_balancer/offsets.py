@@ -0,0 +1,699 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from statistics import mean
+from time import perf_counter
+from typing import Any
+
+from .helpers import clamp, exponential_average, kernel_weights, quantize_step, smooth
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:  # numpy ships with Home Assistant, but keep a pure-Python path
+    np = None
+
+HAS_NUMPY = np is not None
+
+STAGE_KEYS = ("window_ms", "smooth_ms", "quantize_ms", "night_cap_ms")
+
+# Slots within this distance of +/-max_offset count as saturated in
+# _rebalance_neutral_iterative.
+_SATURATION_EPS = 1e-9
+
+
+def _lap(stats: dict[str, Any] | None, key: str, start: float) -> float:
+    """Add the time since start to stats[key] (ms); returns the new start."""
+    now = perf_counter()
+    if stats is not None:
+        stats[key] = stats.get(key, 0.0) + (now - start) * 1000.0
+    return now
+
+
+def window_offsets_reference(
+    values: Sequence[float],
+    horizon_slots: int,
+    max_offset: float,
+) -> list[float]:
+    """Original O(n*h) rolling forward window, kept as a reference engine."""
+    n = len(values)
+    if n == 0:
+        return []
+
+    if max_offset <= 0:
+        return [0.0] * n
+
+    offsets: list[float] = [0.0] * n
+
+    # Rolling forward window: for each slot i, compute avg within [i, i+horizon_slots)
+    for i in range(n):
+        window = values[i : min(n, i + horizon_slots)]
+        if len(window) < 2:
+            offsets[i] = 0.0
+            continue
+
+        avg_price = mean(window)
+
+        # diffs sum to 0 over the window by construction
+        diffs = [avg_price - v for v in window]
+        max_abs = max(abs(d) for d in diffs) if diffs else 0.0
+
+        if max_abs <= 0:
+            offsets[i] = 0.0
+            continue
+
+        k = max_offset / max_abs
+        raw = k * (avg_price - values[i])
+
+        offsets[i] = clamp(raw, -max_offset, max_offset)
+
+    return offsets
+
+
+def window_offsets_linear(
+    values: Sequence[float],
+    horizon_slots: int,
+    max_offset: float,
+) -> list[float]:
+    """O(n) rolling forward window.
+
+    The window average comes from prefix sums and max|avg - p| from the window
+    extremes, tracked with two monotonic deques while walking the series
+    backwards (each step adds slot i and drops slot i + horizon_slots).
+    """
+    n = len(values)
+    if n == 0:
+        return []
+
+    if max_offset <= 0:
+        return [0.0] * n
+
+    horizon_slots = max(1, horizon_slots)
+
+    prefix: list[float] = [0.0] * (n + 1)
+    acc = 0.0
+    for i, v in enumerate(values):
+        acc += v
+        prefix[i + 1] = acc
+
+    offsets: list[float] = [0.0] * n
+
+    # Indices in both deques decrease left -> right; the left end holds the
+    # window maximum (hi_q) or minimum (lo_q).
+    hi_q: deque[int] = deque()
+    lo_q: deque[int] = deque()
+
+    for i in range(n - 1, -1, -1):
+        v = values[i]
+        while hi_q and values[hi_q[-1]] <= v:
+            hi_q.pop()
+        hi_q.append(i)
+        while lo_q and values[lo_q[-1]] >= v:
+            lo_q.pop()
+        lo_q.append(i)
+
+        end = min(n, i + horizon_slots)
+        while hi_q[0] >= end:
+            hi_q.popleft()
+        while lo_q[0] >= end:
+            lo_q.popleft()
+
+        width = end - i
+        if width < 2:
+            continue
+
+        v_max = values[hi_q[0]]
+        v_min = values[lo_q[0]]
+        # A flat window has no spread; checking it directly avoids dividing
+        # prefix-sum rounding noise by itself.
+        if v_max <= v_min:
+            continue
+
+        avg_price = (prefix[end] - prefix[i]) / width
+        max_abs = max(v_max - avg_price, avg_price - v_min)
+        if max_abs <= 0:
+            continue
+
+        k = max_offset / max_abs
+        offsets[i] = clamp(k * (avg_price - v), -max_offset, max_offset)
+
+    return offsets
+
+
+WINDOW_ENGINES: dict[str, Callable[[Sequence[float], int, float], list[float]]] = {
+    "linear": window_offsets_linear,
+    "reference": window_offsets_reference,
+}
+
+
+def resolve_engine(engine: str) -> str:
+    """Map "auto"/unavailable engines onto one that can run here."""
+    if engine in ("auto", "numpy"):
+        return "numpy" if HAS_NUMPY else "linear"
+    if engine in WINDOW_ENGINES:
+        return engine
+    return "linear"
+
+
+def window_offsets(
+    values: Sequence[float],
+    horizon_slots: int,
+    max_offset: float,
+    engine: str = "linear",
+) -> list[float]:
+    fn = WINDOW_ENGINES.get(engine, window_offsets_linear)
+    return fn(values, horizon_slots, max_offset)
+
+
+def rebalance_neutral(
+    offsets: list[float],
+    fixed_mask: Sequence[bool],
+    max_offset: float,
+) -> tuple[list[float], float]:
+    """Shift the non-fixed slots by one constant so the series sums to zero.
+
+    Solves sum(fixed) + sum(clamp(o_j - c, -max_offset, max_offset)) = 0 for
+    c. The left side is piecewise linear and non-increasing in c, with
+    breakpoints at o_j -/+ max_offset, so one sort plus a sweep over the
+    breakpoints finds c exactly in O(n log n). Returns the new offsets and the remaining
+    sum, which is only non-zero when neutrality is infeasible (every free
+    slot saturated).
+    """
+    out = offsets[:]
+    free = [j for j, fixed in enumerate(fixed_mask) if not fixed]
+    fixed_total = sum(o for o, fixed in zip(out, fixed_mask) if fixed)
+    k = len(free)
+
+    if k == 0:
+        return out, fixed_total
+
+    hi = fixed_total + k * max_offset  # every free slot at +max_offset
+    lo = fixed_total - k * max_offset  # every free slot at -max_offset
+    if hi <= 0 or lo >= 0:
+        bound = max_offset if hi <= 0 else -max_offset
+        for j in free:
+            out[j] = bound
+        return out, hi if hi <= 0 else lo
+
+    # Merge the two sorted breakpoint lists: at xs[i] - max_offset a slot
+    # leaves the upper clamp, at xs[u] + max_offset it hits the lower one.
+    xs = sorted(out[j] for j in free)
+    g = hi
+    active = 0
+    i = u = 0
+    prev = xs[0] - max_offset
+    shift = prev
+    while u < k:
+        if i < k and xs[i] - max_offset <= xs[u] + max_offset:
+            point = xs[i] - max_offset
+            delta = 1
+            i += 1
+        else:
+            point = xs[u] + max_offset
+            delta = -1
+            u += 1
+        drop = active * (point - prev)
+        if active and g - drop <= 0:
+            shift = prev + g / active
+            break
+        g -= drop
+        active += delta
+        prev = point
+
+    for j in free:
+        out[j] = clamp(out[j] - shift, -max_offset, max_offset)
+    return out, sum(out)
+
+
+def _rebalance_neutral_iterative(
+    offsets: list[float],
+    fixed_mask: Sequence[bool],
+    max_offset: float,
+) -> tuple[list[float], float]:
+    """The correction passes rebalance_neutral replaced, kept for tests and benchmarks.
+
+    Up to three passes spread the sum evenly over the free slots that are not
+    saturated. It can stop with a residual even when neutrality is feasible.
+    """
+    out = offsets[:]
+    for _ in range(3):
+        total = sum(out)
+        if abs(total) < 1e-6:
+            break
+        adjustable = [
+            j
+            for j in range(len(out))
+            if not fixed_mask[j] and -max_offset + _SATURATION_EPS < out[j] < max_offset - _SATURATION_EPS
+        ]
+        if not adjustable:
+            break
+        correction = total / len(adjustable)
+        for j in adjustable:
+            out[j] = clamp(out[j] - correction, -max_offset, max_offset)
+    return out, sum(out)
+
+
+def apply_night_cap(
+    offsets: list[float],
+    night_mask: Sequence[bool],
+    max_offset: float,
+) -> tuple[list[float], float]:
+    """Zero positive night offsets, then rebalance the day slots to stay energy neutral.
+
+    Returns the capped offsets and the residual sum (see rebalance_neutral).
+    """
+    if not offsets:
+        return offsets, 0.0
+
+    out = offsets[:]
+
+    for i, is_night in enumerate(night_mask):
+        if is_night and out[i] > 0:
+            out[i] = 0.0
+
+    return rebalance_neutral(out, night_mask, max_offset)
+
+
+def compute_offsets(
+    values: Sequence[float],
+    horizon_slots: int,
+    max_offset: float,
+    smoothing_slots: int = 1,
+    step_size: float = 0.0,
+    night_mask: Sequence[bool] | None = None,
+    engine: str = "auto",
+    stats: dict[str, float] | None = None,
+    smoothing_mode: str = "moving_average",
+) -> list[float]:
+    """Full offset pipeline: window scaling, smoothing, clamp, step snapping, night cap.
+
+    ``night_mask`` is None when the night cap is disabled. If ``stats`` is
+    given, the night-cap rebalance residual is stored under
+    "night_cap_residual" and the time spent per stage is added to the
+    STAGE_KEYS entries.
+    """
+    n = len(values)
+    if n == 0:
+        return []
+
+    if max_offset <= 0:
+        return [0.0] * n
+
+    engine = resolve_engine(engine)
+    if engine == "numpy":
+        return _compute_offsets_numpy(
+            values,
+            horizon_slots,
+            max_offset,
+            smoothing_slots,
+            smoothing_mode,
+            step_size,
+            night_mask,
+            stats,
+        )
+
+    start = perf_counter()
+    # Rolling forward window: for each slot i, scale against [i, i+horizon_slots)
+    offsets = window_offsets(values, horizon_slots, max_offset, engine=engine)
+    start = _lap(stats, "window_ms", start)
+
+    # Optional smoothing over offsets (moving average by default)
+    offsets = smooth(offsets, smoothing_slots, smoothing_mode)
+
+    # Keep within bounds after smoothing
+    offsets = [clamp(o, -max_offset, max_offset) for o in offsets]
+    start = _lap(stats, "smooth_ms", start)
+
+    # Apply step size snapping after smoothing and clamp again
+    if step_size > 0:
+        offsets = [quantize_step(o, step_size) for o in offsets]
+        offsets = [clamp(o, -max_offset, max_offset) for o in offsets]
+        start = _lap(stats, "quantize_ms", start)
+
+    if night_mask is None:
+        return offsets
+
+    offsets, residual = apply_night_cap(offsets, night_mask, max_offset)
+    if stats is not None:
+        stats["night_cap_residual"] = residual
+    start = _lap(stats, "night_cap_ms", start)
+
+    # Re-apply step size after night cap to keep consistent increments
+    if step_size > 0:
+        offsets = [quantize_step(o, step_size) for o in offsets]
+        offsets = [clamp(o, -max_offset, max_offset) for o in offsets]
+        _lap(stats, "quantize_ms", start)
+    return offsets
+
+
+# --- numpy backend ---------------------------------------------------------
+# Same stages as compute_offsets, run on contiguous float64 arrays.
+
+
+def _np_window_stats(v, horizon_slots: int):
+    """Per-slot (window average - value), max deviation and validity.
+
+    These only depend on the prices and the horizon, so every max_offset
+    shares them. Works along the last axis, so v may be one series or a
+    stack of them.
+    """
+    n = v.shape[-1]
+    horizon_slots = max(1, horizon_slots)
+    idx = np.arange(n)
+    end = np.minimum(idx + horizon_slots, n)
+    width = end - idx
+
+    prefix = np.concatenate((np.zeros(v.shape[:-1] + (1,)), np.cumsum(v, axis=-1)), axis=-1)
+    avg = (prefix[..., end] - prefix[..., idx]) / width
+
+    # Pad past the end so every slot has a full-width view; the padding never
+    # wins the max/min, which reproduces the truncated windows at the tail.
+    w = min(horizon_slots, n)
+    pad = v.shape[:-1] + (w - 1,)
+    v_max = sliding_window_view(np.concatenate((v, np.full(pad, -np.inf)), axis=-1), w, axis=-1).max(axis=-1)
+    v_min = sliding_window_view(np.concatenate((v, np.full(pad, np.inf)), axis=-1), w, axis=-1).min(axis=-1)
+    max_abs = np.maximum(v_max - avg, avg - v_min)
+
+    valid = (width >= 2) & (v_max > v_min) & (max_abs > 0)
+    return avg - v, max_abs, valid
+
+
+def _np_window_offsets(v, horizon_slots: int, max_offset: float):
+    diff, max_abs, valid = _np_window_stats(v, horizon_slots)
+    out = np.zeros(v.shape)
+    out[valid] = (max_offset / max_abs[valid]) * diff[valid]
+    return np.clip(out, -max_offset, max_offset)
+
+
+def _np_smooth(x, window: int, mode: str):
+    if window <= 1:
+        return x
+    if mode == "exponential":
+        # Inherently sequential; the pure-Python passes are O(n) anyway
+        if x.ndim > 1:
+            return np.asarray([exponential_average(row, window) for row in x.tolist()])
+        return np.asarray(exponential_average(x.tolist(), window))
+    half = window // 2
+    kernel = np.asarray(kernel_weights(window, mode))
+    n = x.shape[-1]
+    # Full convolution, then keep the centred part; dividing by the weight of
+    # the contributing slots gives the same shrinking windows at the ends.
+    counts = np.convolve(np.ones(n), kernel)[half : half + n]
+    if x.ndim == 1:
+        sums = np.convolve(x, kernel)[half : half + n]
+    else:
+        # np.convolve is 1-D only. Row by row rather than one matmul over
+        # sliding windows, so every row sums in the same order as a single
+        # series and step snapping cannot tip differently on a tie.
+        sums = np.stack([np.convolve(row, kernel)[half : half + n] for row in x])
+    return sums / counts
+
+
+def _np_quantize(x, step_size: float, max_offset: float):
+    return np.clip(np.round(x / step_size) * step_size, -max_offset, max_offset)
+
+
+def _np_apply_night_cap(out, mask, max_offset: float):
+    out = np.where(mask & (out > 0), 0.0, out)
+    free = ~mask
+    x = out[free]
+    fixed_total = float(out[mask].sum())
+    k = x.size
+    if k == 0:
+        return out, fixed_total
+
+    hi = fixed_total + k * max_offset
+    lo = fixed_total - k * max_offset
+    if hi <= 0 or lo >= 0:
+        out[free] = max_offset if hi <= 0 else -max_offset
+        return out, hi if hi <= 0 else lo
+
+    # Same breakpoint sweep as rebalance_neutral, vectorized
+    points = np.concatenate((x - max_offset, x + max_offset))
+    deltas = np.concatenate((np.ones(k), -np.ones(k)))
+    order = np.argsort(points, kind="stable")
+    points = points[order]
+    active = np.cumsum(deltas[order])  # free slots inside the bounds after each point
+    g = hi - np.concatenate(([0.0], np.cumsum(active[:-1] * np.diff(points))))
+    m = int(np.argmax(g <= 0))  # g[0] > 0 and g[-1] = lo < 0
+    shift = points[m - 1] + g[m - 1] / active[m - 1]
+
+    out[free] = np.clip(x - shift, -max_offset, max_offset)
+    return out, float(out.sum())
+
+
+def _np_apply_night_cap_rows(out, mask, max_offset):
+    """_np_apply_night_cap for a stack of rows sharing one mask; max_offset is a column."""
+    out = np.where(mask & (out > 0), 0.0, out)
+    free = ~mask
+    x = out[:, free]
+    # Row by row: a sum along axis 1 can round differently from the 1-D sum
+    # in _np_apply_night_cap, and the shift must match it exactly
+    fixed_total = np.asarray([row.sum() for row in out[:, mask]])
+    k = x.shape[1]
+    if k == 0:
+        return out, fixed_total
+
+    m = max_offset[:, 0]
+    hi = fixed_total + k * m
+    lo = fixed_total - k * m
+    points = np.concatenate((x - max_offset, x + max_offset), axis=1)
+    deltas = np.concatenate((np.ones(k), -np.ones(k)))
+    order = np.argsort(points, axis=1, kind="stable")
+    points = np.take_along_axis(points, order, axis=1)
+    active = np.cumsum(deltas[order], axis=1)
+    g = hi[:, None] - np.concatenate(
+        (np.zeros((len(out), 1)), np.cumsum(active[:, :-1] * np.diff(points, axis=1), axis=1)), axis=1
+    )
+    r = np.arange(len(out))
+    # Rows where the free slots saturate have no crossing; they are overwritten below
+    idx = np.maximum(np.argmax(g <= 0, axis=1) - 1, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = points[r, idx] + g[r, idx] / active[r, idx]
+    freed = np.clip(x - shift[:, None], -max_offset, max_offset)
+    freed = np.where((hi <= 0)[:, None], max_offset, freed)
+    freed = np.where((lo >= 0)[:, None], -max_offset, freed)
+    out[:, free] = freed
+    return out, np.where(hi <= 0, hi, np.where(lo >= 0, lo, [row.sum() for row in out]))
+
+
+def _compute_offsets_numpy(
+    values: Sequence[float],
+    horizon_slots: int,
+    max_offset: float,
+    smoothing_slots: int,
+    smoothing_mode: str,
+    step_size: float,
+    night_mask: Sequence[bool] | None,
+    stats: dict[str, float] | None,
+) -> list[float]:
+    start = perf_counter()
+    v = np.asarray(values, dtype=np.float64)
+    out = _np_window_offsets(v, horizon_slots, max_offset)
+    start = _lap(stats, "window_ms", start)
+    out = np.clip(_np_smooth(out, smoothing_slots, smoothing_mode), -max_offset, max_offset)
+    start = _lap(stats, "smooth_ms", start)
+    if step_size > 0:
+        out = _np_quantize(out, step_size, max_offset)
+        start = _lap(stats, "quantize_ms", start)
+    if night_mask is None:
+        return out.tolist()
+
+    out, residual = _np_apply_night_cap(out, np.asarray(night_mask, dtype=bool), max_offset)
+    if stats is not None:
+        stats["night_cap_residual"] = residual
+    start = _lap(stats, "night_cap_ms", start)
+    if step_size > 0:
+        out = _np_quantize(out, step_size, max_offset)
+        _lap(stats, "quantize_ms", start)
+    return out.tolist()
+
+
+def compute_offsets_batch(
+    series: Sequence[Sequence[float]],
+    horizon_slots: int,
+    max_offset: float,
+    smoothing_slots: int = 1,
+    step_size: float = 0.0,
+    night_masks: Sequence[Sequence[bool] | None] | None = None,
+    engine: str = "auto",
+    stats: dict[str, Any] | None = None,
+    smoothing_mode: str = "moving_average",
+) -> list[list[float]]:
+    """compute_offsets for several price series (e.g. one per area) with shared parameters.
+
+    With the numpy engine, series of equal length are stacked and run through
+    the pipeline together; everything else falls back to one compute_offsets
+    call per series. If ``stats`` is given, the night-cap residual of every
+    series is stored under "night_cap_residual" and the stage timings are
+    summed over all series.
+    """
+    k = len(series)
+    masks = list(night_masks) if night_masks is not None else [None] * k
+    results: list[list[float]] = [[] for _ in range(k)]
+    residuals = [0.0] * k
+
+    done: set[int] = set()
+    groups: dict[int, list[int]] = {}
+    if resolve_engine(engine) == "numpy" and max_offset > 0:
+        for i, values in enumerate(series):
+            if len(values):
+                groups.setdefault(len(values), []).append(i)
+
+    for rows in groups.values():
+        if len(rows) < 2:
+            continue
+        start = perf_counter()
+        matrix = np.asarray([series[i] for i in rows], dtype=np.float64)
+        out = _np_window_offsets(matrix, horizon_slots, max_offset)
+        start = _lap(stats, "window_ms", start)
+        out = np.clip(_np_smooth(out, smoothing_slots, smoothing_mode), -max_offset, max_offset)
+        start = _lap(stats, "smooth_ms", start)
+        if step_size > 0:
+            out = _np_quantize(out, step_size, max_offset)
+            start = _lap(stats, "quantize_ms", start)
+        for row, i in zip(out, rows):
+            if masks[i] is not None:
+                row, residuals[i] = _np_apply_night_cap(row, np.asarray(masks[i], dtype=bool), max_offset)
+                start = _lap(stats, "night_cap_ms", start)
+                if step_size > 0:
+                    row = _np_quantize(row, step_size, max_offset)
+                    start = _lap(stats, "quantize_ms", start)
+            results[i] = row.tolist()
+        done.update(rows)
+
+    for i, values in enumerate(series):
+        if i in done:
+            continue
+        row_stats: dict[str, float] = {}
+        results[i] = compute_offsets(
+            values,
+            horizon_slots,
+            max_offset,
+            smoothing_slots=smoothing_slots,
+            step_size=step_size,
+            night_mask=masks[i],
+            engine=engine,
+            stats=row_stats,
+            smoothing_mode=smoothing_mode,
+        )
+        residuals[i] = row_stats.get("night_cap_residual", 0.0)
+        if stats is not None:
+            for key in STAGE_KEYS:
+                if key in row_stats:
+                    stats[key] = stats.get(key, 0.0) + row_stats[key]
+
+    if stats is not None:
+        stats["night_cap_residual"] = residuals
+    return results
+
+
+@dataclass(frozen=True, slots=True)
+class OffsetParams:
+    """One parameter set for compute_offsets_scenarios."""
+
+    horizon_slots: int
+    max_offset: float
+    smoothing_slots: int = 1
+    smoothing_mode: str = "moving_average"
+    step_size: float = 0.0
+    night_cap: bool = False
+
+
+def compute_offsets_scenarios(
+    values: Sequence[float],
+    scenarios: Sequence[OffsetParams],
+    night_mask: Sequence[bool] | None = None,
+    engine: str = "auto",
+    stats: dict[str, Any] | None = None,
+) -> list[list[float]]:
+    """compute_offsets for one price series under many parameter sets.
+
+    With the numpy engine all scenarios run as one stacked array: window
+    statistics (prefix sums and window extremes) are computed once per
+    distinct horizon and shared by every max_offset, and smoothing runs once
+    per group of rows with the same window and mode. ``night_mask`` applies
+    to the scenarios with night_cap set. If ``stats`` is given, the
+    night-cap residual of every scenario is stored under
+    "night_cap_residual" and the number of distinct horizons under
+    "window_passes".
+    """
+    k = len(scenarios)
+    n = len(values)
+    results: list[list[float]] = [[] for _ in range(k)]
+    residuals = [0.0] * k
+    if stats is not None:
+        stats["window_passes"] = len({max(1, p.horizon_slots) for p in scenarios})
+        stats["night_cap_residual"] = residuals
+    if n == 0:
+        return results
+
+    if resolve_engine(engine) != "numpy":
+        for i, p in enumerate(scenarios):
+            row_stats: dict[str, float] = {}
+            results[i] = compute_offsets(
+                values,
+                p.horizon_slots,
+                p.max_offset,
+                smoothing_slots=p.smoothing_slots,
+                step_size=p.step_size,
+                night_mask=night_mask if p.night_cap else None,
+                engine=engine,
+                stats=row_stats,
+                smoothing_mode=p.smoothing_mode,
+            )
+            residuals[i] = row_stats.get("night_cap_residual", 0.0)
+        return results
+
+    rows = []
+    for i, p in enumerate(scenarios):
+        if p.max_offset > 0:
+            rows.append(i)
+        else:
+            results[i] = [0.0] * n
+    if not rows:
+        return results
+
+    v = np.asarray(values, dtype=np.float64)
+    m = np.asarray([scenarios[i].max_offset for i in rows])[:, None]
+    by_horizon: dict[int, list[int]] = {}
+    by_smoothing: dict[tuple[int, str], list[int]] = {}
+    for j, i in enumerate(rows):
+        p = scenarios[i]
+        by_horizon.setdefault(max(1, p.horizon_slots), []).append(j)
+        by_smoothing.setdefault((p.smoothing_slots, p.smoothing_mode), []).append(j)
+
+    out = np.zeros((len(rows), n))
+    for horizon_slots, idx in by_horizon.items():
+        diff, max_abs, valid = _np_window_stats(v, horizon_slots)
+        block = np.zeros((len(idx), n))
+        block[:, valid] = (m[idx] / max_abs[valid]) * diff[valid]
+        out[idx] = block
+    out = np.clip(out, -m, m)
+
+    for (window, mode), idx in by_smoothing.items():
+        if window > 1:
+            out[idx] = np.clip(_np_smooth(out[idx], window, mode), -m[idx], m[idx])
+
+    quantized = [j for j, i in enumerate(rows) if scenarios[i].step_size > 0]
+    if quantized:
+        step = np.asarray([scenarios[rows[j]].step_size for j in quantized])[:, None]
+        out[quantized] = np.clip(np.round(out[quantized] / step) * step, -m[quantized], m[quantized])
+
+    capped = [j for j, i in enumerate(rows) if scenarios[i].night_cap] if night_mask is not None else []
+    if capped:
+        mask = np.asarray(night_mask, dtype=bool)
+        out[capped], capped_residuals = _np_apply_night_cap_rows(out[capped], mask, m[capped])
+        for j, residual in zip(capped, capped_residuals.tolist()):
+            residuals[rows[j]] = residual
+        # Re-snap after the night cap, like compute_offsets
+        requantize = [j for j in capped if scenarios[rows[j]].step_size > 0]
+        if requantize:
+            step = np.asarray([scenarios[rows[j]].step_size for j in requantize])[:, None]
+            out[requantize] = np.clip(np.round(out[requantize] / step) * step, -m[requantize], m[requantize])
+
+    for i, row in zip(rows, out.tolist()):
+        results[i] = row
+    return results
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+import math
+from time import perf_counter
+from typing import Any
+
+# Compute budget for one series; past it the caller falls back to the heuristic
+DEFAULT_BUDGET_MS = 50.0
+
+
+@dataclass(slots=True)
+class OptimizedOffsets:
+    """Inputs and result of one optimize_offsets run, used to warm-start the next."""
+
+    values: list[float]
+    night_mask: list[bool] | None
+    horizon_slots: int
+    max_offset: float
+    step_size: float
+    offsets: list[float]
+    # Largest |sum| of a block; only float noise, see optimize_offsets
+    residual: float = 0.0
+
+
+def _bounds(max_offset: float, step_size: float) -> tuple[float, int]:
+    """Offset bound and number of step units per bound (0 units = continuous)."""
+    if step_size <= 0:
+        return max_offset, 0
+    # Only whole steps are allowed, so the bound itself is snapped down
+    units = int(math.floor(max_offset / step_size + 1e-9))
+    # units * step_size can land a rounding error above max_offset (3 * 0.1)
+    return min(units * step_size, max_offset), units
+
+
+def _solve_block(
+    values: Sequence[float],
+    mask: Sequence[bool] | None,
+    bound: float,
+    units: int,
+    step_size: float,
+) -> list[float]:
+    """Minimize sum(offset * price) over one block with a zero offset sum.
+
+    Every slot starts at -bound and the cheapest slots are raised first, up
+    to +bound (0 for night slots), until the block is neutral. This greedy
+    fill is exact for the LP (a fractional knapsack), and also for the
+    stepped problem: all bounds are whole steps, so every raise is too.
+    It is always feasible: raising every slot to its cap (0 at night, +bound
+    by day) gives a sum >= 0, so the fill stops at exactly zero.
+    """
+    k = len(values)
+    out = [-bound] * k
+    need = k * bound
+    for i in sorted(range(k), key=values.__getitem__):
+        if need <= 0:
+            break
+        room = bound if mask is not None and mask[i] else 2 * bound
+        raise_by = min(room, need)
+        out[i] += raise_by
+        need -= raise_by
+    if units:
+        # Whole steps in and out, so only float noise is removed here
+        out = [max(-bound, min(bound, round(o / step_size) * step_size)) for o in out]
+    return out
+
+
+def optimize_offsets(
+    values: Sequence[float],
+    horizon_slots: int,
+    max_offset: float,
+    step_size: float = 0.0,
+    night_mask: Sequence[bool] | None = None,
+    budget_ms: float = DEFAULT_BUDGET_MS,
+    previous: OptimizedOffsets | None = None,
+    stats: dict[str, Any] | None = None,
+) -> OptimizedOffsets | None:
+    """Cost-optimal offsets: minimize price-weighted energy shift.
+
+    The series is split into consecutive blocks of ``horizon_slots`` from
+    its first slot, and each block must sum to zero (energy neutral). Offsets
+    stay within +-max_offset, in whole multiples of step_size when it is set,
+    and are never positive in night slots. Blocks are anchored to the series
+    start, so moving "now" never changes the problem; when tomorrow's prices
+    are appended, blocks whose inputs match ``previous`` are reused.
+
+    Unlike the heuristic's night cap, neutrality is always reachable (night
+    slots can sit at 0), so ``residual``, the largest |sum| of a block, is
+    only rounding noise; it is reported so callers need not assume it.
+
+    Returns None when the budget runs out, so the caller can fall back to the
+    heuristic. If ``stats`` is given, "optimizer_ms", "optimizer_blocks",
+    "optimizer_reused_blocks" and "optimizer_residual" are stored in it.
+    """
+    start = perf_counter()
+    deadline = start + budget_ms / 1000.0
+    n = len(values)
+    horizon_slots = max(1, horizon_slots)
+    values = list(values)
+    mask = list(night_mask) if night_mask is not None else None
+    bound, units = _bounds(max(0.0, max_offset), step_size)
+
+    reusable = (
+        previous is not None
+        and previous.horizon_slots == horizon_slots
+        and previous.max_offset == max_offset
+        and previous.step_size == step_size
+        and (previous.night_mask is None) == (mask is None)
+    )
+
+    offsets: list[float] = []
+    blocks = reused = 0
+    for lo in range(0, n, horizon_slots):
+        hi = min(lo + horizon_slots, n)
+        block_mask = mask[lo:hi] if mask is not None else None
+        blocks += 1
+        if (
+            reusable
+            and hi <= len(previous.values)
+            and previous.values[lo:hi] == values[lo:hi]
+            and (block_mask is None or previous.night_mask[lo:hi] == block_mask)
+        ):
+            offsets.extend(previous.offsets[lo:hi])
+            reused += 1
+            continue
+        if bound <= 0:
+            offsets.extend([0.0] * (hi - lo))
+        else:
+            offsets.extend(_solve_block(values[lo:hi], block_mask, bound, units, step_size))
+        if perf_counter() > deadline and hi < n:
+            return None
+
+    residual = max(
+        (abs(sum(offsets[lo : lo + horizon_slots])) for lo in range(0, n, horizon_slots)),
+        default=0.0,
+    )
+    if stats is not None:
+        stats["optimizer_ms"] = (perf_counter() - start) * 1000.0
+        stats["optimizer_blocks"] = blocks
+        stats["optimizer_reused_blocks"] = reused
+        stats["optimizer_residual"] = residual
+    return OptimizedOffsets(values, mask, horizon_slots, max_offset, step_size, offsets, residual)
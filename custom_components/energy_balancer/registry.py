@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+from time import perf_counter
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ServiceValidationError
+
+from .const import DATA_PRICE_REGISTRY, DOMAIN, VAT_BY_AREA
+from .helpers import PriceSeries, normalize_raw_points
+from .metrics import Metrics
+
+# (area, currency, include_vat, date)
+PriceKey = tuple[str, str, bool, date]
+
+
+def async_get_price_registry(hass: HomeAssistant) -> PriceRegistry:
+    """The domain-wide registry, created on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    registry = domain_data.get(DATA_PRICE_REGISTRY)
+    if registry is None:
+        registry = domain_data[DATA_PRICE_REGISTRY] = PriceRegistry(hass)
+    return registry
+
+
+class PriceRegistry:
+    """Normalized price series shared by every config entry of the domain.
+
+    Series are keyed by (area, currency, include_vat, date) and handed out
+    by reference, so callers must treat them as immutable. Concurrent
+    requests for the same area, currency and date share one Nordpool
+    service call.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        self._series: dict[PriceKey, PriceSeries] = {}
+        # (area, currency, date) -> service call covering that area
+        self._inflight: dict[tuple[str, str, date], asyncio.Task] = {}
+        self.hits = 0
+        self.service_calls = 0
+        self.deduplicated = 0
+        self.metrics = Metrics()
+
+    def get(self, area: str, currency: str, include_vat: bool, day: date) -> PriceSeries | None:
+        return self._series.get((area, currency, include_vat, day))
+
+    def add(self, area: str, currency: str, include_vat: bool, day: date, series: PriceSeries) -> PriceSeries:
+        """Register a series (e.g. restored from storage); returns the shared instance."""
+        return self._series.setdefault((area, currency, include_vat, day), series)
+
+    def prune(self, keep_from: date) -> None:
+        """Drop series for dates before keep_from."""
+        for key in [k for k in self._series if k[3] < keep_from]:
+            del self._series[key]
+
+    async def async_get_prices(
+        self,
+        config_entry_id: str,
+        areas: tuple[str, ...],
+        currency: str,
+        include_vat: bool,
+        day: date,
+    ) -> dict[str, PriceSeries | str]:
+        """Series per area for day, or a short error description per area.
+
+        Areas that are neither cached nor already being fetched are requested
+        together in a single service call.
+        """
+        results: dict[str, PriceSeries | str] = {}
+        waits: dict[str, asyncio.Task] = {}
+        missing: list[str] = []
+        for area in areas:
+            series = self._series.get((area, currency, include_vat, day))
+            if series is not None:
+                self.hits += 1
+                results[area] = series
+                continue
+            task = self._inflight.get((area, currency, day))
+            if task is not None:
+                self.deduplicated += 1
+                waits[area] = task
+            else:
+                missing.append(area)
+
+        if missing:
+            task = self._hass.async_create_task(
+                self._async_call_nordpool(config_entry_id, tuple(missing), currency, day)
+            )
+            inflight_keys = [(area, currency, day) for area in missing]
+            for key in inflight_keys:
+                self._inflight[key] = task
+            task.add_done_callback(lambda t, keys=inflight_keys: self._release(keys, t))
+            for area in missing:
+                waits[area] = task
+
+        if waits:
+            # Shielded: one caller being cancelled must not cancel a call
+            # other entries are waiting on.
+            tasks = list(dict.fromkeys(waits.values()))
+            responses = dict(zip(tasks, await asyncio.gather(*(asyncio.shield(t) for t in tasks))))
+            for area, call in waits.items():
+                results[area] = self._series_from_response(
+                    responses[call], area, currency, include_vat, day
+                )
+
+        return {area: results[area] for area in areas}
+
+    def _release(self, keys: list[tuple[str, str, date]], task: asyncio.Task) -> None:
+        for key in keys:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    def _series_from_response(
+        self,
+        response: dict[str, Any] | str,
+        area: str,
+        currency: str,
+        include_vat: bool,
+        day: date,
+    ) -> PriceSeries | str:
+        if isinstance(response, str):
+            return response
+        # Another waiter on the same call may already have normalized it
+        key = (area, currency, include_vat, day)
+        series = self._series.get(key)
+        if series is not None:
+            return series
+        vat_rate = VAT_BY_AREA.get(area, 0.0) if include_vat else 0.0
+        # Per MWh -> per kWh, VAT and rounding are applied while parsing
+        with self.metrics.time("normalize"):
+            points = normalize_raw_points(response.get(area), 1.0 + vat_rate, divisor=1000.0, ndigits=2)
+        if not points:
+            return f"no prices for {area}"
+        self._series[key] = points
+        return points
+
+    async def _async_call_nordpool(
+        self,
+        config_entry_id: str,
+        areas: tuple[str, ...],
+        currency: str,
+        day: date,
+    ) -> dict[str, Any] | str:
+        """Raw service response for day, or a short error description."""
+        self.service_calls += 1
+        service_data = {
+            "config_entry": config_entry_id,
+            "date": day,
+            "areas": list(areas),
+            "currency": currency,
+        }
+
+        start = perf_counter()
+        try:
+            response = await self._hass.services.async_call(
+                "nordpool",
+                "get_prices_for_date",
+                service_data,
+                blocking=True,
+                return_response=True,
+            )
+        except ServiceValidationError as err:
+            self.metrics.failure("service_call")
+            return f"service validation error: {err}"
+        except Exception as err:  # noqa: BLE001
+            self.metrics.failure("service_call")
+            return f"{type(err).__name__}: {err}"
+
+        if not isinstance(response, dict):
+            self.metrics.failure("service_call")
+            return "unexpected response"
+        self.metrics.record("service_call", (perf_counter() - start) * 1000.0)
+        return response
+
+    def diagnostics(self) -> dict[str, Any]:
+        return {
+            "cached_series": len(self._series),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "service_calls": self.service_calls,
+            "deduplicated": self.deduplicated,
+            "metrics": self.metrics.as_dict(),
+        }
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+import logging
+import random
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.util import dt as dt_util
+
+# fetch(dates) -> {date: {part: None if stored, or a short error description}}
+# A date is done once every part is stored; parts are e.g. price areas.
+FetchCallback = Callable[[list[date]], Awaitable[dict[date, dict[str, str | None]]]]
+
+
+@dataclass(slots=True)
+class RetryState:
+    target_date: date
+    label: str
+    deadline: datetime  # UTC
+    next_attempt: datetime  # UTC
+    attempts: int = 0
+    last_error: str | None = None
+    succeeded: bool = False
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "date": self.target_date.isoformat(),
+            "label": self.label,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "succeeded": self.succeeded,
+            "next_attempt": self.next_attempt.isoformat(),
+            "deadline": self.deadline.isoformat(),
+        }
+
+
+class FetchRetryScheduler:
+    """Fetch retries for several target dates on one timer.
+
+    Each date keeps its own attempt count, last error, exponential backoff
+    with jitter and deadline. Dates that are due at about the same time
+    (within coalesce_window) are fetched together in one cycle, which runs as
+    a config-entry background task so it can be cancelled on unload.
+
+    on_success runs after every cycle that stored anything, including a
+    date that is only partly fetched; the date keeps retrying until the
+    remaining parts arrive.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        fetch: FetchCallback,
+        on_success: Callable[[], Awaitable[None]],
+        logger: logging.Logger,
+        *,
+        base_delay: float = 5.0,
+        max_delay: float = 60.0,
+        jitter: float = 0.2,
+        coalesce_window: float = 30.0,
+    ) -> None:
+        self._hass = hass
+        self._entry = entry
+        self._fetch = fetch
+        self._on_success = on_success
+        self._logger = logger
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._jitter = jitter
+        self._coalesce_window = timedelta(seconds=coalesce_window)
+        self._states: dict[date, RetryState] = {}
+        self._history: deque[RetryState] = deque(maxlen=4)
+        self._timer_unsub: Callable[[], None] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> list[date]:
+        return sorted(self._states)
+
+    def request(self, target_date: date, label: str, deadline: datetime) -> None:
+        """Fetch target_date as soon as possible, retrying until deadline."""
+        now = dt_util.utcnow()
+        deadline_utc = dt_util.as_utc(deadline)
+        state = self._states.get(target_date)
+        if state is None:
+            self._states[target_date] = RetryState(target_date, label, deadline_utc, now)
+        else:
+            state.label = label
+            state.deadline = max(state.deadline, deadline_utc)
+            state.next_attempt = now
+        self._schedule()
+
+    def cancel(self, target_date: date) -> None:
+        self._states.pop(target_date, None)
+        self._schedule()
+
+    def cancel_all(self) -> None:
+        self._states.clear()
+        if self._timer_unsub:
+            self._timer_unsub()
+            self._timer_unsub = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def diagnostics(self) -> dict[str, Any]:
+        return {
+            "pending": [s.as_dict() for s in self._states.values()],
+            "recent": [s.as_dict() for s in self._history],
+        }
+
+    def _schedule(self) -> None:
+        if self._task is not None and not self._task.done():
+            # The running cycle reschedules when it finishes
+            return
+        if self._timer_unsub:
+            self._timer_unsub()
+            self._timer_unsub = None
+        if not self._states:
+            return
+        when = min(s.next_attempt for s in self._states.values())
+        self._timer_unsub = async_track_point_in_time(self._hass, self._handle_timer, when)
+
+    @callback
+    def _handle_timer(self, _now: datetime) -> None:
+        self._timer_unsub = None
+        task = self._entry.async_create_background_task(
+            self._hass,
+            self._async_run_cycle(),
+            f"{self._entry.domain} {self._entry.entry_id} price fetch",
+        )
+        # Tasks may start eagerly: a cycle that never suspends has already
+        # finished (and rescheduled) here, so it must not be kept as running.
+        if not task.done():
+            self._task = task
+
+    async def _async_run_cycle(self) -> None:
+        try:
+            horizon = dt_util.utcnow() + self._coalesce_window
+            due = [s for s in self._states.values() if s.next_attempt <= horizon]
+            if not due:
+                return
+
+            try:
+                results = await self._fetch([s.target_date for s in due])
+            except Exception as err:  # noqa: BLE001
+                # Counted as a failed attempt for every due date, so the
+                # backoff still applies instead of re-arming in the past
+                self._logger.debug("Price fetch failed", exc_info=True)
+                error = f"{type(err).__name__}: {err}"
+                results = {s.target_date: {s.label: error} for s in due}
+
+            now = dt_util.utcnow()
+            any_ok = False
+            for state in due:
+                state.attempts += 1
+                parts = results.get(state.target_date)
+                if parts is None:
+                    parts = {state.label: "not fetched"}
+                if any(error is None for error in parts.values()):
+                    any_ok = True
+                error = _describe(parts)
+                if error is None:
+                    state.succeeded = True
+                    state.last_error = None
+                    self._finish(state)
+                    continue
+
+                state.last_error = error
+                if now >= state.deadline:
+                    self._logger.error(
+                        "Failed to fetch %s prices before %s (%d attempts, last error: %s)",
+                        state.label,
+                        dt_util.as_local(state.deadline).isoformat(),
+                        state.attempts,
+                        error,
+                    )
+                    self._finish(state)
+                    continue
+                state.next_attempt = min(now + self._backoff(state.attempts), state.deadline)
+
+            if any_ok:
+                await self._on_success()
+        finally:
+            if self._task is asyncio.current_task():
+                self._task = None
+            self._schedule()
+
+    def _finish(self, state: RetryState) -> None:
+        if self._states.get(state.target_date) is state:
+            del self._states[state.target_date]
+        self._history.append(state)
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = min(self._max_delay, self._base_delay * (2 ** (attempts - 1)))
+        delay *= random.uniform(1.0 - self._jitter, 1.0 + self._jitter)
+        return timedelta(seconds=delay)
+
+
+def _describe(parts: dict[str, str | None]) -> str | None:
+    """One error description for the failed parts, or None if none failed."""
+    errors = {part: error for part, error in parts.items() if error is not None}
+    if not errors:
+        return None
+    if len(errors) == len(parts) and len(set(errors.values())) == 1:
+        # The same failure for everything, e.g. the service is missing
+        return next(iter(errors.values()))
+    return "; ".join(f"{part}: {error}" for part, error in errors.items())
@@ -3,7 +3,18 @@ from __future__ import annotations
 from homeassistant.components.select import SelectEntity
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import CONF_STEP_SIZE, DATA_COORDINATOR, DOMAIN, DEFAULT_STEP_SIZE
+from .const import (
+    ATTRIBUTE_FORMATS,
+    DATA_COORDINATOR,
+    DOMAIN,
+    DEFAULT_ATTRIBUTE_FORMAT,
+    DEFAULT_OFFSET_STRATEGY,
+    DEFAULT_SMOOTHING_MODE,
+    DEFAULT_STEP_SIZE,
+    OFFSET_STRATEGIES,
+    SMOOTHING_MODES,
+)
+from .entity import entity_unique_id
 
 
 STEP_SIZE_OPTIONS = ["0.1", "0.5", "1.0"]
@@ -11,17 +22,25 @@ STEP_SIZE_OPTIONS = ["0.1", "0.5", "1.0"]
 
 async def async_setup_entry(hass, entry, async_add_entities):
     coordinator = hass.data[DOMAIN][entry.entry_id][DATA_COORDINATOR]
-    async_add_entities([EnergyBalancerStepSizeSelect(entry, coordinator)], update_before_add=True)
+    async_add_entities(
+        [
+            EnergyBalancerStepSizeSelect(entry, coordinator),
+            EnergyBalancerSmoothingModeSelect(entry, coordinator),
+            EnergyBalancerAttributeFormatSelect(entry, coordinator),
+            EnergyBalancerStrategySelect(entry, coordinator),
+        ],
+        update_before_add=True,
+    )
 
 
 class EnergyBalancerStepSizeSelect(CoordinatorEntity, SelectEntity):
     _attr_name = "Energy Balancer Step Size"
-    _attr_unique_id = "energy_balancer_step_size"
     _attr_icon = "mdi:stairs"
     _attr_options = STEP_SIZE_OPTIONS
 
     def __init__(self, entry, coordinator):
         super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(entry, "step_size")
         self.entry = entry
 
     @property
@@ -34,11 +53,78 @@ class EnergyBalancerStepSizeSelect(CoordinatorEntity, SelectEntity):
             return
         value = float(option)
 
-        new_options = dict(self.entry.options or {})
-        new_options[CONF_STEP_SIZE] = value
-        self.hass.config_entries.async_update_entry(self.entry, options=new_options)
+        await self.coordinator.async_update_parameters(step_size=value)
+        self.async_write_ha_state()
 
-        await self.coordinator.async_set_step_size(value)
+
+class EnergyBalancerSmoothingModeSelect(CoordinatorEntity, SelectEntity):
+    """Kernel used with the window from the smoothing level number."""
+
+    _attr_name = "Energy Balancer Smoothing Mode"
+    _attr_icon = "mdi:chart-bell-curve"
+    _attr_options = SMOOTHING_MODES
+
+    def __init__(self, entry, coordinator):
+        super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(entry, "smoothing_mode")
+        self.entry = entry
+
+    @property
+    def current_option(self):
+        return getattr(self.coordinator, "smoothing_mode", DEFAULT_SMOOTHING_MODE)
+
+    async def async_select_option(self, option: str) -> None:
+        if option not in SMOOTHING_MODES:
+            return
+
+        await self.coordinator.async_update_parameters(smoothing_mode=option)
+        self.async_write_ha_state()
+
+
+class EnergyBalancerAttributeFormatSelect(CoordinatorEntity, SelectEntity):
+    _attr_name = "Energy Balancer Attribute Format"
+    _attr_icon = "mdi:code-json"
+    _attr_options = ATTRIBUTE_FORMATS
+
+    def __init__(self, entry, coordinator):
+        super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(entry, "attribute_format")
+        self.entry = entry
+
+    @property
+    def current_option(self):
+        return getattr(self.coordinator, "attribute_format", DEFAULT_ATTRIBUTE_FORMAT)
+
+    async def async_select_option(self, option: str) -> None:
+        if option not in ATTRIBUTE_FORMATS:
+            return
+
+        await self.coordinator.async_update_parameters(attribute_format=option)
+        self.async_write_ha_state()
+
+
+class EnergyBalancerStrategySelect(CoordinatorEntity, SelectEntity):
+    """Rolling-window heuristic or the cost optimizer (smoothing does not apply to the latter)."""
+
+    _attr_name = "Energy Balancer Strategy"
+    _attr_icon = "mdi:chart-timeline-variant-shimmer"
+    _attr_options = OFFSET_STRATEGIES
+
+    def __init__(self, entry, coordinator):
+        super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(entry, "offset_strategy")
+        self.entry = entry
+
+    @property
+    def current_option(self):
+        return getattr(self.coordinator, "offset_strategy", DEFAULT_OFFSET_STRATEGY)
+
+    async def async_select_option(self, option: str) -> None:
+        if option not in OFFSET_STRATEGIES:
+            return
+
+        await self.coordinator.async_update_parameters(offset_strategy=option)
+        self.async_write_ha_state()
 
 
 def _format_step_size(value: float) -> str:
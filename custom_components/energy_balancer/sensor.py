@@ -1,56 +1,69 @@
 from __future__ import annotations
 
 from homeassistant.components.sensor import SensorEntity
+from homeassistant.const import EntityCategory
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .attributes import EMPTY_ATTRIBUTES
 from .const import DOMAIN, DATA_COORDINATOR
+from .entity import entity_unique_id
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
     coordinator = hass.data[DOMAIN][entry.entry_id][DATA_COORDINATOR]
-    async_add_entities(
-        [
-            EnergyBalancerOffsetSensor(coordinator),
-            EnergyBalancerPricesSensor(coordinator),
-        ],
-        update_before_add=True,
-    )
+    entities = [
+        EnergyBalancerOffsetSensor(coordinator),
+        EnergyBalancerPricesSensor(coordinator),
+    ]
+    for area in coordinator.extra_areas:
+        entities.append(EnergyBalancerAreaOffsetSensor(coordinator, area))
+        entities.append(EnergyBalancerAreaPricesSensor(coordinator, area))
+    entities.append(EnergyBalancerDiagnosticsSensor(coordinator))
+    async_add_entities(entities, update_before_add=True)
 
 
 class EnergyBalancerOffsetSensor(CoordinatorEntity, SensorEntity):
     _attr_name = "Energy Balancer Offset"
-    _attr_unique_id = "energy_balancer_offset"
     _attr_icon = "mdi:delta"
     _attr_native_unit_of_measurement = "°C"
 
     def __init__(self, coordinator):
         super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(coordinator.entry, "offset")
+
+    @property
+    def available(self) -> bool:
+        # Unavailable until the first price fetch (or cache restore)
+        return super().available and self.coordinator.has_prices
 
     @property
     def native_value(self):
-        return float((self.coordinator.data or {}).get("current_offset", 0.0))
+        return float(self._area_data().get("current_offset", 0.0))
 
     @property
     def extra_state_attributes(self):
-        data = self.coordinator.data or {}
-        return {
-            "slot_ms": data.get("slot_ms"),
-            "raw_today": data.get("offsets_today", []),
-            "raw_tomorrow": data.get("offsets_tomorrow", []),
-        }
+        return self._area_data().get("offset_attributes", EMPTY_ATTRIBUTES)
+
+    def _area_data(self) -> dict:
+        return self.coordinator.data or {}
 
 
 class EnergyBalancerPricesSensor(CoordinatorEntity, SensorEntity):
     _attr_name = "Energy Balancer Prices"
-    _attr_unique_id = "energy_balancer_prices"
     _attr_icon = "mdi:currency-eur"
 
     def __init__(self, coordinator):
         super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(coordinator.entry, "prices")
+
+    @property
+    def available(self) -> bool:
+        # Unavailable until the first price fetch (or cache restore)
+        return super().available and self.coordinator.has_prices
 
     @property
     def native_value(self):
-        return (self.coordinator.data or {}).get("current_price")
+        return self._area_data().get("current_price")
 
     @property
     def native_unit_of_measurement(self):
@@ -58,25 +71,78 @@ class EnergyBalancerPricesSensor(CoordinatorEntity, SensorEntity):
 
     @property
     def extra_state_attributes(self):
-        data = self.coordinator.data or {}
-        prices_today = [
-            {
-                "start_ts": p.start_ts,
-                "end_ts": p.end_ts,
-                "value": float(p.value),
-            }
-            for p in data.get("prices_today", [])
-        ]
-        prices_tomorrow = [
-            {
-                "start_ts": p.start_ts,
-                "end_ts": p.end_ts,
-                "value": float(p.value),
-            }
-            for p in data.get("prices_tomorrow", [])
-        ]
+        return self._area_data().get("price_attributes", EMPTY_ATTRIBUTES)
+
+    def _area_data(self) -> dict:
+        return self.coordinator.data or {}
+
+
+class EnergyBalancerAreaOffsetSensor(EnergyBalancerOffsetSensor):
+    """Offset for one of the entry's additional areas."""
+
+    def __init__(self, coordinator, area: str):
+        super().__init__(coordinator)
+        self._area = area
+        self._attr_name = f"Energy Balancer Offset {area}"
+        self._attr_unique_id = entity_unique_id(coordinator.entry, f"offset_{area.lower()}")
+
+    @property
+    def available(self) -> bool:
+        return super().available and self._area in (self.coordinator.data or {}).get("areas", {})
+
+    def _area_data(self) -> dict:
+        return (self.coordinator.data or {}).get("areas", {}).get(self._area, {})
+
+
+class EnergyBalancerAreaPricesSensor(EnergyBalancerPricesSensor):
+    """Prices for one of the entry's additional areas."""
+
+    def __init__(self, coordinator, area: str):
+        super().__init__(coordinator)
+        self._area = area
+        self._attr_name = f"Energy Balancer Prices {area}"
+        self._attr_unique_id = entity_unique_id(coordinator.entry, f"prices_{area.lower()}")
+
+    @property
+    def available(self) -> bool:
+        return super().available and self._area in (self.coordinator.data or {}).get("areas", {})
+
+    def _area_data(self) -> dict:
+        return (self.coordinator.data or {}).get("areas", {}).get(self._area, {})
+
+
+class EnergyBalancerDiagnosticsSensor(CoordinatorEntity, SensorEntity):
+    """Duration of the last offset computation, with fetch and cache statistics."""
+
+    _attr_name = "Energy Balancer Diagnostics"
+    _attr_icon = "mdi:timer-outline"
+    _attr_native_unit_of_measurement = "ms"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, coordinator):
+        super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(coordinator.entry, "diagnostics")
+
+    @property
+    def native_value(self):
+        last = self.coordinator.metrics.last("compute_offsets")
+        return round(last, 3) if last is not None else None
+
+    @property
+    def extra_state_attributes(self):
+        coordinator = self.coordinator
+        update = coordinator.metrics.histogram("update")
+        fetch = coordinator.metrics.histogram("fetch")
         return {
-            "slot_ms": data.get("slot_ms"),
-            "raw_today": prices_today,
-            "raw_tomorrow": prices_tomorrow,
+            "last_fetch": coordinator.last_fetch.isoformat() if coordinator.last_fetch else None,
+            "last_update": coordinator.last_update.isoformat() if coordinator.last_update else None,
+            "last_update_ms": round(update.last_ms, 3) if update.last_ms is not None else None,
+            "last_fetch_ms": round(fetch.last_ms, 3) if fetch.last_ms is not None else None,
+            "fetch_failures": fetch.failures,
+            "cache_hit_rate": coordinator.cache_hit_rate,
+            "attribute_builds": coordinator.attribute_builds,
+            "attribute_size": coordinator.attribute_size(),
+            "pending_retries": len(coordinator.retry_diagnostics()["pending"]),
+            "collapsed_parameter_updates": coordinator.collapsed_parameter_updates,
         }
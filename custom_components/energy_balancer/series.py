@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from typing import Any
+
+from .helpers import Point, PriceSeries
+
+
+def _sign(x: float) -> int:
+    return (x > 0) - (x < 0)
+
+
+class OffsetForecast:
+    """Price/offset series with a sorted start_ts index for O(log n) slot lookups."""
+
+    __slots__ = (
+        "prices",
+        "offsets",
+        "slot_ms",
+        "starts",
+        "offset_attributes",
+        "price_attributes",
+        "attribute_format",
+        "_next_change",
+    )
+
+    def __init__(self, prices: PriceSeries, offsets: list[float], slot_ms: int) -> None:
+        self.prices = prices
+        self.offsets = offsets
+        self.slot_ms = slot_ms
+        self.starts = prices.start_ts
+        # Sensor attribute payloads, filled in lazily by the coordinator
+        self.offset_attributes: dict[str, Any] | None = None
+        self.price_attributes: dict[str, Any] | None = None
+        self.attribute_format: str | None = None
+
+        # _next_change[i] is the first index after i whose offset sign differs
+        # from slot i, or len(offsets) if the sign never changes again.
+        n = len(offsets)
+        next_change = [n] * n
+        for i in range(n - 2, -1, -1):
+            if _sign(offsets[i + 1]) != _sign(offsets[i]):
+                next_change[i] = i + 1
+            else:
+                next_change[i] = next_change[i + 1]
+        self._next_change = next_change
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def index_at(self, ts_ms: int) -> int | None:
+        i = bisect_right(self.starts, ts_ms) - 1
+        if i >= 0 and ts_ms < self.prices.end_ts[i]:
+            return i
+        return None
+
+    def slot_at(self, ts_ms: int) -> tuple[Point, float] | None:
+        i = self.index_at(ts_ms)
+        if i is None:
+            return None
+        return self.prices[i], self.offsets[i]
+
+    def next_slots(self, ts_ms: int, count: int) -> list[tuple[Point, float]]:
+        """The slot covering ts_ms (or the next one to start) and up to count-1 after it."""
+        i = self.index_at(ts_ms)
+        if i is None:
+            i = bisect_right(self.starts, ts_ms)
+        hi = min(len(self.prices), i + max(0, count))
+        return [(self.prices[j], self.offsets[j]) for j in range(i, hi)]
+
+    def index_range(self, start_ms: int | None, end_ms: int | None) -> tuple[int, int]:
+        """Index range [lo, hi) of the slots overlapping [start_ms, end_ms); None is unbounded."""
+        lo = 0
+        if start_ms is not None:
+            lo = bisect_right(self.starts, start_ms)
+            if lo > 0 and self.prices.end_ts[lo - 1] > start_ms:
+                lo -= 1
+        hi = len(self.starts) if end_ms is None else bisect_left(self.starts, end_ms)
+        return lo, max(lo, hi)
+
+    def next_boundary_ms(self, ts_ms: int) -> int | None:
+        i = self.index_at(ts_ms)
+        if i is not None:
+            return self.prices.end_ts[i]
+        j = bisect_right(self.starts, ts_ms)
+        if j < len(self.starts):
+            return self.starts[j]
+        return None
+
+    def ms_until_sign_change(self, ts_ms: int) -> int | None:
+        i = self.index_at(ts_ms)
+        if i is None:
+            return None
+        j = self._next_change[i]
+        if j >= len(self.starts):
+            return None
+        return self.starts[j] - ts_ms
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+
+from .const import (
+    AREAS,
+    ATTR_AREA,
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_END,
+    ATTR_INCLUDE_OFFSETS,
+    ATTR_PARAMETER_SETS,
+    ATTR_RESOLUTION,
+    ATTR_START,
+    DATA_COORDINATOR,
+    DOMAIN,
+    OFFSET_STRATEGIES,
+    SERVICE_GET_FORECAST,
+    SERVICE_WHAT_IF,
+    SMOOTHING_MODES,
+)
+
+# Same ranges as the number/select entities
+PARAMETER_SET_SCHEMA = vol.Schema(
+    {
+        vol.Optional("horizon_hours"): vol.All(vol.Coerce(int), vol.Range(min=1, max=24)),
+        vol.Optional("max_offset"): vol.All(vol.Coerce(float), vol.Range(min=0, max=5)),
+        vol.Optional("smoothing_level"): vol.All(vol.Coerce(int), vol.Range(min=0, max=10)),
+        vol.Optional("smoothing_mode"): vol.In(SMOOTHING_MODES),
+        vol.Optional("step_size"): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+        vol.Optional("night_cap"): cv.boolean,
+        vol.Optional("offset_strategy"): vol.In(OFFSET_STRATEGIES),
+    }
+)
+
+GET_FORECAST_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_AREA): vol.All(vol.Upper, vol.In(AREAS)),
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        # Minutes; coarser than the price slots averages them
+        vol.Optional(ATTR_RESOLUTION): vol.All(vol.Coerce(int), vol.Range(min=1, max=1440)),
+    }
+)
+
+WHAT_IF_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_AREA): vol.All(vol.Upper, vol.In(AREAS)),
+        vol.Required(ATTR_PARAMETER_SETS): vol.All(cv.ensure_list, vol.Length(min=1, max=100), [PARAMETER_SET_SCHEMA]),
+        vol.Optional(ATTR_INCLUDE_OFFSETS, default=True): cv.boolean,
+    }
+)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the domain services (once, from async_setup)."""
+
+    async def _async_get_forecast(call: ServiceCall) -> ServiceResponse:
+        coordinator = _coordinator_for(hass, call.data.get(ATTR_CONFIG_ENTRY_ID))
+        start = call.data.get(ATTR_START)
+        end = call.data.get(ATTR_END)
+        if start is not None and end is not None and end <= start:
+            raise ServiceValidationError("end must be after start")
+        resolution = call.data.get(ATTR_RESOLUTION)
+        response = coordinator.forecast_response(
+            call.data.get(ATTR_AREA),
+            start,
+            end,
+            timedelta(minutes=resolution) if resolution else None,
+        )
+        if response is None:
+            raise ServiceValidationError("No forecast for this area yet (not configured or no prices)")
+        return response
+
+    async def _async_what_if(call: ServiceCall) -> ServiceResponse:
+        coordinator = _coordinator_for(hass, call.data.get(ATTR_CONFIG_ENTRY_ID))
+        response = coordinator.what_if(
+            call.data[ATTR_PARAMETER_SETS],
+            call.data.get(ATTR_AREA),
+            call.data[ATTR_INCLUDE_OFFSETS],
+        )
+        if response is None:
+            raise ServiceValidationError("No forecast for this area yet (not configured or no prices)")
+        return response
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_FORECAST,
+        _async_get_forecast,
+        schema=GET_FORECAST_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_WHAT_IF,
+        _async_what_if,
+        schema=WHAT_IF_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+
+def _coordinator_for(hass: HomeAssistant, entry_id: str | None):
+    entries = {
+        key: value[DATA_COORDINATOR]
+        for key, value in hass.data.get(DOMAIN, {}).items()
+        if isinstance(value, dict) and DATA_COORDINATOR in value
+    }
+    if entry_id is not None:
+        if entry_id not in entries:
+            raise ServiceValidationError(f"Energy Balancer entry {entry_id} is not loaded")
+        return entries[entry_id]
+    if len(entries) != 1:
+        raise ServiceValidationError(
+            "config_entry_id is required when there is not exactly one Energy Balancer entry"
+        )
+    return next(iter(entries.values()))
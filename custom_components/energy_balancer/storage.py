@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from array import array
+from datetime import date
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .helpers import PriceSeries
+
+STORAGE_VERSION = 1
+SAVE_DELAY_SECONDS = 10
+
+
+def _price_key(area: str, currency: str, include_vat: bool, day: date) -> str:
+    return f"{area}|{currency}|{int(include_vat)}|{day.isoformat()}"
+
+
+def encode_series(series: PriceSeries) -> dict[str, Any]:
+    """Compact on-disk form: start_ts + slot_ms + values for regular series."""
+    starts = series.start_ts
+    ends = series.end_ts
+    values = list(series.values)
+    if len(starts) >= 1:
+        slot_ms = ends[0] - starts[0]
+        first = starts[0]
+        if all(s == first + i * slot_ms and e == s + slot_ms for i, (s, e) in enumerate(zip(starts, ends))):
+            return {"start_ts": first, "slot_ms": slot_ms, "values": values}
+    return {"starts": list(starts), "ends": list(ends), "values": values}
+
+
+def decode_series(raw: dict[str, Any]) -> PriceSeries | None:
+    try:
+        values = array("d", [float(v) for v in raw["values"]])
+        if "slot_ms" in raw:
+            first = int(raw["start_ts"])
+            slot_ms = int(raw["slot_ms"])
+            starts = array("q", [first + i * slot_ms for i in range(len(values))])
+            ends = array("q", [s + slot_ms for s in starts])
+        else:
+            starts = array("q", [int(s) for s in raw["starts"]])
+            ends = array("q", [int(e) for e in raw["ends"]])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not values or len(starts) != len(values) or len(ends) != len(values):
+        return None
+    return PriceSeries(starts, ends, values)
+
+
+class PriceStore:
+    """Persists normalized price series and the last computed offsets per config entry."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store: Store[dict[str, Any]] = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+        self._prices: dict[str, dict[str, Any]] = {}
+        self._offsets: dict[str, Any] | None = None
+
+    async def async_load(self) -> None:
+        data = await self._store.async_load() or {}
+        prices = data.get("prices")
+        self._prices = prices if isinstance(prices, dict) else {}
+        offsets = data.get("offsets")
+        self._offsets = offsets if isinstance(offsets, dict) else None
+
+    def get_prices(self, area: str, currency: str, include_vat: bool, day: date) -> PriceSeries | None:
+        raw = self._prices.get(_price_key(area, currency, include_vat, day))
+        if not isinstance(raw, dict):
+            return None
+        return decode_series(raw)
+
+    def set_prices(self, area: str, currency: str, include_vat: bool, day: date, series: PriceSeries) -> None:
+        self._prices[_price_key(area, currency, include_vat, day)] = encode_series(series)
+        self._schedule_save()
+
+    def get_offsets(self, key: str) -> list[float] | None:
+        if not self._offsets or self._offsets.get("key") != key:
+            return None
+        values = self._offsets.get("values")
+        if not isinstance(values, list):
+            return None
+        try:
+            return [float(v) for v in values]
+        except (TypeError, ValueError):
+            return None
+
+    def set_offsets(self, key: str, offsets: list[float]) -> None:
+        self._offsets = {"key": key, "values": offsets}
+        self._schedule_save()
+
+    def prune(self, keep_from: date) -> None:
+        """Drop price series for dates before keep_from."""
+        keep = keep_from.isoformat()
+        stale = [k for k in self._prices if k.rsplit("|", 1)[-1] < keep]
+        for k in stale:
+            del self._prices[k]
+        if stale:
+            self._schedule_save()
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
+
+    def _schedule_save(self) -> None:
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY_SECONDS)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        return {"prices": self._prices, "offsets": self._offsets}
@@ -3,7 +3,8 @@ from __future__ import annotations
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import CONF_NIGHT_CAP, DATA_COORDINATOR, DOMAIN
+from .const import DATA_COORDINATOR, DOMAIN
+from .entity import entity_unique_id
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
@@ -13,10 +14,10 @@ async def async_setup_entry(hass, entry, async_add_entities):
 
 class EnergyBalancerNightCapSwitch(CoordinatorEntity, SwitchEntity):
     _attr_name = "Energy Balancer Night Cap"
-    _attr_unique_id = "energy_balancer_night_cap"
 
     def __init__(self, entry, coordinator):
         super().__init__(coordinator)
+        self._attr_unique_id = entity_unique_id(entry, "night_cap")
         self.entry = entry
 
     @property
@@ -30,7 +31,5 @@ class EnergyBalancerNightCapSwitch(CoordinatorEntity, SwitchEntity):
         await self._async_set_value(False)
 
     async def _async_set_value(self, value: bool) -> None:
-        new_options = dict(self.entry.options or {})
-        new_options[CONF_NIGHT_CAP] = bool(value)
-        self.hass.config_entries.async_update_entry(self.entry, options=new_options)
-        await self.coordinator.async_set_night_cap(bool(value))
+        await self.coordinator.async_update_parameters(night_cap=bool(value))
+        self.async_write_ha_state()
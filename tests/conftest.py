@@ -0,0 +1,12 @@
+"""Run the tests without Home Assistant: see tools/_ha_stubs.py."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+
+import _ha_stubs  # noqa: E402
+
+_ha_stubs.load_integration()
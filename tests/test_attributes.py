@@ -0,0 +1,103 @@
+"""Compact and attribute-free sensor formats against the full row format."""
+
+from __future__ import annotations
+
+from array import array
+import random
+
+import pytest
+
+from energy_balancer.attributes import build_offset_attributes, build_price_attributes
+from energy_balancer.helpers import PriceSeries, quantize_step
+from energy_balancer.series import OffsetForecast
+
+SLOT_MS = 900_000
+DAY0 = 1_735_686_000_000  # 2025-01-01T00:00:00+01:00
+
+
+def forecast(n_today: int, n_tomorrow: int, step_size: float = 0.0, gap_at: int | None = None) -> OffsetForecast:
+    rng = random.Random(n_today * 1000 + n_tomorrow)
+    n = n_today + n_tomorrow
+    starts = [DAY0 + i * SLOT_MS for i in range(n)]
+    if gap_at is not None:
+        starts = [s + (SLOT_MS if i >= gap_at else 0) for i, s in enumerate(starts)]
+    prices = PriceSeries(
+        array("q", starts),
+        array("q", [s + SLOT_MS for s in starts]),
+        array("d", [round(rng.uniform(-0.1, 3.0), 5) for _ in range(n)]),
+    )
+    offsets = [rng.uniform(-1.0, 1.0) for _ in range(n)]
+    if step_size:
+        offsets = [quantize_step(o, step_size) for o in offsets]
+    return OffsetForecast(prices, offsets, SLOT_MS)
+
+
+def expand(attrs: dict, key: str) -> list[dict]:
+    """Rebuild the full rows from the compact attributes, as a card would."""
+    raw = attrs[f"raw_{key}"]
+    if raw and isinstance(raw[0], dict):
+        return list(raw)
+    scale = attrs.get("value_scale", 1)
+    first = attrs[f"{key}_start_ts"]
+    slot_ms = attrs["slot_ms"]
+    return [
+        {"start_ts": first + i * slot_ms, "end_ts": first + (i + 1) * slot_ms, "value": v * scale}
+        for i, v in enumerate(raw)
+    ]
+
+
+def assert_rows_equal(compact_rows: list[dict], full_rows: list[dict], tol: float = 1e-12) -> None:
+    assert len(compact_rows) == len(full_rows)
+    for c, f in zip(compact_rows, full_rows):
+        assert c["start_ts"] == f["start_ts"]
+        assert c["end_ts"] == f["end_ts"]
+        assert c["value"] == pytest.approx(f["value"], abs=tol)
+
+
+@pytest.mark.parametrize("step_size", [0.0, 0.1, 0.25])
+@pytest.mark.parametrize(("n_today", "n_tomorrow"), [(96, 96), (96, 0), (92, 100), (0, 0)])
+def test_compact_offsets_expand_to_full(n_today, n_tomorrow, step_size):
+    f = forecast(n_today, n_tomorrow, step_size)
+    full = build_offset_attributes(f, n_today, "full", step_size)
+    compact = build_offset_attributes(f, n_today, "compact", step_size)
+    assert compact["slot_ms"] == full["slot_ms"] == SLOT_MS
+    # Without a step size, compact offsets are rounded to 3 decimals
+    tol = 1e-12 if step_size else 5e-4
+    for key in ("today", "tomorrow"):
+        assert_rows_equal(expand(compact, key), list(full[f"raw_{key}"]), tol)
+    if step_size:
+        # Step multiples as integers, scaled back by value_scale
+        assert compact["value_scale"] == step_size
+        assert all(isinstance(v, int) for v in compact["raw_today"])
+    else:
+        assert "value_scale" not in compact
+
+
+def test_compact_prices_expand_to_full():
+    f = forecast(96, 96)
+    full = build_price_attributes(f, 96, "full")
+    compact = build_price_attributes(f, 96, "compact")
+    assert compact["today_start_ts"] == DAY0
+    assert compact["tomorrow_start_ts"] == DAY0 + 96 * SLOT_MS
+    for key in ("today", "tomorrow"):
+        assert_rows_equal(expand(compact, key), list(full[f"raw_{key}"]))
+        # Prices are passed through unrounded
+        assert [r["value"] for r in expand(compact, key)] == [r["value"] for r in full[f"raw_{key}"]]
+
+
+def test_compact_keeps_rows_for_a_day_with_a_gap():
+    f = forecast(96, 96, gap_at=120)
+    full = build_price_attributes(f, 96, "full")
+    compact = build_price_attributes(f, 96, "compact")
+    # Today is regular, tomorrow falls back to the full rows
+    assert "today_start_ts" in compact
+    assert "tomorrow_start_ts" not in compact
+    assert compact["raw_tomorrow"] == full["raw_tomorrow"]
+    for key in ("today", "tomorrow"):
+        assert_rows_equal(expand(compact, key), list(full[f"raw_{key}"]))
+
+
+def test_none_format_has_no_rows():
+    f = forecast(96, 96, 0.1)
+    assert build_offset_attributes(f, 96, "none", 0.1) == {"slot_ms": SLOT_MS}
+    assert build_price_attributes(f, 96, "none") == {"slot_ms": SLOT_MS}
@@ -0,0 +1,281 @@
+"""PriceSeries columns, service-row parsing (fast path against the general parser) and night masks."""
+
+from __future__ import annotations
+
+from array import array
+from datetime import date, datetime, time, timedelta, timezone
+import random
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from energy_balancer.helpers import (
+    Point,
+    PriceSeries,
+    _normalize_rows_generic,
+    _normalize_service_rows,
+    night_intervals_ms,
+    night_mask,
+    normalize_raw_points,
+)
+
+STOCKHOLM = ZoneInfo("Europe/Stockholm")
+# (multiplier, divisor, ndigits) as PriceRegistry passes them, plus no scaling
+SCALES = [(1.0, 1.0, None), (1.25, 1000.0, 2), (1.0, 100.0, 4)]
+
+
+# blake2b of the little-endian columns of series([1.0, 2.0, 3.0])
+FINGERPRINT = 2655091482304383422
+
+
+def series(values: list[float], first: int = 0, slot_ms: int = 900_000) -> PriceSeries:
+    return PriceSeries(
+        array("q", [first + i * slot_ms for i in range(len(values))]),
+        array("q", [first + (i + 1) * slot_ms for i in range(len(values))]),
+        array("d", values),
+    )
+
+
+def day_rows(day: date, slot_minutes: int, tz, seed: int = 0) -> list[dict]:
+    """Rows for one local day, stepped in UTC so DST days get 23 or 25 hours."""
+    rng = random.Random(seed)
+    start = datetime(day.year, day.month, day.day, tzinfo=tz).astimezone(timezone.utc)
+    end = datetime(day.year, day.month, day.day, tzinfo=tz) + timedelta(days=1)
+    slot = timedelta(minutes=slot_minutes)
+    rows = []
+    while start < end.astimezone(timezone.utc):
+        rows.append(
+            {
+                "start": start.astimezone(tz).isoformat(),
+                "end": (start + slot).astimezone(tz).isoformat(),
+                "price": round(rng.uniform(-20.0, 300.0), 2),
+            }
+        )
+        start += slot
+    return rows
+
+
+def zulu(rows: list[dict]) -> list[dict]:
+    def z(value: str) -> str:
+        return datetime.fromisoformat(value).astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+    return [{**r, "start": z(r["start"]), "end": z(r["end"])} for r in rows]
+
+
+def generic(rows, multiplier, divisor, ndigits):
+    series = _normalize_rows_generic(rows)
+    series.scale(multiplier, divisor, ndigits)
+    return series
+
+
+def assert_same(a, b) -> None:
+    assert list(a.start_ts) == list(b.start_ts)
+    assert list(a.end_ts) == list(b.end_ts)
+    assert list(a.values) == list(b.values)
+
+
+@pytest.mark.parametrize("scale", SCALES)
+@pytest.mark.parametrize(
+    "rows",
+    [
+        pytest.param(day_rows(date(2025, 1, 6), 60, STOCKHOLM), id="plus_0100"),
+        pytest.param(day_rows(date(2025, 1, 6), 15, STOCKHOLM), id="plus_0100_15min"),
+        pytest.param(zulu(day_rows(date(2025, 1, 6), 15, STOCKHOLM)), id="zulu"),
+        pytest.param(day_rows(date(2025, 3, 30), 15, STOCKHOLM), id="dst_spring"),
+        pytest.param(day_rows(date(2025, 10, 26), 15, STOCKHOLM), id="dst_autumn"),
+        pytest.param(zulu(day_rows(date(2025, 10, 26), 60, STOCKHOLM)), id="dst_autumn_zulu"),
+        pytest.param(day_rows(date(2025, 1, 6), 60, STOCKHOLM)[::-1], id="unsorted"),
+        pytest.param(
+            [{**r, "price": str(r["price"])} for r in day_rows(date(2025, 1, 6), 60, STOCKHOLM)],
+            id="string_prices",
+        ),
+        pytest.param(
+            [
+                {"start": r["start"], "end": r["end"], "value": r["price"]}
+                for r in day_rows(date(2025, 1, 6), 60, STOCKHOLM)
+            ]
+            + [{"start": "2025-01-07T00:00:00+01:00", "end": "2025-01-07T01:00:00+01:00", "price": None}],
+            id="value_key_and_missing_price",
+        ),
+    ],
+)
+def test_fast_path_matches_generic(rows, scale):
+    fast = _normalize_service_rows(rows, *scale)
+    assert fast is not None
+    assert_same(fast, generic(rows, *scale))
+    assert_same(normalize_raw_points(rows, *scale), fast)
+
+
+def test_dst_days_have_23_and_25_hours():
+    spring = _normalize_service_rows(day_rows(date(2025, 3, 30), 60, STOCKHOLM), 1.0, 1.0, None)
+    autumn = _normalize_service_rows(day_rows(date(2025, 10, 26), 60, STOCKHOLM), 1.0, 1.0, None)
+    assert len(spring) == 23
+    assert len(autumn) == 25
+    # The repeated 02:00 local hour stays two distinct, contiguous slots
+    assert all(e == s for e, s in zip(autumn.end_ts, autumn.start_ts[1:]))
+
+
+@pytest.mark.parametrize("scale", SCALES)
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        pytest.param(lambda r, i: {k: v for k, v in r.items() if k != "end"} if i == 3 else r, id="missing_end"),
+        pytest.param(lambda r, i: {"start": r["start"], "price": r["price"]}, id="no_end_at_all"),
+        pytest.param(
+            lambda r, i: {**r, "start": r["start"][:19], "end": r["end"][:19]} if i == 5 else r,
+            id="naive_timestamp",
+        ),
+        pytest.param(
+            lambda r, i: {**r, "start": datetime.fromisoformat(r["start"])} if i == 0 else r,
+            id="datetime_start",
+        ),
+        pytest.param(
+            lambda r, i: (
+                {
+                    "start_ts": int(datetime.fromisoformat(r["start"]).timestamp() * 1000),
+                    "end_ts": int(datetime.fromisoformat(r["end"]).timestamp()),
+                    "price": r["price"],
+                }
+                if i % 2
+                else r
+            ),
+            id="epoch_columns",
+        ),
+        pytest.param(lambda r, i: {**r, "price": "n/a"} if i == 7 else r, id="unparsable_price"),
+        pytest.param(lambda r, i: {**r, "start": "not a date"} if i == 2 else r, id="unparsable_start"),
+    ],
+)
+def test_mixed_rows_fall_back_to_generic(mutate, scale):
+    rows = [mutate(r, i) for i, r in enumerate(day_rows(date(2025, 10, 26), 60, STOCKHOLM))]
+    assert _normalize_service_rows(rows, *scale) is None
+    assert_same(normalize_raw_points(rows, *scale), generic(rows, *scale))
+
+
+# --- night window ------------------------------------------------------------
+
+NIGHT_WINDOWS = [
+    (time(22, 30), time(5, 0)),
+    (time(2, 15), time(2, 45)),  # inside the skipped / repeated hour
+    (time(2, 30), time(4, 0)),  # starts inside it
+    (time(1, 0), time(2, 30)),  # ends inside it
+    (time(2, 0), time(3, 0)),
+    (time(23, 0), time(2, 30)),  # wraps midnight, ends inside it
+    (time(0, 0), time(6, 0)),
+]
+
+
+def is_night_slot(start_ms: int, start: time, end: time) -> bool:
+    """The per-slot check night_intervals_ms replaced: local wall time of the slot start."""
+    t = datetime.fromtimestamp(start_ms / 1000, timezone.utc).astimezone(STOCKHOLM).time()
+    return start <= t < end if start < end else t >= start or t < end
+
+
+def slot_starts(first: date, days: int, slot_minutes: int) -> list[int]:
+    lo = int(datetime(first.year, first.month, first.day, tzinfo=STOCKHOLM).timestamp() * 1000)
+    last = first + timedelta(days=days)
+    hi = int(datetime(last.year, last.month, last.day, tzinfo=STOCKHOLM).timestamp() * 1000)
+    return list(range(lo, hi, slot_minutes * 60_000))
+
+
+def mask_for(starts: list[int], first: date, days: int, start: time, end: time) -> list[bool]:
+    intervals = []
+    for k in range(days):
+        intervals.extend(night_intervals_ms(first + timedelta(days=k), start, end, STOCKHOLM))
+    return night_mask(starts, intervals)
+
+
+@pytest.mark.parametrize("window", NIGHT_WINDOWS, ids=lambda w: f"{w[0]:%H%M}-{w[1]:%H%M}")
+@pytest.mark.parametrize("first", [date(2025, 3, 29), date(2025, 10, 25), date(2025, 1, 5)], ids=str)
+@pytest.mark.parametrize("slot_minutes", [5, 15, 60])
+def test_night_mask_matches_local_time_check(first, window, slot_minutes):
+    starts = slot_starts(first, 3, slot_minutes)
+    expected = [is_night_slot(ts, *window) for ts in starts]
+    assert mask_for(starts, first, 3, *window) == expected
+
+
+def test_night_window_in_the_skipped_hour_is_empty():
+    day = date(2025, 3, 30)
+    assert night_intervals_ms(day, time(2, 15), time(2, 45), STOCKHOLM) == ()
+    starts = slot_starts(day, 1, 15)
+    assert not any(mask_for(starts, day, 1, time(2, 15), time(2, 45)))
+    # A window starting in the gap begins at the switch (03:00 CEST)
+    switch = int(datetime(2025, 3, 30, 1, 0, tzinfo=timezone.utc).timestamp() * 1000)
+    assert night_intervals_ms(day, time(2, 30), time(4, 0), STOCKHOLM)[0][0] == switch
+
+
+def test_night_window_in_the_repeated_hour_matches_both():
+    day = date(2025, 10, 26)
+    starts = slot_starts(day, 1, 15)
+    mask = mask_for(starts, day, 1, time(2, 15), time(2, 45))
+    marked = [datetime.fromtimestamp(ts / 1000, timezone.utc).strftime("%H:%M") for ts, m in zip(starts, mask) if m]
+    # 02:15 and 02:30 local time, first in CEST (+02:00), then in CET (+01:00)
+    assert marked == ["00:15", "00:30", "01:15", "01:30"]
+
+
+# --- PriceSeries -------------------------------------------------------------
+
+
+def test_price_series_indexing_and_iteration():
+    s = series([1.5, -0.25, 3.0])
+    assert len(s) == 3
+    assert s[1] == Point(900_000, 1_800_000, -0.25)
+    assert s[-1] == Point(1_800_000, 2_700_000, 3.0)
+    assert list(s) == [s[0], s[1], s[2]]
+    assert PriceSeries.from_points(list(s)).fingerprint() == s.fingerprint()
+    assert len(PriceSeries()) == 0
+    assert list(PriceSeries()) == []
+
+
+def test_price_series_view_shares_buffers():
+    s = series([1.0, 2.0, 3.0, 4.0])
+    v = s.view(1, 3)
+    assert list(v) == [s[1], s[2]]
+    assert v.fingerprint() == series([2.0, 3.0], first=900_000).fingerprint()
+    # Writes through the parent are visible in the view
+    s.values[1] = 9.0
+    assert v[0].value == 9.0
+    assert len(s.view(4, 4)) == 0
+
+
+@pytest.mark.parametrize("left_view", [False, True])
+@pytest.mark.parametrize("right_view", [False, True])
+def test_price_series_concat(left_view, right_view):
+    a = series([1.0, 2.0])
+    b = series([3.0, 4.0, 5.0], first=1_800_000)
+    left = a.view(0, 2) if left_view else a
+    right = b.view(0, 3) if right_view else b
+    joined = left.concat(right)
+    assert list(joined) == list(a) + list(b)
+    assert isinstance(joined.values, array)
+    assert joined.fingerprint() == series([1.0, 2.0, 3.0, 4.0, 5.0]).fingerprint()
+    # The result is a copy
+    joined.values[0] = 0.0
+    assert a.values[0] == 1.0
+
+
+def test_price_series_scale():
+    s = series([100.0, 250.0, -12.5])
+    s.scale(1.25, 1000.0, 4)
+    assert list(s.values) == [0.125, 0.3125, -0.0156]
+    s = series([100.0, 250.0])
+    s.scale(2.0)
+    assert list(s.values) == [200.0, 500.0]
+    # Scaling a view scales the parent's buffer in place
+    s = series([1.0, 2.0, 3.0])
+    s.view(1, 3).scale(10.0)
+    assert list(s.values) == [1.0, 20.0, 30.0]
+
+
+def test_price_series_fingerprint():
+    a = series([1.0, 2.0, 3.0])
+    b = series([1.0, 2.0, 3.0])
+    assert a.fingerprint() == b.fingerprint()
+    # Same content through a view or a concat
+    assert series([0.0, 1.0, 2.0, 3.0], first=-900_000).view(1, 4).fingerprint() == a.fingerprint()
+    assert a.view(0, 1).concat(a.view(1, 3)).fingerprint() == a.fingerprint()
+    # Any column changing changes it
+    assert series([1.0, 2.0, 3.5]).fingerprint() != a.fingerprint()
+    assert series([1.0, 2.0, 3.0], first=1).fingerprint() != a.fingerprint()
+    assert series([1.0, 2.0, 3.0], slot_ms=3_600_000).fingerprint() != a.fingerprint()
+    # A known value: stable across processes, unlike hash()
+    assert a.fingerprint() == FINGERPRINT
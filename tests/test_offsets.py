@@ -0,0 +1,260 @@
+"""Offset engines against window_offsets_reference, the original O(n*h) loop."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from energy_balancer.helpers import clamp, quantize_step
+from energy_balancer.offsets import (
+    HAS_NUMPY,
+    OffsetParams,
+    _rebalance_neutral_iterative,
+    apply_night_cap,
+    compute_offsets,
+    compute_offsets_batch,
+    compute_offsets_scenarios,
+    rebalance_neutral,
+    window_offsets,
+    window_offsets_reference,
+)
+
+# Engines agree with the reference to this, apart from step-size ties (below)
+TOL = 5e-12
+# A value this close to a half step may snap to either neighbour: the engines
+# sum the windows in a different order, so one of them can land just across.
+TIE_TOL = 1e-9
+
+ENGINES = ["linear", pytest.param("numpy", marks=pytest.mark.skipif(not HAS_NUMPY, reason="numpy not installed"))]
+
+
+def random_series(rng: random.Random, n: int) -> list[float]:
+    return [round(rng.uniform(-0.5, 3.0), rng.choice((2, 5, 12))) for _ in range(n)]
+
+
+def night_mask(n: int, slots_per_day: int = 24) -> list[bool]:
+    # 22:00-06:00 in hourly slots
+    return [i % slots_per_day >= 22 or i % slots_per_day < 6 for i in range(n)]
+
+
+def assert_matches(actual, expected, step_size=0.0, unsnapped=None) -> None:
+    """Equal within TOL; one step apart only where the unsnapped value is a tie."""
+    assert len(actual) == len(expected)
+    for i, (a, e) in enumerate(zip(actual, expected)):
+        if abs(a - e) <= TOL:
+            continue
+        assert step_size > 0 and unsnapped is not None, (i, a, e)
+        assert abs(abs(a - e) - step_size) <= TOL, (i, a, e)
+        units = unsnapped[i] / step_size
+        assert abs(abs(units - int(units)) - 0.5) <= TIE_TOL, (i, a, e, unsnapped[i])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_window_random_series(engine):
+    rng = random.Random(1)
+    for _ in range(500):
+        values = random_series(rng, rng.randint(0, 120))
+        horizon = rng.randint(1, 60)
+        max_offset = rng.choice((0.0, 0.5, 1.5, 3.0))
+        expected = window_offsets_reference(values, horizon, max_offset)
+        assert_matches(_window(engine, values, horizon, max_offset), expected)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "values",
+    [
+        [1.25] * 48,
+        [0.1, 0.1, 0.3, 0.3] * 12,
+        [2.0] * 20 + [1.0] * 8 + [2.0] * 20,
+        [0.0, 5.0] * 24,
+    ],
+    ids=["flat", "pairs", "plateau", "alternating"],
+)
+def test_window_flat_and_tied_prices(engine, values):
+    for horizon in (1, 2, 3, 7, 24):
+        expected = window_offsets_reference(values, horizon, 2.0)
+        assert_matches(_window(engine, values, horizon, 2.0), expected)
+    if len(set(values)) == 1:
+        assert _window(engine, values, 24, 2.0) == [0.0] * len(values)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_window_horizon_covers_series(engine):
+    rng = random.Random(2)
+    for n in (1, 2, 3, 17, 48):
+        values = random_series(rng, n)
+        for horizon in (n, n + 1, 10 * n):
+            expected = window_offsets_reference(values, horizon, 1.0)
+            assert_matches(_window(engine, values, horizon, 1.0), expected)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("night_cap", [False, True], ids=["no_cap", "night_cap"])
+def test_pipeline_matches_reference(engine, night_cap):
+    rng = random.Random(3)
+    for _ in range(200):
+        n = rng.randint(1, 96)
+        values = random_series(rng, n)
+        horizon = rng.randint(1, 48)
+        max_offset = rng.choice((0.5, 1.0, 2.0))
+        smoothing = rng.choice((1, 2, 3, 5))
+        step = rng.choice((0.0, 0.1, 0.25, 0.5))
+        mask = night_mask(n) if night_cap else None
+
+        actual = compute_offsets(values, horizon, max_offset, smoothing, step, mask, engine=engine)
+        # Step snapping and clamp; the night cap needs the snapped offsets as input
+        before_cap = compute_offsets(values, horizon, max_offset, smoothing, step, engine=engine)
+        unsnapped = compute_offsets(values, horizon, max_offset, smoothing, engine="reference")
+        snapped = compute_offsets(values, horizon, max_offset, smoothing, step, engine="reference")
+        assert_matches(before_cap, snapped, step, unsnapped)
+
+        if mask is not None:
+            # A tie snapped the other way above shifts the whole rebalance, so
+            # the night cap is checked on this engine's own snapped input.
+            unsnapped, _ = apply_night_cap(before_cap, mask, max_offset)
+            expected = [clamp(quantize_step(o, step), -max_offset, max_offset) for o in unsnapped]
+            assert_matches(actual, expected, step, unsnapped)
+            if all(abs(a - b) <= TOL for a, b in zip(before_cap, snapped)):
+                reference = compute_offsets(values, horizon, max_offset, smoothing, step, mask, engine="reference")
+                assert_matches(actual, reference, step, unsnapped)
+            assert all(o <= TOL for o, night in zip(actual, mask) if night)
+        else:
+            assert actual == before_cap
+        assert all(abs(o) <= max_offset + TOL for o in actual)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_night_cap_fully_masked(engine):
+    values = [3.0, 0.5, 1.0, 2.0, 0.2, 4.0]
+    for mask in ([True] * 6, [False] * 6, [True, False] * 3):
+        expected = compute_offsets(values, 6, 1.0, night_mask=mask, engine="reference")
+        assert_matches(compute_offsets(values, 6, 1.0, night_mask=mask, engine=engine), expected)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("night_cap", [False, True], ids=["no_cap", "night_cap"])
+def test_scenarios_match_compute_offsets(engine, night_cap):
+    """Every row equals compute_offsets with the same engine exactly, step snapping included."""
+    rng = random.Random(5)
+    modes = ("moving_average", "gaussian", "triangular", "exponential")
+    for _ in range(100):
+        n = rng.randint(1, 200)
+        values = random_series(rng, n)
+        mask = night_mask(n)
+        scenarios = [
+            OffsetParams(
+                horizon_slots=rng.randint(1, 48),
+                max_offset=rng.choice((0.0, 0.5, 1.0, 1.5)),
+                smoothing_slots=rng.choice((1, 3, 5, 7)),
+                smoothing_mode=rng.choice(modes),
+                step_size=rng.choice((0.0, 0.1, 0.25, 0.5)),
+                night_cap=night_cap,
+            )
+            for _ in range(rng.randint(1, 12))
+        ]
+        stats: dict = {}
+        rows = compute_offsets_scenarios(values, scenarios, mask, engine=engine, stats=stats)
+        for p, row, residual in zip(scenarios, rows, stats["night_cap_residual"]):
+            single_stats: dict = {}
+            expected = compute_offsets(
+                values,
+                p.horizon_slots,
+                p.max_offset,
+                p.smoothing_slots,
+                p.step_size,
+                mask if p.night_cap else None,
+                engine=engine,
+                stats=single_stats,
+                smoothing_mode=p.smoothing_mode,
+            )
+            assert row == expected
+            assert residual == single_stats.get("night_cap_residual", 0.0)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("night_cap", [False, True], ids=["no_cap", "night_cap"])
+def test_batch_matches_compute_offsets(engine, night_cap):
+    rng = random.Random(6)
+    for _ in range(50):
+        n = rng.randint(1, 200)
+        batch = [random_series(rng, n) for _ in range(rng.randint(1, 6))]
+        masks = [night_mask(n)] * len(batch) if night_cap else None
+        rows = compute_offsets_batch(batch, 24, 1.5, smoothing_slots=5, step_size=0.1, night_masks=masks, engine=engine)
+        for values, row in zip(batch, rows):
+            mask = night_mask(n) if night_cap else None
+            assert row == compute_offsets(values, 24, 1.5, 5, 0.1, mask, engine=engine)
+
+
+def test_rebalance_neutral_against_iterative():
+    rng = random.Random(4)
+    for _ in range(500):
+        n = rng.randint(1, 96)
+        max_offset = rng.choice((0.5, 1.0, 2.0))
+        offsets = [rng.uniform(-max_offset, max_offset) for _ in range(n)]
+        fixed = [rng.random() < rng.choice((0.1, 0.5, 0.9)) for _ in range(n)]
+        # Saturated slots are where the old passes got stuck
+        for j in rng.sample(range(n), n // 4):
+            offsets[j] = rng.choice((-max_offset, max_offset))
+
+        out, residual = rebalance_neutral(offsets, fixed, max_offset)
+        old, old_residual = _rebalance_neutral_iterative(offsets, fixed, max_offset)
+
+        assert residual == pytest.approx(sum(out), abs=TOL)
+        assert all(abs(o) <= max_offset for o in out)
+        assert all(o == x for o, x, f in zip(out, offsets, fixed) if f)
+        free = [j for j in range(n) if not fixed[j]]
+        fixed_total = sum(o for o, f in zip(offsets, fixed) if f)
+        if abs(fixed_total) < len(free) * max_offset:
+            assert abs(residual) <= 1e-9
+        else:
+            # Infeasible: every free slot saturates against the fixed sum
+            assert residual == pytest.approx(fixed_total - len(free) * max_offset * (1 if fixed_total > 0 else -1))
+        assert abs(residual) <= abs(old_residual) + 1e-9
+
+        # Without clamping both are the same constant shift
+        if all(abs(offsets[j]) < max_offset and abs(out[j]) < max_offset for j in free):
+            assert_matches(out, old)
+
+
+def test_rebalance_neutral_recovers_where_iterative_stalls():
+    # The only unsaturated day slot takes the whole correction and saturates;
+    # the slots already at -max_offset are never moved back up
+    offsets = [0.0, 0.5, -1.0, -1.0]
+    fixed = [True, False, False, False]
+    old, old_residual = _rebalance_neutral_iterative(offsets, fixed, 1.0)
+    out, residual = rebalance_neutral(offsets, fixed, 1.0)
+    assert abs(old_residual) > 1e-6
+    assert abs(residual) <= 1e-12
+    assert all(abs(o) <= 1.0 for o in out)
+
+
+def test_step_tie_tolerance():
+    """The documented tolerance: one step apart, and only on a rounding tie."""
+    # Both backends round half to even, so an exact tie snaps identically ...
+    assert quantize_step(0.25, 0.5) == 0.0
+    assert quantize_step(0.75, 0.5) == 1.0
+    if HAS_NUMPY:
+        import numpy as np
+
+        assert np.round(np.asarray([0.25, 0.75]) / 0.5).tolist() == [0.0, 2.0]
+
+    # ... but rounding noise either side of a tie lands a whole step apart
+    below, above = quantize_step(0.25 - 1e-13, 0.5), quantize_step(0.25 + 1e-13, 0.5)
+    assert above - below == 0.5
+    assert_matches([above], [below], 0.5, unsnapped=[0.25])
+
+    # Anything else is a real mismatch
+    with pytest.raises(AssertionError):
+        assert_matches([0.5], [0.0], 0.5, unsnapped=[0.2])
+    with pytest.raises(AssertionError):
+        assert_matches([1.0], [0.0], 0.5, unsnapped=[0.25])
+    with pytest.raises(AssertionError):
+        assert_matches([0.5], [0.0])
+
+
+def _window(engine, values, horizon, max_offset):
+    if engine == "numpy":
+        return compute_offsets(values, horizon, max_offset, engine="numpy")
+    return window_offsets(values, horizon, max_offset, engine=engine)
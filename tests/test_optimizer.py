@@ -0,0 +1,126 @@
+"""optimize_offsets: block neutrality, bounds, steps and cost against the heuristic."""
+
+from __future__ import annotations
+
+from itertools import product
+import math
+import random
+
+import pytest
+
+from energy_balancer.offsets import apply_night_cap, compute_offsets
+from energy_balancer.optimizer import _bounds, optimize_offsets
+
+TOL = 1e-9
+
+
+def random_case(rng: random.Random):
+    n = rng.randint(1, 120)
+    values = [round(rng.uniform(-0.2, 3.0), 2) for _ in range(n)]
+    horizon = rng.randint(1, 48)
+    max_offset = rng.choice((0.3, 0.5, 1.0, 1.75, 2.0))
+    step = rng.choice((0.0, 0.1, 0.25, 0.5))
+    mask = [rng.random() < rng.choice((0.0, 0.3, 0.7, 1.0)) for _ in range(n)] if rng.random() < 0.6 else None
+    return values, horizon, max_offset, step, mask
+
+
+def blocks(n: int, horizon: int):
+    return [(lo, min(lo + horizon, n)) for lo in range(0, n, horizon)]
+
+
+def cost(offsets, values) -> float:
+    return sum(o * p for o, p in zip(offsets, values))
+
+
+def test_feasible_neutral_bounded_and_stepped():
+    rng = random.Random(1)
+    for _ in range(500):
+        values, horizon, max_offset, step, mask = random_case(rng)
+        solution = optimize_offsets(values, horizon, max_offset, step, mask, budget_ms=math.inf)
+        offsets = solution.offsets
+        bound, units = _bounds(max_offset, step)
+        assert len(offsets) == len(values)
+        assert bound <= max_offset
+
+        for lo, hi in blocks(len(values), horizon):
+            assert abs(sum(offsets[lo:hi])) <= TOL
+        assert solution.residual <= TOL
+        assert all(abs(o) <= bound + TOL for o in offsets)
+        if mask is not None:
+            assert all(o <= TOL for o, night in zip(offsets, mask) if night)
+        if units:
+            assert all(abs(o / step - round(o / step)) <= TOL for o in offsets)
+
+
+def test_all_night_block_stays_neutral():
+    # Nothing can be raised above 0, which is exactly neutral
+    solution = optimize_offsets([1.0, 2.0, 3.0, 0.5], 4, 1.0, night_mask=[True] * 4)
+    assert solution.offsets == [0.0] * 4
+    assert solution.residual == 0.0
+
+    # Cheap night slots rise to 0, the cheap day slot to +1 to balance the
+    # expensive night slot left at -1
+    solution = optimize_offsets([3.0, 1.0, 2.0, 0.5], 4, 1.0, night_mask=[True, False, True, True])
+    assert solution.offsets == [-1.0, 1.0, 0.0, 0.0]
+
+
+def test_step_size_snaps_the_bound_down():
+    solution = optimize_offsets([3.0, 1.0, 2.0, 0.0], 4, 1.3, step_size=0.5)
+    assert max(abs(o) for o in solution.offsets) == 1.0
+    assert solution.offsets == [-1.0, 1.0, -1.0, 1.0]
+
+
+@pytest.mark.parametrize("night", [False, True], ids=["no_cap", "night_cap"])
+def test_greedy_beats_the_heuristic_on_cost(night):
+    """Per block, the heuristic never costs less where it is feasible (night-capped and neutral)."""
+    rng = random.Random(2)
+    compared = 0
+    for _ in range(300):
+        values, horizon, max_offset, step, _ = random_case(rng)
+        n = len(values)
+        mask = [i % 24 >= 22 or i % 24 < 6 for i in range(n)] if night else None
+        solution = optimize_offsets(values, horizon, max_offset, step, mask, budget_ms=math.inf)
+        bound, _ = _bounds(max_offset, step)
+        if bound <= 0:
+            continue
+
+        for lo, hi in blocks(n, horizon):
+            block = values[lo:hi]
+            block_mask = mask[lo:hi] if mask is not None else [False] * (hi - lo)
+            heuristic = compute_offsets(block, hi - lo, bound, smoothing_slots=3, engine="linear")
+            heuristic, residual = apply_night_cap(heuristic, block_mask, bound)
+            if abs(residual) > TOL:
+                # Negative night offsets alone outweigh the day slots; the
+                # heuristic is not neutral here, so there is nothing to compare
+                continue
+            compared += 1
+            assert cost(solution.offsets[lo:hi], block) <= cost(heuristic, block) + TOL
+    assert compared > 300
+
+
+def test_greedy_is_optimal_on_the_step_grid():
+    rng = random.Random(3)
+    grid = [-1.0, -0.5, 0.0, 0.5, 1.0]
+    for _ in range(60):
+        values = [round(rng.uniform(0.0, 2.0), 1) for _ in range(4)]
+        mask = [rng.random() < 0.4 for _ in range(4)]
+        best = min(
+            cost(combo, values)
+            for combo in product(grid, repeat=4)
+            if sum(combo) == 0 and all(o <= 0 for o, night in zip(combo, mask) if night)
+        )
+        solution = optimize_offsets(values, 4, 1.0, 0.5, mask)
+        assert cost(solution.offsets, values) == pytest.approx(best, abs=TOL)
+
+
+def test_unchanged_blocks_are_reused():
+    rng = random.Random(4)
+    values = [rng.uniform(0.0, 2.0) for _ in range(96)]
+    stats: dict = {}
+    first = optimize_offsets(values, 24, 1.0, 0.1)
+    extended = values + [rng.uniform(0.0, 2.0) for _ in range(24)]
+    second = optimize_offsets(extended, 24, 1.0, 0.1, previous=first, stats=stats)
+    assert stats["optimizer_blocks"] == 5
+    assert stats["optimizer_reused_blocks"] == 4
+    assert stats["optimizer_residual"] <= TOL
+    assert second.offsets[:96] == first.offsets
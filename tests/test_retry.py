@@ -0,0 +1,227 @@
+"""FetchRetryScheduler cycles: eager tasks, partial fetches and failing fetches."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import date, timedelta
+import logging
+
+import pytest
+
+from homeassistant.util import dt as dt_util
+
+from energy_balancer import retry
+
+TODAY = date(2025, 1, 6)
+TOMORROW = TODAY + timedelta(days=1)
+
+
+class Timers:
+    """Stands in for async_track_point_in_time."""
+
+    def __init__(self) -> None:
+        self.pending: list = []
+
+    def track(self, _hass, action, when):
+        timer = (action, when)
+        self.pending.append(timer)
+        return lambda: self.pending.remove(timer)
+
+    def fire(self) -> None:
+        action, when = self.pending.pop(0)
+        action(when)
+
+
+class EagerEntry:
+    """Config entry whose background tasks run eagerly, like asyncio.eager_task_factory."""
+
+    domain = "energy_balancer"
+    entry_id = "test"
+
+    def async_create_background_task(self, _hass, coro, _name):
+        loop = asyncio.get_running_loop()
+        try:
+            coro.send(None)
+        except StopIteration:
+            future = loop.create_future()
+            future.set_result(None)
+            return future
+        raise AssertionError("the cycle was expected to finish without suspending")
+
+
+@pytest.fixture
+def timers(monkeypatch) -> Timers:
+    timers = Timers()
+    monkeypatch.setattr(retry, "async_track_point_in_time", timers.track)
+    return timers
+
+
+def _scheduler(fetch, on_success=None) -> retry.FetchRetryScheduler:
+    async def _noop() -> None:
+        return None
+
+    return retry.FetchRetryScheduler(
+        None, EagerEntry(), fetch, on_success or _noop, logging.getLogger(__name__)
+    )
+
+
+def test_cycle_that_gives_up_without_suspending_keeps_scheduling(timers: Timers) -> None:
+    asyncio.run(_cycle_that_gives_up_without_suspending_keeps_scheduling(timers))
+
+
+async def _cycle_that_gives_up_without_suspending_keeps_scheduling(timers: Timers) -> None:
+    calls: list[list[date]] = []
+
+    async def fetch(dates):
+        # Returns before any await, like a missing nordpool service
+        calls.append(dates)
+        return {day: {"SE3": "nordpool service unavailable"} for day in dates}
+
+    scheduler = _scheduler(fetch)
+    # Deadline already reached: a single attempt, then the date is dropped
+    scheduler.request(TODAY, "today", dt_util.utcnow())
+    timers.fire()
+    assert calls == [[TODAY]]
+    assert scheduler.pending == []
+    assert timers.pending == []
+
+    scheduler.request(TOMORROW, "tomorrow", dt_util.utcnow() + timedelta(minutes=2))
+    assert len(timers.pending) == 1
+    timers.fire()
+    assert calls == [[TODAY], [TOMORROW]]
+    # Failed before the deadline: the retry is scheduled
+    assert scheduler.pending == [TOMORROW]
+    assert len(timers.pending) == 1
+
+
+def test_cycle_that_succeeds_without_suspending_keeps_scheduling(timers: Timers) -> None:
+    asyncio.run(_cycle_that_succeeds_without_suspending_keeps_scheduling(timers))
+
+
+async def _cycle_that_succeeds_without_suspending_keeps_scheduling(timers: Timers) -> None:
+    successes: list[int] = []
+
+    async def fetch(dates):
+        return {day: {"SE3": None} for day in dates}
+
+    async def on_success() -> None:
+        successes.append(1)
+
+    scheduler = _scheduler(fetch, on_success)
+    scheduler.request(TODAY, "today", dt_util.utcnow() + timedelta(minutes=1))
+    timers.fire()
+    assert successes == [1]
+    assert scheduler.pending == []
+
+    scheduler.request(TOMORROW, "tomorrow", dt_util.utcnow() + timedelta(minutes=1))
+    assert len(timers.pending) == 1
+    timers.fire()
+    assert successes == [1, 1]
+
+
+def test_nothing_due_keeps_the_timer(timers: Timers) -> None:
+    asyncio.run(_nothing_due_keeps_the_timer(timers))
+
+
+async def _nothing_due_keeps_the_timer(timers: Timers) -> None:
+    async def fetch(dates):
+        raise AssertionError("nothing is due")
+
+    scheduler = _scheduler(fetch)
+    scheduler.request(TOMORROW, "tomorrow", dt_util.utcnow() + timedelta(hours=2))
+    # Push the attempt past the coalesce window, then fire the timer early
+    scheduler._states[TOMORROW].next_attempt = dt_util.utcnow() + timedelta(hours=1)
+    timers.fire()
+    assert scheduler.pending == [TOMORROW]
+    assert len(timers.pending) == 1
+
+
+def test_partial_fetch_refreshes_and_retries_the_rest(timers: Timers) -> None:
+    asyncio.run(_partial_fetch_refreshes_and_retries_the_rest(timers))
+
+
+async def _partial_fetch_refreshes_and_retries_the_rest(timers: Timers) -> None:
+    calls: list[list[date]] = []
+    successes: list[int] = []
+    stored: set[str] = set()
+
+    async def fetch(dates):
+        # The primary area arrives at once, the additional one on the second try
+        calls.append(dates)
+        results = {}
+        for day in dates:
+            results[day] = {}
+            for area in ("SE3", "NO1"):
+                if area in stored:
+                    continue
+                if area == "NO1" and len(calls) == 1:
+                    results[day][area] = "no prices for NO1"
+                    continue
+                stored.add(area)
+                results[day][area] = None
+        return results
+
+    async def on_success() -> None:
+        successes.append(1)
+
+    scheduler = _scheduler(fetch, on_success)
+    scheduler.request(TODAY, "today", dt_util.utcnow() + timedelta(minutes=2))
+    timers.fire()
+    # The primary prices are stored, so sensors refresh without waiting for NO1
+    assert successes == [1]
+    assert scheduler.pending == [TODAY]
+    state = scheduler._states[TODAY]
+    assert state.attempts == 1
+    assert state.last_error == "NO1: no prices for NO1"
+    assert not state.succeeded
+
+    timers.fire()
+    assert calls == [[TODAY], [TODAY]]
+    assert successes == [1, 1]
+    assert scheduler.pending == []
+    assert state.succeeded and state.last_error is None
+
+
+def test_error_descriptions() -> None:
+    assert retry._describe({}) is None
+    assert retry._describe({"SE3": None, "NO1": None}) is None
+    # One failure for everything is reported once, without area prefixes
+    assert retry._describe({"SE3": "nordpool service unavailable"}) == "nordpool service unavailable"
+    assert retry._describe(dict.fromkeys(("SE3", "NO1"), "timeout")) == "timeout"
+    assert retry._describe({"SE3": "timeout", "NO1": "no prices for NO1"}) == "SE3: timeout; NO1: no prices for NO1"
+    assert retry._describe({"SE3": None, "NO1": "timeout"}) == "NO1: timeout"
+
+
+def test_failing_fetch_backs_off(timers: Timers) -> None:
+    asyncio.run(_failing_fetch_backs_off(timers))
+
+
+async def _failing_fetch_backs_off(timers: Timers) -> None:
+    calls: list[list[date]] = []
+
+    async def fetch(dates):
+        calls.append(dates)
+        raise RuntimeError("registry exploded")
+
+    scheduler = _scheduler(fetch)
+    scheduler.request(TODAY, "today", dt_util.utcnow() + timedelta(minutes=2))
+    scheduler.request(TOMORROW, "tomorrow", dt_util.utcnow() + timedelta(minutes=2))
+    timers.fire()
+    assert calls == [[TODAY, TOMORROW]]
+    assert scheduler.pending == [TODAY, TOMORROW]
+    now = dt_util.utcnow()
+    for state in scheduler._states.values():
+        assert state.attempts == 1
+        assert state.last_error == "RuntimeError: registry exploded"
+        # The first backoff step (5 s with 20 % jitter), not a time in the past
+        assert now + timedelta(seconds=3) < state.next_attempt < now + timedelta(seconds=7)
+    assert len(timers.pending) == 1
+    assert timers.pending[0][1] == min(s.next_attempt for s in scheduler._states.values())
+
+    # Past the deadline the date is given up like any other failure
+    for state in scheduler._states.values():
+        state.deadline = dt_util.utcnow()
+    timers.fire()
+    assert scheduler.pending == []
+    assert timers.pending == []
+    assert [s.attempts for s in scheduler._history] == [2, 2]
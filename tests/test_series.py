@@ -0,0 +1,93 @@
+"""OffsetForecast slot lookups, including gaps and times outside the series."""
+
+from __future__ import annotations
+
+from array import array
+
+import pytest
+
+from energy_balancer.helpers import Point, PriceSeries
+from energy_balancer.series import OffsetForecast
+
+# Four 10 ms slots with a gap between 20 and 30
+STARTS = [0, 10, 30, 40]
+ENDS = [10, 20, 40, 50]
+VALUES = [1.0, 2.0, 3.0, 4.0]
+
+
+def forecast(offsets: list[float]) -> OffsetForecast:
+    prices = PriceSeries(array("q", STARTS), array("q", ENDS), array("d", VALUES))
+    return OffsetForecast(prices, offsets, 10)
+
+
+@pytest.mark.parametrize(
+    ("ts", "expected"),
+    [(-1, None), (0, 0), (9, 0), (10, 1), (19, 1), (20, None), (29, None), (30, 2), (49, 3), (50, None), (99, None)],
+)
+def test_index_at(ts, expected):
+    assert forecast([0.0] * 4).index_at(ts) == expected
+
+
+def test_slot_at_and_next_slots():
+    f = forecast([0.5, -0.5, 1.0, 0.0])
+    assert f.slot_at(15) == (Point(10, 20, 2.0), -0.5)
+    assert f.slot_at(25) is None
+    # In the gap and before the first slot, the list starts at the next slot
+    assert [p.start_ts for p, _ in f.next_slots(25, 5)] == [30, 40]
+    assert [p.start_ts for p, _ in f.next_slots(-5, 2)] == [0, 10]
+    assert [o for _, o in f.next_slots(5, 3)] == [0.5, -0.5, 1.0]
+    assert f.next_slots(50, 3) == []
+    assert f.next_slots(5, 0) == []
+
+
+@pytest.mark.parametrize(
+    ("start", "end", "expected"),
+    [
+        (None, None, (0, 4)),
+        (5, 35, (0, 3)),  # partial overlap at both ends
+        (10, 30, (1, 2)),  # end is exclusive
+        (20, 30, (2, 2)),  # entirely inside the gap
+        (25, None, (2, 4)),
+        (None, 0, (0, 0)),  # before the first slot
+        (-10, 5, (0, 1)),
+        (50, None, (4, 4)),  # after the last slot
+        (60, 70, (4, 4)),
+        (35, 20, (2, 2)),  # inverted range is empty, not negative
+    ],
+)
+def test_index_range(start, end, expected):
+    assert forecast([0.0] * 4).index_range(start, end) == expected
+
+
+@pytest.mark.parametrize(
+    ("ts", "expected"),
+    [(-5, 0), (0, 10), (15, 20), (20, 30), (25, 30), (45, 50), (50, None), (100, None)],
+)
+def test_next_boundary_ms(ts, expected):
+    assert forecast([0.0] * 4).next_boundary_ms(ts) == expected
+
+
+def test_ms_until_sign_change():
+    f = forecast([0.5, 0.25, -1.0, -0.5])
+    assert f.ms_until_sign_change(3) == 27  # next negative slot starts at 30, across the gap
+    assert f.ms_until_sign_change(12) == 18
+    assert f.ms_until_sign_change(35) is None  # negative to the end
+    assert f.ms_until_sign_change(25) is None  # in the gap
+    assert f.ms_until_sign_change(-1) is None
+    assert f.ms_until_sign_change(50) is None
+
+    # Zero is its own sign
+    f = forecast([0.0, 0.0, 1.0, 0.0])
+    assert f.ms_until_sign_change(0) == 30
+    assert f.ms_until_sign_change(30) == 10
+    assert f.ms_until_sign_change(40) is None
+
+
+def test_empty_forecast():
+    f = OffsetForecast(PriceSeries(), [], 0)
+    assert len(f) == 0
+    assert f.index_at(0) is None
+    assert f.index_range(None, None) == (0, 0)
+    assert f.next_boundary_ms(0) is None
+    assert f.ms_until_sign_change(0) is None
+    assert f.next_slots(0, 3) == []
@@ -0,0 +1,152 @@
+"""Persisted price cache: encode/decode round trips, stale dates and bad payloads."""
+
+from __future__ import annotations
+
+from array import array
+import asyncio
+from datetime import date
+import json
+
+import pytest
+
+from energy_balancer.const import DOMAIN
+from energy_balancer.helpers import PriceSeries
+from energy_balancer.storage import PriceStore, decode_series, encode_series
+from homeassistant.helpers.storage import Store
+
+SLOT_MS = 900_000
+DAY0 = 1_735_686_000_000  # 2025-01-01T00:00:00+01:00
+TODAY = date(2025, 1, 1)
+TOMORROW = date(2025, 1, 2)
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    Store.data.clear()
+    yield
+    Store.data.clear()
+
+
+def series(values: list[float], starts: list[int] | None = None, slot_ms: int = SLOT_MS) -> PriceSeries:
+    if starts is None:
+        starts = [DAY0 + i * slot_ms for i in range(len(values))]
+    return PriceSeries(array("q", starts), array("q", [s + slot_ms for s in starts]), array("d", values))
+
+
+def on_disk(raw: dict) -> dict:
+    # What the store hands back after a save and a restart
+    return json.loads(json.dumps(raw))
+
+
+def assert_same(a: PriceSeries, b: PriceSeries) -> None:
+    assert list(a) == list(b)
+    assert a.fingerprint() == b.fingerprint()
+
+
+@pytest.mark.parametrize(
+    "s",
+    [
+        pytest.param(series([0.1, -0.25, 3.14159, 1e-7] * 24), id="regular"),
+        pytest.param(series([1.5]), id="single_slot"),
+        pytest.param(series([1.0, 2.0, 3.0], slot_ms=3_600_000), id="hourly"),
+        pytest.param(series([1.0, 2.0, 3.0], starts=[DAY0, DAY0 + SLOT_MS, DAY0 + 3 * SLOT_MS]), id="gap"),
+        pytest.param(series([1.0, 2.0]).view(0, 2).concat(series([3.0], starts=[DAY0 + 2 * SLOT_MS])), id="view"),
+    ],
+)
+def test_encode_decode_round_trip(s):
+    decoded = decode_series(on_disk(encode_series(s)))
+    assert decoded is not None
+    assert_same(decoded, s)
+
+
+def test_regular_series_is_stored_compactly():
+    raw = encode_series(series([1.0, 2.0, 3.0]))
+    assert raw == {"start_ts": DAY0, "slot_ms": SLOT_MS, "values": [1.0, 2.0, 3.0]}
+    irregular = encode_series(series([1.0, 2.0], starts=[DAY0, DAY0 + 2 * SLOT_MS]))
+    assert set(irregular) == {"starts", "ends", "values"}
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        {},
+        {"values": []},
+        {"start_ts": DAY0, "slot_ms": SLOT_MS, "values": []},
+        {"start_ts": DAY0, "values": [1.0]},
+        {"start_ts": "soon", "slot_ms": SLOT_MS, "values": [1.0]},
+        {"start_ts": DAY0, "slot_ms": SLOT_MS, "values": [1.0, "n/a"]},
+        {"start_ts": DAY0, "slot_ms": SLOT_MS, "values": None},
+        {"starts": [DAY0], "ends": [DAY0 + SLOT_MS], "values": [1.0, 2.0]},
+        {"starts": [DAY0, DAY0 + SLOT_MS], "ends": [DAY0 + SLOT_MS], "values": [1.0, 2.0]},
+        {"starts": None, "ends": [DAY0 + SLOT_MS], "values": [1.0]},
+    ],
+)
+def test_decode_rejects_bad_payloads(raw):
+    assert decode_series(raw) is None
+
+
+def test_price_store_survives_a_restart():
+    async def run():
+        store = PriceStore(None, "restart")
+        await store.async_load()
+        store.set_prices("SE3", "SEK", True, TODAY, series([1.0, 2.0]))
+        store.set_prices("SE3", "SEK", False, TODAY, series([3.0, 4.0]))
+        store.set_offsets("key", [0.5, -0.5])
+
+        restored = PriceStore(None, "restart")
+        await restored.async_load()
+        return restored
+
+    restored = asyncio.run(run())
+    assert_same(restored.get_prices("SE3", "SEK", True, TODAY), series([1.0, 2.0]))
+    assert_same(restored.get_prices("SE3", "SEK", False, TODAY), series([3.0, 4.0]))
+    # Keyed by area, currency, VAT and date
+    assert restored.get_prices("SE3", "EUR", True, TODAY) is None
+    assert restored.get_prices("SE4", "SEK", True, TODAY) is None
+    assert restored.get_prices("SE3", "SEK", True, TOMORROW) is None
+    assert restored.get_offsets("key") == [0.5, -0.5]
+    assert restored.get_offsets("other parameters") is None
+
+
+def test_prune_drops_stale_dates():
+    async def run():
+        store = PriceStore(None, "prune")
+        await store.async_load()
+        for day in (date(2024, 12, 31), TODAY, TOMORROW):
+            store.set_prices("SE3", "SEK", True, day, series([float(day.day)]))
+        store.prune(TODAY)
+
+        restored = PriceStore(None, "prune")
+        await restored.async_load()
+        return store, restored
+
+    store, restored = asyncio.run(run())
+    for s in (store, restored):
+        assert s.get_prices("SE3", "SEK", True, date(2024, 12, 31)) is None
+        assert_same(s.get_prices("SE3", "SEK", True, TODAY), series([1.0]))
+        assert_same(s.get_prices("SE3", "SEK", True, TOMORROW), series([2.0]))
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        None,
+        {},
+        {"prices": [], "offsets": "x"},
+        {"prices": {"SE3|SEK|1|2025-01-01": "garbage"}, "offsets": {"key": "key", "values": "garbage"}},
+        {"prices": {"SE3|SEK|1|2025-01-01": {"values": [1.0]}}, "offsets": None},
+        {"prices": {}, "offsets": {"key": "key", "values": [0.5, "n/a"]}},
+        {"prices": {}, "offsets": {"key": "key", "values": [0.5, None]}},
+    ],
+)
+def test_price_store_ignores_bad_payloads(data):
+    async def run():
+        if data is not None:
+            await Store(None, 1, f"{DOMAIN}.bad").async_save(data)
+        store = PriceStore(None, "bad")
+        await store.async_load()
+        return store
+
+    store = asyncio.run(run())
+    assert store.get_prices("SE3", "SEK", True, TODAY) is None
+    assert store.get_offsets("key") is None
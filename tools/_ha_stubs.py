@@ -0,0 +1,148 @@
+"""Minimal stand-ins for the Home Assistant modules the compute core imports.
+
+The offset pipeline (helpers, offsets, series, attributes) only needs
+homeassistant.util.dt; the retry scheduler also imports a few names from
+homeassistant.core, config_entries and helpers.event, and the price cache
+uses helpers.storage.Store. install() registers
+small implementations of them when Home Assistant itself is not
+importable, and load_integration() imports the integration package
+without running its __init__ (which pulls in config entries, the
+coordinator and the rest of HA).
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, time, timezone, tzinfo
+import importlib
+import json
+from pathlib import Path
+import sys
+import types
+from typing import Any
+from zoneinfo import ZoneInfo
+
+PACKAGE = "energy_balancer"
+PACKAGE_DIR = Path(__file__).resolve().parent.parent / "custom_components" / PACKAGE
+
+
+def _dt_module() -> types.ModuleType:
+    dt = types.ModuleType("homeassistant.util.dt")
+    dt.UTC = timezone.utc
+    dt.DEFAULT_TIME_ZONE = timezone.utc
+
+    def get_time_zone(name: str) -> tzinfo | None:
+        try:
+            return ZoneInfo(name)
+        except Exception:  # noqa: BLE001
+            return None
+
+    def utcnow() -> datetime:
+        return datetime.now(timezone.utc)
+
+    def as_utc(value: datetime) -> datetime:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=dt.DEFAULT_TIME_ZONE)
+        return value.astimezone(timezone.utc)
+
+    def as_local(value: datetime) -> datetime:
+        return as_utc(value).astimezone(dt.DEFAULT_TIME_ZONE)
+
+    def utc_from_timestamp(timestamp: float) -> datetime:
+        return datetime.fromtimestamp(timestamp, timezone.utc)
+
+    def parse_datetime(value: str) -> datetime | None:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+
+    def parse_time(value: str) -> time | None:
+        try:
+            return time.fromisoformat(value)
+        except ValueError:
+            return None
+
+    for func in (get_time_zone, utcnow, as_utc, as_local, utc_from_timestamp, parse_datetime, parse_time):
+        setattr(dt, func.__name__, func)
+    return dt
+
+
+def _module(name: str, **attrs: Any) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+def _async_track_point_in_time(hass: Any, action: Any, point_in_time: datetime) -> Any:
+    # There is no event loop behind the stubs; tests patch in their own timers
+    raise NotImplementedError("async_track_point_in_time is not available without Home Assistant")
+
+
+class _Store:
+    """In-memory helpers.storage.Store, shared by key like files on disk.
+
+    Saves are written immediately and go through JSON, so tuples come back
+    as lists and non-serializable data fails as it would in Home Assistant.
+    """
+
+    data: dict[str, str] = {}
+
+    def __init__(self, hass: Any, version: int, key: str) -> None:
+        self.version = version
+        self.key = key
+
+    async def async_load(self) -> Any:
+        raw = self.data.get(self.key)
+        return None if raw is None else json.loads(raw)
+
+    async def async_save(self, data: Any) -> None:
+        self.data[self.key] = json.dumps(data)
+
+    def async_delay_save(self, data_func: Any, delay: float = 0) -> None:
+        self.data[self.key] = json.dumps(data_func())
+
+    async def async_remove(self) -> None:
+        self.data.pop(self.key, None)
+
+
+def install() -> bool:
+    """Register the stubs unless Home Assistant is installed. Returns True if stubbed."""
+    try:
+        importlib.import_module("homeassistant.util.dt")
+        return False
+    except ImportError:
+        pass
+
+    dt = _dt_module()
+    util = _module("homeassistant.util", __path__=[], dt=dt)
+    event = _module("homeassistant.helpers.event", async_track_point_in_time=_async_track_point_in_time)
+    storage = _module("homeassistant.helpers.storage", Store=_Store)
+    helpers = _module("homeassistant.helpers", __path__=[], event=event, storage=storage)
+    core = _module("homeassistant.core", HomeAssistant=object, callback=lambda func: func)
+    config_entries = _module("homeassistant.config_entries", ConfigEntry=object)
+    ha = _module(
+        "homeassistant", __path__=[], util=util, helpers=helpers, core=core, config_entries=config_entries
+    )
+    sys.modules.update(
+        {
+            "homeassistant": ha,
+            "homeassistant.util": util,
+            "homeassistant.util.dt": dt,
+            "homeassistant.core": core,
+            "homeassistant.config_entries": config_entries,
+            "homeassistant.helpers": helpers,
+            "homeassistant.helpers.event": event,
+            "homeassistant.helpers.storage": storage,
+        }
+    )
+    return True
+
+
+def load_integration() -> types.ModuleType:
+    """Import the integration package as a bare namespace (its __init__ is skipped)."""
+    install()
+    if PACKAGE not in sys.modules:
+        pkg = types.ModuleType(PACKAGE)
+        pkg.__path__ = [str(PACKAGE_DIR)]
+        sys.modules[PACKAGE] = pkg
+    return sys.modules[PACKAGE]
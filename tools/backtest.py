@@ -0,0 +1,386 @@
+"""Replay historical day-ahead prices through the offset pipeline.
+
+Streams price history from CSV files (columns start, end, price|value) or
+JSON day files (a list of rows, or {area: rows} as returned by
+nordpool.get_prices_for_date), evaluates a parameter grid in a process pool
+and reports cost-shift and neutrality metrics per configuration:
+
+    python tools/backtest.py history/ --area SE3 \\
+        --horizon 6,12,24 --max-offset 0.5:2:0.5 --smoothing 0:10 --step-size 0,0.1
+
+Offsets are computed like the coordinator does: slots before 13:30 local
+time use today's prices only, later slots use today + tomorrow (when the
+next day exists in the history). compute_offsets_batch runs every day of a
+configuration in one call, so a grid of thousands of configurations over
+several years takes minutes.
+
+Metrics per configuration (offsets in degrees, prices after --divisor/--vat
+rounded to 2 decimals like the integration, slot lengths in hours):
+  cost_shift           sum of offset * (price - day mean) * hours; negative
+                       means heat was moved to cheaper slots
+  neutrality_mean_abs  mean over days of |sum of offset * hours|
+  neutrality_max_abs   worst day of the above
+  mean_abs_offset      mean |offset| over all slots
+  step_changes_per_day mean number of offset changes per day
+"""
+
+from __future__ import annotations
+
+import argparse
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, time, timedelta
+from itertools import islice, product
+import json
+import os
+from pathlib import Path
+import sys
+import time as time_mod
+from typing import Any
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import _ha_stubs  # noqa: E402
+
+_ha_stubs.load_integration()
+
+from energy_balancer.const import SMOOTHING_MODES  # noqa: E402
+from energy_balancer.helpers import (  # noqa: E402
+    PriceSeries,
+    infer_slot_ms,
+    night_intervals_ms,
+    night_mask,
+    normalize_raw_points,
+)
+from energy_balancer.offsets import compute_offsets_batch  # noqa: E402
+
+TOMORROW_PUBLISHED = time(13, 30)
+
+
+@dataclass(frozen=True, slots=True)
+class BacktestConfig:
+    horizon_hours: int
+    max_offset: float
+    smoothing_level: int
+    smoothing_mode: str
+    step_size: float
+    night_cap: bool
+
+    @property
+    def smoothing_slots(self) -> int:
+        return 1 if self.smoothing_level <= 0 else 1 + 2 * self.smoothing_level
+
+
+@dataclass(slots=True)
+class Day:
+    """One local day of history, prepared for both views of the coordinator."""
+
+    day: date
+    slot_ms: int
+    values: list[float]  # today only
+    values_ahead: list[float]  # today + tomorrow, or today only if tomorrow is missing
+    split: int  # first slot starting at or after 13:30 local time
+    mask: list[bool]
+    mask_ahead: list[bool]
+
+
+# --- reading history -----------------------------------------------------------
+
+
+def iter_rows(paths: Iterable[Path], area: str | None) -> Iterator[dict[str, Any]]:
+    """Raw rows from CSV and JSON files, in file-name order."""
+    files: list[Path] = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() in (".csv", ".json")))
+        else:
+            files.append(path)
+
+    for path in files:
+        if path.suffix.lower() == ".csv":
+            with path.open(newline="") as fh:
+                yield from csv.DictReader(fh)
+            continue
+        data = json.loads(path.read_text())
+        if isinstance(data, dict):
+            if area is None:
+                if len(data) != 1:
+                    raise SystemExit(f"{path}: several areas in file, pass --area")
+                data = next(iter(data.values()))
+            else:
+                data = data.get(area, [])
+        yield from data
+
+
+def iter_days(
+    rows: Iterable[dict[str, Any]],
+    tz: ZoneInfo,
+    multiplier: float = 1.0,
+    divisor: float = 1.0,
+    ndigits: int | None = None,
+    chunk_rows: int = 4096,
+) -> Iterator[tuple[date, PriceSeries]]:
+    """Split a chronological row stream into local days, a chunk of rows at a time.
+
+    Values are scaled while parsing, like PriceRegistry does.
+    """
+    pending = PriceSeries()
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, chunk_rows))
+        series = pending.concat(normalize_raw_points(chunk, multiplier, divisor, ndigits)) if chunk else pending
+        if not series:
+            return
+        lo = 0
+        while lo < len(series):
+            day = datetime.fromtimestamp(series.start_ts[lo] / 1000, tz).date()
+            next_midnight = int(datetime.combine(day + timedelta(days=1), time(0), tzinfo=tz).timestamp() * 1000)
+            hi = bisect_left(series.start_ts, next_midnight, lo)
+            if hi == len(series) and chunk:
+                break  # the day may continue in the next chunk
+            yield day, _materialize(series.view(lo, hi))
+            lo = hi
+        pending = _materialize(series.view(lo, len(series)))
+        if not chunk:
+            return
+
+
+def _materialize(view: PriceSeries) -> PriceSeries:
+    # Views share the chunk's buffers (and memoryviews don't pickle)
+    empty = PriceSeries()
+    return empty.concat(view)
+
+
+def prepare_days(
+    days: Iterable[tuple[date, PriceSeries]],
+    tz: ZoneInfo,
+    night_start: time,
+    night_end: time,
+) -> Iterator[Day]:
+    """Days from a chronological day stream, looking one day ahead for tomorrow's prices."""
+    it = iter(days)
+    current = next(it, None)
+    while current is not None:
+        following = next(it, None)
+        day, series = current
+        tomorrow = following[1] if following is not None and following[0] == day + timedelta(days=1) else None
+        ahead = series.concat(tomorrow) if tomorrow else series
+        intervals = list(night_intervals_ms(day, night_start, night_end, tz))
+        intervals += night_intervals_ms(day + timedelta(days=1), night_start, night_end, tz)
+        published = int(datetime.combine(day, TOMORROW_PUBLISHED, tzinfo=tz).timestamp() * 1000)
+        yield Day(
+            day=day,
+            slot_ms=infer_slot_ms(series),
+            values=list(series.values),
+            values_ahead=list(ahead.values),
+            split=bisect_left(series.start_ts, published),
+            mask=night_mask(series.start_ts, intervals),
+            mask_ahead=night_mask(ahead.start_ts, intervals),
+        )
+        current = following
+
+
+# --- evaluation ------------------------------------------------------------------
+
+_DAYS: list[Day] = []
+_GROUPS: dict[int, list[int]] = {}
+
+
+def _init_worker(days: list[Day]) -> None:
+    global _DAYS, _GROUPS
+    _DAYS = days
+    _GROUPS = {}
+    for i, d in enumerate(days):
+        _GROUPS.setdefault(d.slot_ms, []).append(i)
+
+
+def applied_offsets(cfg: BacktestConfig) -> list[list[float]]:
+    """Per day, the offset in effect for every slot under cfg."""
+    out: list[list[float]] = [[] for _ in _DAYS]
+    for slot_ms, idx in _GROUPS.items():
+        horizon_slots = max(1, round(cfg.horizon_hours * 3_600_000 / slot_ms))
+        kwargs = {
+            "smoothing_slots": cfg.smoothing_slots,
+            "step_size": cfg.step_size,
+            "smoothing_mode": cfg.smoothing_mode,
+        }
+        morning = compute_offsets_batch(
+            [_DAYS[i].values for i in idx],
+            horizon_slots,
+            cfg.max_offset,
+            night_masks=[_DAYS[i].mask for i in idx] if cfg.night_cap else None,
+            **kwargs,
+        )
+        afternoon = compute_offsets_batch(
+            [_DAYS[i].values_ahead for i in idx],
+            horizon_slots,
+            cfg.max_offset,
+            night_masks=[_DAYS[i].mask_ahead for i in idx] if cfg.night_cap else None,
+            **kwargs,
+        )
+        for i, early, late in zip(idx, morning, afternoon):
+            d = _DAYS[i]
+            out[i] = early[: d.split] + late[d.split : len(d.values)]
+    return out
+
+
+def evaluate(cfg: BacktestConfig) -> dict[str, Any]:
+    cost_shift = 0.0
+    neutrality: list[float] = []
+    abs_total = 0.0
+    slots = 0
+    changes = 0
+    for d, offsets in zip(_DAYS, applied_offsets(cfg)):
+        hours = d.slot_ms / 3_600_000
+        mean_price = sum(d.values) / len(d.values)
+        cost_shift += sum(o * (p - mean_price) for o, p in zip(offsets, d.values)) * hours
+        neutrality.append(abs(sum(offsets)) * hours)
+        abs_total += sum(abs(o) for o in offsets)
+        slots += len(offsets)
+        changes += sum(1 for a, b in zip(offsets, offsets[1:]) if a != b)
+
+    n_days = len(_DAYS)
+    return {
+        **asdict(cfg),
+        "days": n_days,
+        "cost_shift": round(cost_shift, 6),
+        "neutrality_mean_abs": round(sum(neutrality) / n_days, 6) if n_days else 0.0,
+        "neutrality_max_abs": round(max(neutrality, default=0.0), 6),
+        "mean_abs_offset": round(abs_total / slots, 6) if slots else 0.0,
+        "step_changes_per_day": round(changes / n_days, 3) if n_days else 0.0,
+    }
+
+
+# --- command line ----------------------------------------------------------------
+
+
+def parse_values(spec: str, kind: type) -> list:
+    """"a,b,c" or an inclusive range "start:stop[:step]"."""
+    out: list = []
+    for part in spec.split(","):
+        part = part.strip()
+        if ":" in part:
+            fields = [float(x) for x in part.split(":")]
+            start, stop = fields[0], fields[1]
+            step = fields[2] if len(fields) > 2 else 1.0
+            n = int(round((stop - start) / step)) + 1
+            out.extend(kind(round(start + k * step, 10)) for k in range(max(0, n)))
+        elif part:
+            out.append(kind(part))
+    return list(dict.fromkeys(out))
+
+
+def parse_bools(spec: str) -> list[bool]:
+    return list(dict.fromkeys(p.strip().lower() in ("1", "on", "true", "yes") for p in spec.split(",")))
+
+
+def build_grid(args: argparse.Namespace) -> list[BacktestConfig]:
+    modes = [m.strip() for m in args.smoothing_mode.split(",")]
+    for mode in modes:
+        if mode not in SMOOTHING_MODES:
+            raise SystemExit(f"unknown smoothing mode {mode!r} (choose from {', '.join(SMOOTHING_MODES)})")
+    return [
+        BacktestConfig(*combo)
+        for combo in product(
+            parse_values(args.horizon, int),
+            parse_values(args.max_offset, float),
+            parse_values(args.smoothing, int),
+            modes,
+            parse_values(args.step_size, float),
+            parse_bools(args.night_cap),
+        )
+    ]
+
+
+def synthetic_history(days: int) -> Iterator[dict[str, Any]]:
+    from benchmark import synthetic_rows  # noqa: PLC0415
+
+    yield from synthetic_rows(days, 15)
+
+
+def write_report(path: Path, results: list[dict[str, Any]], meta: dict[str, Any]) -> None:
+    if path.suffix.lower() == ".csv":
+        with path.open("w", newline="") as fh:
+            writer = csv.DictWriter(fh, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+        return
+    path.write_text(json.dumps({"meta": meta, "results": results}, indent=1))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("history", nargs="*", type=Path, help="CSV/JSON files or directories")
+    parser.add_argument("--synthetic-days", type=int, help="use synthetic 15-minute prices instead of files")
+    parser.add_argument("--area", help="area key in JSON files with several areas")
+    parser.add_argument("--timezone", default="Europe/Stockholm")
+    parser.add_argument("--divisor", type=float, default=1000.0, help="e.g. 1000 for per-MWh input")
+    parser.add_argument("--vat", type=float, default=0.0, help="VAT rate, e.g. 0.25")
+    parser.add_argument("--night-start", default="22:30")
+    parser.add_argument("--night-end", default="05:00")
+    parser.add_argument("--horizon", default="12", help="hours, e.g. 6,12,24 or 1:48")
+    parser.add_argument("--max-offset", default="1.0")
+    parser.add_argument("--smoothing", default="1", help="smoothing levels, e.g. 0:10")
+    parser.add_argument("--smoothing-mode", default="moving_average")
+    parser.add_argument("--step-size", default="0.1")
+    parser.add_argument("--night-cap", default="off", help="off, on or off,on")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", type=Path, default=Path("backtest-report.json"), help=".json or .csv")
+    parser.add_argument("--top", type=int, default=10, help="configurations to print")
+    args = parser.parse_args(argv)
+
+    if not args.history and not args.synthetic_days:
+        parser.error("pass history files/directories or --synthetic-days")
+
+    tz = ZoneInfo(args.timezone)
+    started = time_mod.perf_counter()
+    rows = synthetic_history(args.synthetic_days) if args.synthetic_days else iter_rows(args.history, args.area)
+    days = iter_days(rows, tz, 1.0 + args.vat, args.divisor, ndigits=2)
+    prepared = list(prepare_days(days, tz, time.fromisoformat(args.night_start), time.fromisoformat(args.night_end)))
+    if not prepared:
+        raise SystemExit("no prices found")
+    loaded = time_mod.perf_counter()
+
+    grid = build_grid(args)
+    print(f"{len(prepared)} days ({prepared[0].day} .. {prepared[-1].day}), {len(grid)} configurations", flush=True)
+
+    workers = max(1, min(args.workers, len(grid)))
+    if workers == 1:
+        _init_worker(prepared)
+        results = [evaluate(cfg) for cfg in grid]
+    else:
+        chunksize = max(1, len(grid) // (workers * 8))
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(prepared,)) as pool:
+            results = list(pool.map(evaluate, grid, chunksize=chunksize))
+    finished = time_mod.perf_counter()
+
+    results.sort(key=lambda r: (r["cost_shift"], r["neutrality_mean_abs"]))
+    meta = {
+        "days": len(prepared),
+        "first_day": prepared[0].day.isoformat(),
+        "last_day": prepared[-1].day.isoformat(),
+        "configurations": len(grid),
+        "workers": workers,
+        "load_seconds": round(loaded - started, 3),
+        "evaluate_seconds": round(finished - loaded, 3),
+    }
+    write_report(args.output, results, meta)
+
+    columns = ("horizon_hours", "max_offset", "smoothing_level", "smoothing_mode", "step_size", "night_cap",
+               "cost_shift", "neutrality_mean_abs", "step_changes_per_day")
+    print("  ".join(columns))
+    for r in results[: args.top]:
+        print("  ".join(str(r[c]) for c in columns))
+    print(
+        f"Evaluated {len(grid)} configurations in {meta['evaluate_seconds']:.1f}s "
+        f"({workers} workers, loading {meta['load_seconds']:.1f}s); report: {args.output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
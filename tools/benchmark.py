@@ -0,0 +1,383 @@
+"""Offline benchmarks for the energy balancer offset pipeline.
+
+Runs without a Home Assistant instance (see _ha_stubs.py) on synthetic
+day-ahead prices and writes a JSON report:
+
+    python tools/benchmark.py                     # full grid -> benchmark-report.json
+    python tools/benchmark.py --quick             # reduced grid
+    python tools/benchmark.py --only offsets      # cases whose name contains "offsets"
+    python tools/benchmark.py --compare old.json  # exit 1 if a case got slower
+
+Every case reports the best and median time per call in microseconds.
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import json
+import math
+from pathlib import Path
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import timeit
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import _ha_stubs  # noqa: E402
+
+_ha_stubs.load_integration()
+
+from energy_balancer import helpers, offsets as offsets_mod  # noqa: E402
+from energy_balancer.attributes import build_offset_attributes, build_price_attributes  # noqa: E402
+from energy_balancer.const import ATTRIBUTE_FORMATS, SMOOTHING_MODES  # noqa: E402
+from energy_balancer.helpers import (  # noqa: E402
+    PriceSeries,
+    infer_slot_ms,
+    moving_average,
+    normalize_raw_points,
+    smooth,
+)
+from energy_balancer.optimizer import optimize_offsets  # noqa: E402
+from energy_balancer.series import OffsetForecast  # noqa: E402
+
+RESOLUTIONS_MIN = (60, 15, 5)
+DAYS = (1, 2, 7)
+HORIZONS_H = (1, 3, 6, 12, 24, 48)
+SMOOTHING_LEVELS = tuple(range(11))
+MAX_OFFSET = 1.5
+STEP_SIZE = 0.1
+DAY_START = datetime(2025, 1, 6, tzinfo=timezone.utc)
+
+
+@dataclass(slots=True)
+class Case:
+    name: str
+    params: dict[str, Any]
+    n_slots: int
+    func: Callable[[], Any]
+
+
+# --- synthetic inputs --------------------------------------------------------
+
+
+def synthetic_rows(days: int, slot_minutes: int, seed: int = 0) -> list[dict[str, Any]]:
+    """Nordpool-shaped rows (ISO start/end, price per MWh) with a daily double peak."""
+    rng = random.Random(seed)
+    rows = []
+    slot = timedelta(minutes=slot_minutes)
+    n = days * 24 * 60 // slot_minutes
+    for i in range(n):
+        start = DAY_START + i * slot
+        hour = start.hour + start.minute / 60
+        shape = 60 * math.exp(-((hour - 8) ** 2) / 4) + 80 * math.exp(-((hour - 18) ** 2) / 6)
+        price = 40 + shape + rng.gauss(0, 12)
+        rows.append({"start": start.isoformat(), "end": (start + slot).isoformat(), "price": round(price, 2)})
+    return rows
+
+
+def synthetic_series(days: int, slot_minutes: int, seed: int = 0) -> PriceSeries:
+    return normalize_raw_points(synthetic_rows(days, slot_minutes, seed), 1.25, divisor=1000.0, ndigits=2)
+
+
+def night_mask_for(series: PriceSeries) -> list[bool]:
+    # 22:30-05:00 UTC; the benchmark only needs a realistic share of night slots
+    out = []
+    for ts in series.start_ts:
+        minute = (ts // 60_000) % (24 * 60)
+        out.append(minute >= 22 * 60 + 30 or minute < 5 * 60)
+    return out
+
+
+def smoothing_slots(level: int) -> int:
+    return 1 if level <= 0 else 1 + 2 * level
+
+
+def horizon_slots(hours: int, slot_minutes: int) -> int:
+    return max(1, round(hours * 60 / slot_minutes))
+
+
+# --- cases -------------------------------------------------------------------
+
+
+def _grid(quick: bool) -> tuple[tuple[int, ...], tuple[int, ...], tuple[int, ...], tuple[int, ...]]:
+    if quick:
+        return (60, 15), (1, 2), (1, 12, 48), (0, 1, 5, 10)
+    return RESOLUTIONS_MIN, DAYS, HORIZONS_H, SMOOTHING_LEVELS
+
+
+def iter_cases(quick: bool) -> Iterator[Case]:
+    resolutions, days_grid, horizons, levels = _grid(quick)
+    engines = [e for e in ("reference", "linear", "numpy") if e != "numpy" or offsets_mod.HAS_NUMPY]
+
+    for res in resolutions:
+        for days in days_grid:
+            rows = synthetic_rows(days, res)
+            series = synthetic_series(days, res)
+            n = len(series)
+            base = {"slot_minutes": res, "days": days}
+
+            yield Case("normalize_raw_points", base, n, lambda rows=rows: normalize_raw_points(rows))
+            yield Case("infer_slot_ms", base, n, lambda s=series: infer_slot_ms(s))
+
+            values = list(series.values)
+            for level in levels:
+                window = smoothing_slots(level)
+                yield Case(
+                    "moving_average",
+                    {**base, "smoothing_level": level},
+                    n,
+                    lambda v=values, w=window: moving_average(v, w),
+                )
+
+            for hours in horizons:
+                h = horizon_slots(hours, res)
+                for level in levels:
+                    yield Case(
+                        "compute_offsets",
+                        {**base, "horizon_hours": hours, "smoothing_level": level, "engine": "auto"},
+                        n,
+                        lambda v=series.values, h=h, w=smoothing_slots(level): offsets_mod.compute_offsets(
+                            v, h, MAX_OFFSET, smoothing_slots=w, step_size=STEP_SIZE
+                        ),
+                    )
+
+            # Engine comparison on the default parameters (12 h, level 1, night cap on)
+            mask = night_mask_for(series)
+            h = horizon_slots(12, res)
+            for engine in engines:
+                if engine == "reference" and n > 700:
+                    continue  # O(n*h); minutes per run on week-long 5-minute series
+                yield Case(
+                    "compute_offsets_engine",
+                    {**base, "horizon_hours": 12, "smoothing_level": 1, "engine": engine, "night_cap": True},
+                    n,
+                    lambda v=series.values, h=h, e=engine, m=mask: offsets_mod.compute_offsets(
+                        v, h, MAX_OFFSET, smoothing_slots=3, step_size=STEP_SIZE, night_mask=m, engine=e
+                    ),
+                )
+
+            yield Case(
+                "optimize_offsets",
+                {**base, "horizon_hours": 12, "night_cap": True},
+                n,
+                lambda v=series.values, h=h, m=mask: optimize_offsets(v, h, MAX_OFFSET, STEP_SIZE, m, budget_ms=math.inf),
+            )
+
+            offsets = offsets_mod.compute_offsets(series.values, h, MAX_OFFSET, smoothing_slots=3, step_size=STEP_SIZE)
+            yield Case(
+                "apply_night_cap",
+                {**base, "backend": "python"},
+                n,
+                lambda o=offsets, m=mask: offsets_mod.apply_night_cap(o, m, MAX_OFFSET),
+            )
+            if offsets_mod.HAS_NUMPY:
+                np = offsets_mod.np
+                o_arr = np.asarray(offsets)
+                m_arr = np.asarray(mask, dtype=bool)
+                yield Case(
+                    "apply_night_cap",
+                    {**base, "backend": "numpy"},
+                    n,
+                    lambda o=o_arr, m=m_arr: offsets_mod._np_apply_night_cap(o.copy(), m, MAX_OFFSET),
+                )
+
+            # Exact breakpoint sweep against the correction passes it replaced
+            capped = [0.0 if night and o > 0 else o for o, night in zip(offsets, mask)]
+            for method, rebalance in (
+                ("exact", offsets_mod.rebalance_neutral),
+                ("iterative", offsets_mod._rebalance_neutral_iterative),
+            ):
+                yield Case(
+                    "rebalance_neutral",
+                    {**base, "method": method},
+                    n,
+                    lambda o=capped, m=mask, f=rebalance: f(o, m, MAX_OFFSET),
+                )
+
+            forecast = OffsetForecast(series, offsets, infer_slot_ms(series))
+            n_today = min(n, 24 * 60 // res)
+            for fmt in ATTRIBUTE_FORMATS:
+                yield Case(
+                    "build_offset_attributes",
+                    {**base, "format": fmt},
+                    n,
+                    lambda f=forecast, k=n_today, fmt=fmt: build_offset_attributes(f, k, fmt, STEP_SIZE),
+                )
+                yield Case(
+                    "build_price_attributes",
+                    {**base, "format": fmt},
+                    n,
+                    lambda f=forecast, k=n_today, fmt=fmt: build_price_attributes(f, k, fmt),
+                )
+
+    # Parsing one service response day incl. VAT and /1000: the general
+    # parser followed by scale() against the fast path (cold and warm
+    # timestamp cache)
+    for res in (60, 15, 5):
+        rows = synthetic_rows(1, res)
+        params = {"slot_minutes": res, "days": 1}
+        yield Case(
+            "parse_service_day",
+            {**params, "path": "generic"},
+            len(rows),
+            lambda rows=rows: helpers._normalize_rows_generic(rows).scale(1.25, 1000.0, 2),
+        )
+        yield Case(
+            "parse_service_day",
+            {**params, "path": "fast_cold"},
+            len(rows),
+            lambda rows=rows: (helpers._iso_to_ms.cache_clear(), normalize_raw_points(rows, 1.25, 1000.0, 2)),
+        )
+        yield Case(
+            "parse_service_day",
+            {**params, "path": "fast_warm"},
+            len(rows),
+            lambda rows=rows: normalize_raw_points(rows, 1.25, 1000.0, 2),
+        )
+
+    # Smoothing kernels on two 15-minute days
+    values = list(synthetic_series(2, 15).values)
+    for mode in SMOOTHING_MODES:
+        for level in levels:
+            yield Case(
+                "smooth",
+                {"slot_minutes": 15, "days": 2, "mode": mode, "smoothing_level": level},
+                len(values),
+                lambda v=values, w=smoothing_slots(level), mode=mode: smooth(v, w, mode),
+            )
+
+    # Several areas sharing parameters (one coordinator with additional areas)
+    for areas in (1, 4, 8):
+        batch = [synthetic_series(2, 15, seed=i).values for i in range(areas)]
+        yield Case(
+            "compute_offsets_batch",
+            {"slot_minutes": 15, "days": 2, "areas": areas, "horizon_hours": 12, "smoothing_level": 1},
+            len(batch[0]),
+            lambda b=batch: offsets_mod.compute_offsets_batch(b, 48, MAX_OFFSET, smoothing_slots=3, step_size=STEP_SIZE),
+        )
+
+    # What-if previews: many parameter sets against one series (horizons x max offsets)
+    series = synthetic_series(2, 15)
+    mask = night_mask_for(series)
+    grid = [
+        offsets_mod.OffsetParams(horizon_slots(hours, 15), max_offset, 3, "moving_average", STEP_SIZE, True)
+        for hours in (3, 6, 12, 24, 48)
+        for max_offset in (0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0)
+    ]
+    for sets in (1, 10, 50):
+        yield Case(
+            "compute_offsets_scenarios",
+            {"slot_minutes": 15, "days": 2, "parameter_sets": sets, "night_cap": True},
+            len(series),
+            lambda v=series.values, g=grid[:sets], m=mask: offsets_mod.compute_offsets_scenarios(v, g, m),
+        )
+
+
+# --- runner ------------------------------------------------------------------
+
+
+def time_case(case: Case, repeat: int, min_time: float) -> dict[str, Any]:
+    timer = timeit.Timer(case.func)
+    # One warm-up call doubles as the calibration for the loop count
+    single = timer.timeit(number=1)
+    loops = max(1, int(min_time / max(single, 1e-7)))
+    runs = [t / loops * 1e6 for t in timer.repeat(repeat=repeat, number=loops)]
+    return {
+        "name": case.name,
+        "params": case.params,
+        "n_slots": case.n_slots,
+        "loops": loops,
+        "best_us": round(min(runs), 3),
+        "median_us": round(statistics.median(runs), 3),
+    }
+
+
+def case_id(result: dict[str, Any]) -> str:
+    params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]"
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+# Timer noise dominates below this; such cases are never reported as regressions
+_COMPARE_FLOOR_US = 5.0
+
+
+def compare(results: list[dict[str, Any]], baseline_path: Path, threshold: float) -> list[str]:
+    """Cases whose best time grew by more than threshold (a ratio) against a baseline report."""
+    baseline = {case_id(r): r for r in json.loads(baseline_path.read_text())["results"]}
+    regressions = []
+    for result in results:
+        old = baseline.get(case_id(result))
+        if old is None or max(old["best_us"], result["best_us"]) < _COMPARE_FLOOR_US:
+            continue
+        ratio = result["best_us"] / old["best_us"]
+        if ratio > threshold:
+            regressions.append(f"{case_id(result)}: {old['best_us']:.1f} -> {result['best_us']:.1f} us (x{ratio:.2f})")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path, default=Path("benchmark-report.json"))
+    parser.add_argument("--quick", action="store_true", help="reduced parameter grid")
+    parser.add_argument("--only", help="run cases whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.02, help="seconds per timing run")
+    parser.add_argument("--compare", type=Path, help="baseline report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed slowdown ratio for --compare")
+    args = parser.parse_args(argv)
+
+    results = []
+    for case in iter_cases(args.quick):
+        if args.only and args.only not in case.name:
+            continue
+        result = time_case(case, args.repeat, args.min_time)
+        results.append(result)
+        print(f"{case_id(result):<110} {result['best_us']:>12.1f} us", flush=True)
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "numpy": offsets_mod.np.__version__ if offsets_mod.HAS_NUMPY else None,
+            "quick": args.quick,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=1))
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())